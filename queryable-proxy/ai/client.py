@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from core.metrics import Histogram, register_histogram
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+
+PROMPT_TOKENS = register_histogram(Histogram(
+    "llm_prompt_tokens", "Estimated prompt tokens per upstream LLM call",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768),
+))
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token) without a tokenizer round-trip."""
+    return max(1, (len(text) + 3) // 4)
+
+class LLMTimeoutError(Exception):
+    pass
+
+class LLMBackend:
+    """A text-generation provider. Implementations must be safe to await concurrently."""
+
+    name = "base"
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        raise NotImplementedError
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic offline backend for tests and benchmarks.
+
+    `rules` is a list of (regex, response) pairs matched case-insensitively
+    against the user prompt; the first match wins, otherwise `default`.
+    """
+
+    name = "stub"
+
+    def __init__(self, rules: Optional[List[Tuple[str, str]]] = None,
+                 default: str = "SELECT 'UNSUPPORTED' AS error;", latency: float = 0.0):
+        self.rules = [(re.compile(p, re.IGNORECASE), r) for p, r in (rules or [])]
+        self.default = default
+        self.latency = latency
+        self.calls = 0
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for pattern, response in self.rules:
+            if pattern.search(user_prompt):
+                return response
+        return self.default
+
+class LLMClient:
+    """
+    Async front for an LLMBackend:
+    - at most `max_concurrency` upstream calls in flight
+    - per-call deadline covering both queueing and generation
+    - single-flight: identical in-flight prompts share one upstream call
+    """
+
+    def __init__(self, backend: LLMBackend, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 timeout: float = LLM_TIMEOUT_SECONDS):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        # asyncio primitives are bound to the running loop, so create lazily
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats = {"calls": 0, "coalesced": 0, "timeouts": 0, "errors": 0, "active": 0,
+                       "prompt_tokens": 0, "last_prompt_tokens": 0}
+
+    def _limiter(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _call(self, system_prompt: str, user_prompt: str) -> str:
+        async with self._limiter():
+            tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+            PROMPT_TOKENS.observe(tokens)
+            self._stats["calls"] += 1
+            self._stats["prompt_tokens"] += tokens
+            self._stats["last_prompt_tokens"] = tokens
+            self._stats["active"] += 1
+            try:
+                return await self.backend.generate(system_prompt, user_prompt)
+            except Exception:
+                self._stats["errors"] += 1
+                raise
+            finally:
+                self._stats["active"] -= 1
+
+    def _finished(self, key: str, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter gave up
+
+    async def complete(self, system_prompt: str, user_prompt: str,
+                       timeout: Optional[float] = None) -> str:
+        key = hashlib.sha256(f"{system_prompt}\x00{user_prompt}".encode("utf-8")).hexdigest()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                asyncio.wait_for(self._call(system_prompt, user_prompt), self.timeout)
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        else:
+            self._stats["coalesced"] += 1
+
+        deadline = self.timeout if timeout is None else min(timeout, self.timeout)
+        try:
+            # shield: one caller giving up must not cancel the shared call
+            return await asyncio.wait_for(asyncio.shield(task), deadline)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise LLMTimeoutError(f"LLM did not answer within {deadline:g}s")
+
+    def stats(self) -> dict:
+        s = dict(self._stats)
+        s["backend"] = self.backend.name
+        s["inflight"] = len(self._inflight)
+        s["max_concurrency"] = self.max_concurrency
+        s["avg_prompt_tokens"] = s["prompt_tokens"] / s["calls"] if s["calls"] else 0.0
+        return s
@@ -1,16 +1,42 @@
+import asyncio
+import logging
 import os
-import google.generativeai as genai
+import re
+from functools import lru_cache
 from textwrap import dedent
+from typing import AsyncContextManager, Callable, List, Optional, Tuple
 from core.schema_policy import schema_description
+from ai.client import LLMBackend, LLMClient, LLMTimeoutError, StubBackend, estimate_tokens
+from ai.schema_index import SCHEMA_INDEX
+from ai.sql_cache import NlSqlCache, prompt_fingerprint
+from core.lifecycle import on_startup
+from core.scheduler import OverloadedError
 from dotenv import load_dotenv
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
-# Initialize model (use gemini-2.5-flash for speed, gemini-2.5-pro for higher accuracy)
-MODEL = genai.GenerativeModel("gemini-2.5-flash")
+logger = logging.getLogger(__name__)
 
-SYSTEM_PROMPT = dedent(f"""
+# Use gemini-2.5-flash for speed, gemini-2.5-pro for higher accuracy
+MODEL_NAME = "gemini-2.5-flash"
+GENERATION_CONFIG = {"temperature": 0.0, "max_output_tokens": 512}
+# Describe only the tables a question needs; LLM_SCHEMA_PRUNING=0 always sends the whole schema
+SCHEMA_PRUNING = os.getenv("LLM_SCHEMA_PRUNING", "1") != "0"
+
+@lru_cache(maxsize=None)
+def gemini_model():
+    """
+    Import and configure the SDK on first use, once per process: the import
+    alone is most of a worker's start-up time, and stub/offline runs never
+    need it.
+    """
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(MODEL_NAME)
+UNSUPPORTED_SQL = "SELECT 'UNSUPPORTED' AS error;"
+
+SYSTEM_RULES = dedent("""
 You are a SQL generator for a SQLite database.
 
 Return ONLY raw SQL (no markdown, no backticks, no explanations).
@@ -23,12 +49,81 @@ Rules:
 - Add LIMIT <=200 if missing.
 
 Allowed schema:
-{schema_description()}
 """).strip()
 
-def nl_to_sql_with_llm(user_query: str) -> str:
-    """Use Gemini to convert NL → SQL under the above guardrails."""
-    user_prompt = dedent(f"""
+@lru_cache(maxsize=None)
+def system_prompt(tables: Optional[Tuple[str, ...]] = None) -> str:
+    """The rules plus the description of `tables` (the whole schema when None)."""
+    return f"{SYSTEM_RULES}\n{schema_description(tables)}".strip()
+
+SYSTEM_PROMPT = system_prompt()
+
+_prompt_stats = {"full": 0, "pruned": 0, "schema_tokens_saved": 0}
+
+def prompt_for(questions: List[str]) -> str:
+    """System prompt carrying only the part of the schema `questions` touch."""
+    if not SCHEMA_PRUNING:
+        return SYSTEM_PROMPT
+    tables = SCHEMA_INDEX.select_many(questions)
+    prompt = system_prompt(tables)
+    saved = estimate_tokens(SYSTEM_PROMPT) - estimate_tokens(prompt)
+    if saved > 0:
+        _prompt_stats["pruned"] += 1
+        _prompt_stats["schema_tokens_saved"] += saved
+    else:
+        _prompt_stats["full"] += 1
+    logger.debug("Prompt schema for %d question(s): %s", len(questions), ", ".join(tables))
+    return prompt
+
+def prompt_stats() -> dict:
+    return dict(_prompt_stats, pruning=SCHEMA_PRUNING, full_prompt_tokens=estimate_tokens(SYSTEM_PROMPT),
+                tables=len(SCHEMA_INDEX.tables))
+
+# Cached SQL is only valid for the prompt/schema/model that produced it;
+# the index version covers which tables each question is shown
+SQL_CACHE = NlSqlCache(prompt_fingerprint(MODEL_NAME, SYSTEM_PROMPT, schema_description(),
+                                          SCHEMA_INDEX.version if SCHEMA_PRUNING else ""))
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model=None, generation_config=GENERATION_CONFIG):
+        self._model = model
+        self.generation_config = generation_config
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = gemini_model()
+        return self._model
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        response = await self.model.generate_content_async(
+            [system_prompt, user_prompt],
+            generation_config=self.generation_config,
+        )
+        return response.text
+
+def _make_backend() -> LLMBackend:
+    """LLM_BACKEND=stub runs fully offline (LLM_STUB_SQL / LLM_STUB_LATENCY_MS)."""
+    if os.getenv("LLM_BACKEND", "gemini").lower() == "stub":
+        return StubBackend(
+            default=os.getenv("LLM_STUB_SQL", UNSUPPORTED_SQL),
+            latency=float(os.getenv("LLM_STUB_LATENCY_MS", "0")) / 1000,
+        )
+    return GeminiBackend()
+
+LLM_CLIENT = LLMClient(_make_backend())
+
+on_startup("nl_sql_cache")(SQL_CACHE.warm)
+
+@on_startup("llm_client")
+def _configure_llm():
+    if isinstance(LLM_CLIENT.backend, GeminiBackend):
+        LLM_CLIENT.backend.model
+
+def build_user_prompt(user_query: str) -> str:
+    return dedent(f"""
     User question:
     {user_query}
 
@@ -36,21 +131,137 @@ def nl_to_sql_with_llm(user_query: str) -> str:
     obeying every rule in the system instructions above.
     """).strip()
 
+_BATCH_MARKER_RE = re.compile(r"^\s*--\s*#\s*(\d+)\s*$", re.MULTILINE)
+
+def build_batch_prompt(questions: List[str]) -> str:
+    numbered = "\n".join(f"{i}. {q}" for i, q in enumerate(questions, 1))
+    return dedent("""
+    User questions:
+    {numbered}
+
+    For EACH question generate a single valid SQLite SELECT query that answers
+    it, obeying every rule in the system instructions above.
+    Output format: for question N write a line "-- #N" and then its SQL on the
+    following lines. Answer every question, in order, with nothing else.
+    """).strip().format(numbered=numbered)
+
+def parse_batch_response(text: str, count: int) -> Optional[List[str]]:
+    """SQL per question from a batch answer, or None if it does not line up."""
+    text = clean_sql(text)
+    parts = _BATCH_MARKER_RE.split(text)
+    # parts = [preamble, "1", sql1, "2", sql2, ...]
+    answers = {}
+    for number, body in zip(parts[1::2], parts[2::2]):
+        answers[int(number)] = clean_sql(body)
+    if sorted(answers) != list(range(1, count + 1)) or not all(answers.values()):
+        return None
+    return [answers[i] for i in range(1, count + 1)]
+
+def clean_sql(text: str) -> str:
+    sql = text.strip()
+    if sql.startswith("```"):
+        sql = sql.strip("`").split("\n", 1)[-1]
+    return sql
+
+def nl_to_sql_with_llm(user_query: str) -> str:
+    """Use Gemini to convert NL → SQL under the above guardrails."""
+    user_prompt = build_user_prompt(user_query)
+
     try:
-        response = MODEL.generate_content(
-            [SYSTEM_PROMPT, user_prompt],
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.0,
-                max_output_tokens=512,
-            ),
+        response = gemini_model().generate_content(
+            [prompt_for([user_query]), user_prompt],
+            generation_config=GENERATION_CONFIG,
         )
 
-        sql = response.text.strip()
-        if sql.startswith("```"):
-            sql = sql.strip("`").split("\n", 1)[-1]
-        
-        print(f"Generated SQL: {sql}")
+        sql = clean_sql(response.text)
+        logger.debug("Generated SQL: %s", sql)
+        return sql
+    except Exception as e:
+        logger.warning("Error generating SQL: %s", e)
+        return UNSUPPORTED_SQL
+
+def nl_to_sql(user_query: str) -> str:
+    """nl_to_sql_with_llm behind the semantic cache; failures are never cached."""
+    sql = SQL_CACHE.get(user_query)
+    if sql is not None:
+        return sql
+    sql = nl_to_sql_with_llm(user_query)
+    if "UNSUPPORTED" not in sql.upper():
+        SQL_CACHE.put(user_query, sql)
+    return sql
+
+Slot = Optional[Callable[[], AsyncContextManager]]
+
+async def _complete(system: str, prompt: str, timeout: Optional[float], slot: Slot) -> str:
+    # Only upstream calls wait for a scheduler slot; cache hits never queue
+    if slot is None:
+        return await LLM_CLIENT.complete(system, prompt, timeout)
+    async with slot():
+        return await LLM_CLIENT.complete(system, prompt, timeout)
+
+async def nl_to_sql_async(user_query: str, timeout: Optional[float] = None, slot: Slot = None) -> str:
+    """
+    Non-blocking nl_to_sql through LLM_CLIENT (deadline, concurrency limit,
+    coalescing). Raises LLMTimeoutError when the deadline passes. `slot`
+    returns an async context manager held around the upstream call.
+    """
+    # A lookup can read or prune the store on disk; keep that off the event loop
+    loop = asyncio.get_running_loop()
+    sql = await loop.run_in_executor(None, SQL_CACHE.get, user_query)
+    if sql is not None:
         return sql
+    try:
+        sql = clean_sql(await _complete(prompt_for([user_query]), build_user_prompt(user_query), timeout, slot))
+    except (LLMTimeoutError, OverloadedError):
+        raise
     except Exception as e:
-        print(f"Error generating SQL: {e}")
-        return "SELECT 'UNSUPPORTED' AS error;"
+        logger.warning("Error generating SQL: %s", e)
+        return UNSUPPORTED_SQL
+    if "UNSUPPORTED" not in sql.upper():
+        # The cache commits to disk; keep that off the event loop
+        await loop.run_in_executor(None, SQL_CACHE.put, user_query, sql)
+    return sql
+
+async def nl_to_sql_batch_async(questions: List[str], timeout: Optional[float] = None, slot: Slot = None) -> list:
+    """
+    SQL for many questions using one multi-question prompt for the cache
+    misses, falling back to per-question calls when the batch answer cannot
+    be parsed. Items are SQL strings or the exception raised for that question.
+    """
+    loop = asyncio.get_running_loop()
+    results: list = await loop.run_in_executor(None, lambda: [SQL_CACHE.get(q) for q in questions])
+    missing = [i for i, sql in enumerate(results) if sql is None]
+    if not missing:
+        return results
+    # The fallback shares the batch deadline instead of starting a new one
+    deadline = loop.time() + (LLM_CLIENT.timeout if timeout is None else timeout)
+
+    answers = None
+    if len(missing) > 1:
+        asked = [questions[i] for i in missing]
+        try:
+            answers = parse_batch_response(
+                await _complete(prompt_for(asked), build_batch_prompt(asked), timeout, slot), len(missing)
+            )
+        except OverloadedError:
+            raise
+        except Exception as e:
+            logger.warning("Batch SQL generation failed, falling back: %s", e)
+        if answers is None:
+            logger.info("Batch SQL answer did not line up, falling back to single calls")
+
+    if answers is None:
+        remaining = deadline - loop.time()
+        if remaining > 0:
+            answers = await asyncio.gather(*(nl_to_sql_async(questions[i], remaining, slot) for i in missing),
+                                           return_exceptions=True)
+        else:
+            answers = [LLMTimeoutError("LLM did not answer before the batch deadline") for _ in missing]
+    else:
+        for i, sql in zip(missing, answers):
+            if "UNSUPPORTED" not in sql.upper():
+                await loop.run_in_executor(None, SQL_CACHE.put, questions[i], sql)
+
+    for i, answer in zip(missing, answers):
+        results[i] = answer
+    return results
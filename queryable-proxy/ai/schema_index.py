@@ -0,0 +1,116 @@
+import hashlib
+import re
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, Sequence, Set, Tuple
+
+from core.schema_policy import ALLOWED_SCHEMA, RELATIONSHIPS, TABLE_KEYWORDS
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Weight of a question word naming a table, one of its columns, or a keyword
+TABLE_WEIGHT = 3.0
+COLUMN_WEIGHT = 1.0
+KEYWORD_WEIGHT = 2.0
+# A lone column word (share_logs.file_id for "file") does not pull its table in
+MIN_SCORE = 2.0
+# Terms this common carry no signal about which table is meant
+_GENERIC = frozenset({"id", "at"})
+
+def _stem(word: str) -> str:
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def terms(text: str) -> List[str]:
+    """Stemmed words of `text`; identifiers split on underscores."""
+    text = unicodedata.normalize("NFKC", text).lower().replace("_", " ")
+    return [_stem(w) for w in _WORD_RE.findall(text)]
+
+class SchemaIndex:
+    """
+    Lexical index from words to the tables they point at, built once from
+    the schema, so each LLM prompt can carry only the relevant tables.
+
+    A question selects every table its words score at least MIN_SCORE for
+    (else the best-scoring ones), plus the tables on the join paths between
+    them. A question that names nothing gets the whole schema: a prompt
+    missing a table it needs is worse than a long one.
+    """
+
+    def __init__(self, schema: Mapping[str, Sequence[str]], relationships: Iterable[Tuple[Tuple[str, str], Tuple[str, str]]],
+                 keywords: Mapping[str, Sequence[str]]):
+        self.tables = tuple(schema)
+        self._postings: Dict[str, Dict[str, float]] = {}
+        for table, cols in schema.items():
+            for term in terms(table):
+                self._add(term, table, TABLE_WEIGHT)
+            for col in cols:
+                for term in terms(col):
+                    self._add(term, table, COLUMN_WEIGHT)
+            for word in keywords.get(table, ()):
+                for term in terms(word):
+                    self._add(term, table, KEYWORD_WEIGHT)
+        self._neighbours: Dict[str, Set[str]] = {t: set() for t in self.tables}
+        for (src, _), (dst, _) in relationships:
+            self._neighbours[src].add(dst)
+            self._neighbours[dst].add(src)
+        self.version = hashlib.sha256(
+            repr((sorted((t, sorted(p.items())) for t, p in self._postings.items()),
+                  sorted((t, sorted(n)) for t, n in self._neighbours.items()))).encode("utf-8")
+        ).hexdigest()[:16]
+
+    def _add(self, term: str, table: str, weight: float):
+        if term in _GENERIC:
+            return
+        postings = self._postings.setdefault(term, {})
+        postings[table] = max(postings.get(table, 0.0), weight)
+
+    def scores(self, question: str) -> Dict[str, float]:
+        scores: Dict[str, float] = {}
+        for term in set(terms(question)):
+            for table, weight in self._postings.get(term, {}).items():
+                scores[table] = scores.get(table, 0.0) + weight
+        return scores
+
+    def _path(self, start: str, goal: str) -> List[str]:
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            table = queue.popleft()
+            if table == goal:
+                path = []
+                while table is not None:
+                    path.append(table)
+                    table = previous[table]
+                return path
+            for nxt in self._neighbours[table]:
+                if nxt not in previous:
+                    previous[nxt] = table
+                    queue.append(nxt)
+        return []
+
+    def select(self, question: str) -> Tuple[str, ...]:
+        """Tables to describe for `question`, in schema order."""
+        return self.select_many([question])
+
+    def select_many(self, questions: Iterable[str]) -> Tuple[str, ...]:
+        """Tables for one prompt answering all of `questions`."""
+        hit: Set[str] = set()
+        for question in questions:
+            scores = self.scores(question)
+            if not scores:
+                return self.tables
+            strong = {t for t, s in scores.items() if s >= MIN_SCORE}
+            best = max(scores.values())
+            hit.update(strong or {t for t, s in scores.items() if s == best})
+        if not hit:
+            return self.tables
+        # Connect the hits through the shortest join paths between them
+        selected = set(hit)
+        ordered = [t for t in self.tables if t in hit]
+        for a, b in zip(ordered, ordered[1:]):
+            selected.update(self._path(a, b))
+        return tuple(t for t in self.tables if t in selected)
+
+SCHEMA_INDEX = SchemaIndex(ALLOWED_SCHEMA, RELATIONSHIPS, TABLE_KEYWORDS)
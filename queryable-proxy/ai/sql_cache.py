@@ -0,0 +1,325 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional
+
+logger = logging.getLogger(__name__)
+
+# Use absolute path for the cache store so every entry point shares it
+CACHE_DB_PATH = os.getenv(
+    "NL_SQL_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nl_sql_cache.db"),
+)
+CACHE_MAX_ENTRIES = int(os.getenv("NL_SQL_CACHE_MAX_ENTRIES", "2000"))
+CACHE_TTL_SECONDS = int(os.getenv("NL_SQL_CACHE_TTL_SECONDS", str(24 * 3600)))
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Filler words that never change what a question asks for. Negations and
+# comparison words ("not", "more", "top", ...) must NOT be listed here.
+_STOPWORDS = frozenset("""
+a an the please show me give list get find tell what which who are is was were
+all of can could you i we want would like to see display return my our
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9_%+\-]+(?:[.@][a-z0-9_%+\-]+)*")
+_QUOTED_RE = re.compile(r"\"([^\"]*)\"|'([^']*)'")
+_NUMBER_RE = re.compile(r"^\d+(?:\.\d+)?$")
+# Words that flip or bound what a question asks for; one extra "not" barely
+# moves the Jaccard score, so they have to match exactly like literals do
+_POLARITY_WORDS = frozenset("""
+not no without except never more less over under top bottom first last
+""".split())
+# Words that pick the aggregate or the order: "count files opened this
+# week" is one extra term away from "files opened this week"
+_AGGREGATE_WORDS = frozenset("""
+count many number distinct unique total sum average avg mean min minimum max maximum
+most least fewest highest lowest oldest newest latest earliest recent
+""".split())
+_ANCHOR_WORDS = _POLARITY_WORDS | _AGGREGATE_WORDS
+
+
+def prompt_fingerprint(*parts: str) -> str:
+    """Hash of everything besides the question that shapes the model output."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()[:16]
+
+
+def normalize_question(question: str) -> str:
+    """Case/whitespace/punctuation-insensitive form of a question."""
+    text = unicodedata.normalize("NFKC", question).lower().strip()
+    return " ".join(_TOKEN_RE.findall(text))
+
+
+def _stem(token: str) -> str:
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def _anchors(question: str, tokens) -> FrozenSet[str]:
+    """Values that must match exactly for two questions to share SQL."""
+    quoted = {(a or b).lower() for a, b in _QUOTED_RE.findall(question)}
+    literal = {t for t in tokens if _NUMBER_RE.match(t) or "@" in t or t in _ANCHOR_WORDS}
+    return frozenset(quoted | literal)
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    # Questions made only of filler words say nothing; never call them similar
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    normalized: str
+    terms: FrozenSet[str]
+    anchors: FrozenSet[str]
+    sql: str
+    created_at: float
+
+
+class NlSqlCache:
+    """
+    Two-tier LRU+TTL cache for generated SQL, persisted to a local SQLite file.
+
+    - exact tier: normalized question text
+    - near-duplicate tier: same anchors (numbers, emails, quoted strings,
+      negation, comparison, aggregate and ordering words) and a bag of
+      content words with Jaccard >= threshold
+
+    The file is opened and loaded on first use. Every worker process shares
+    it, so an exact miss in memory is looked up there before it counts as
+    a miss; near-duplicates only match entries this process has loaded.
+    """
+
+    def __init__(self, fingerprint: str, path: str = CACHE_DB_PATH,
+                 max_entries: int = CACHE_MAX_ENTRIES, ttl: int = CACHE_TTL_SECONDS,
+                 threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._by_anchors: Dict[FrozenSet[str], Dict[str, CacheEntry]] = {}
+        self._stats = {"exact_hits": 0, "near_hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._loaded = False
+
+    def warm(self):
+        """Open and load the store now instead of on the first lookup."""
+        with self._lock:
+            self._ensure_loaded()
+
+    # ----------------------------
+    # Persistence (lock held)
+    # ----------------------------
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._loaded = True
+            self._conn = self._open(self.path)
+            self._load()
+
+    def _open(self, path: str) -> Optional[sqlite3.Connection]:
+        try:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            if path != ":memory:":
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS nl_sql_cache (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                question TEXT NOT NULL,
+                normalized TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """)
+            conn.commit()
+            return conn
+        except sqlite3.Error as e:
+            logger.warning("NL→SQL cache running in memory only: %s", e)
+            return None
+
+    def _load(self):
+        if self._conn is None:
+            return
+        cutoff = time.time() - self.ttl
+        self._conn.execute("DELETE FROM nl_sql_cache WHERE fingerprint != ? OR created_at < ?",
+                           (self.fingerprint, cutoff))
+        self._conn.commit()
+        rows = self._conn.execute(
+            "SELECT key, question, normalized, sql, created_at FROM nl_sql_cache "
+            "ORDER BY created_at DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for key, question, normalized, sql, created_at in reversed(rows):
+            self._insert(self._make_entry(key, question, normalized, sql, created_at))
+
+    def _lookup_shared(self, key: str, now: float) -> Optional[CacheEntry]:
+        # Another worker may have stored it since this process loaded
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT question, normalized, sql, created_at FROM nl_sql_cache "
+                "WHERE key = ? AND fingerprint = ? AND created_at >= ?",
+                (key, self.fingerprint, now - self.ttl),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("NL→SQL cache read failed: %s", e)
+            return None
+        if row is None:
+            return None
+        question, normalized, sql, created_at = row
+        return self._make_entry(key, question, normalized, sql, created_at)
+
+    def _persist(self, entry: CacheEntry, question: str):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO nl_sql_cache (key, fingerprint, question, normalized, sql, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (entry.key, self.fingerprint, question, entry.normalized, entry.sql, entry.created_at),
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("NL→SQL cache write failed: %s", e)
+
+    def _forget(self, keys):
+        if self._conn is None or not keys:
+            return
+        try:
+            self._conn.executemany("DELETE FROM nl_sql_cache WHERE key = ?", [(k,) for k in keys])
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("NL→SQL cache delete failed: %s", e)
+
+    # ----------------------------
+    # In-memory index
+    # ----------------------------
+    def _key(self, normalized: str) -> str:
+        return hashlib.sha256(f"{self.fingerprint}:{normalized}".encode("utf-8")).hexdigest()
+
+    def _make_entry(self, key, question, normalized, sql, created_at) -> CacheEntry:
+        tokens = normalized.split()
+        terms = frozenset(_stem(t) for t in tokens if t not in _STOPWORDS)
+        return CacheEntry(key, normalized, terms, _anchors(question, tokens), sql, created_at)
+
+    def _insert(self, entry: CacheEntry):
+        self._entries[entry.key] = entry
+        self._entries.move_to_end(entry.key)
+        self._by_anchors.setdefault(entry.anchors, {})[entry.key] = entry
+
+    def _remove(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            bucket = self._by_anchors.get(entry.anchors)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._by_anchors[entry.anchors]
+        return entry
+
+    def _expired(self, entry: CacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.ttl
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def get(self, question: str) -> Optional[str]:
+        normalized = normalize_question(question)
+        key = self._key(normalized)
+        now = time.time()
+        stale = []
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                stale.append(key)
+                self._remove(key)
+                self._stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return entry.sql
+            entry = self._lookup_shared(key, now)
+            if entry is not None:
+                self._insert(entry)
+                self._evict()
+                self._stats["shared_hits"] += 1
+                self._forget(stale)
+                return entry.sql
+
+            probe = self._make_entry(key, question, normalized, "", now)
+            best, best_score = None, 0.0
+            for candidate in list(self._by_anchors.get(probe.anchors, {}).values()):
+                if self._expired(candidate, now):
+                    stale.append(candidate.key)
+                    self._remove(candidate.key)
+                    self._stats["expired"] += 1
+                    continue
+                score = _jaccard(probe.terms, candidate.terms)
+                if score > best_score:
+                    best, best_score = candidate, score
+
+            if best is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best.key)
+                self._stats["near_hits"] += 1
+                sql = best.sql
+            else:
+                self._stats["misses"] += 1
+                sql = None
+            self._forget(stale)
+        return sql
+
+    def put(self, question: str, sql: str):
+        normalized = normalize_question(question)
+        entry = self._make_entry(self._key(normalized), question, normalized, sql, time.time())
+        with self._lock:
+            self._ensure_loaded()
+            self._remove(entry.key)
+            self._insert(entry)
+            evicted = self._evict()
+            self._persist(entry, question)
+            self._forget(evicted)
+
+    def _evict(self) -> list:
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            evicted.append(oldest)
+        self._stats["evictions"] += len(evicted)
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._ensure_loaded()
+            self._forget(list(self._entries))
+            self._entries.clear()
+            self._by_anchors.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["size"] = len(self._entries)
+        hits = s["exact_hits"] + s["near_hits"] + s["shared_hits"]
+        lookups = hits + s["misses"]
+        s["hit_ratio"] = hits / lookups if lookups else 0.0
+        return s
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from core.database import on_write
+from .models import User
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+# Unknown emails are cached for less time so new sign-ups show up quickly
+USER_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("USER_CACHE_NEGATIVE_TTL_SECONDS", "5"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+class _TtlCache:
+    """Small thread-safe LRU with a per-entry expiry time."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, now: float) -> Tuple[bool, object]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, item[1]
+
+    def put(self, key: str, value, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {"size": size, "hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0}
+
+USER_CACHE = _TtlCache(USER_CACHE_MAX_ENTRIES)
+TOKEN_CACHE = _TtlCache(TOKEN_CACHE_MAX_ENTRIES)
+
+def cached_user(email: str) -> Tuple[bool, Optional[User]]:
+    """(found_in_cache, user); a cached None means the email is known not to exist."""
+    return USER_CACHE.get(email, time.monotonic())
+
+def remember_user(email: str, user: Optional[User]):
+    ttl = USER_CACHE_TTL_SECONDS if user is not None else USER_CACHE_NEGATIVE_TTL_SECONDS
+    USER_CACHE.put(email, user, time.monotonic() + ttl)
+
+def invalidate_user(email: Optional[str] = None):
+    """Drop one user (or every user when email is None), e.g. after create/deactivate."""
+    if email is None:
+        USER_CACHE.clear()
+    else:
+        USER_CACHE.pop(email)
+
+def cached_token_subject(token: str) -> Optional[str]:
+    found, subject = TOKEN_CACHE.get(token, time.time())
+    return subject if found else None
+
+def remember_token(token: str, subject: str, expires_at: float):
+    """Memoize a verified token's subject until the token's own exp."""
+    TOKEN_CACHE.put(token, subject, expires_at)
+
+def auth_cache_stats() -> dict:
+    return {"users": USER_CACHE.stats(), "tokens": TOKEN_CACHE.stats()}
+
+@on_write
+def _invalidate_on_users_write(tables):
+    # Any users-table write we cannot attribute to one email drops everything
+    if tables is None or "users" in tables:
+        USER_CACHE.clear()
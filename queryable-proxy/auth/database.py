@@ -1,86 +1,69 @@
-import sqlite3
-from passlib.context import CryptContext
-from typing import Optional
+import logging
+from typing import Optional, Tuple
+from core.database import DB_PATH, read_connection, write_transaction
+from .cache import invalidate_user
+from .hashing import get_password_hash, verify_password
 from .models import User, UserCreate
 
-import os
+logger = logging.getLogger(__name__)
 
-# Use absolute path for DB_PATH
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "proxy.db")
-print(f"Using database at: {DB_PATH}")
-# Use SHA256 instead of bcrypt to avoid the 72-byte limit
-pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+logger.info("Using database at: %s", DB_PATH)
 
 def get_user_by_email(email: str) -> Optional[User]:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-    user_row = cursor.fetchone()
-    conn.close()
+    with read_connection() as conn:
+        user_row = conn.execute(
+            "SELECT id, email, is_active, tier FROM users WHERE email = ?", (email,)
+        ).fetchone()
     
     if user_row:
         return User(**dict(user_row))
     return None
 
-def authenticate_user(email: str, password: str) -> Optional[User]:
-    user = get_user_by_email(email)
-    if not user:
+def get_user_with_hash(email: str) -> Optional[Tuple[User, str]]:
+    """The user and their password hash in one query, or None."""
+    with read_connection() as conn:
+        row = conn.execute(
+            "SELECT id, email, is_active, tier, password_hash FROM users WHERE email = ?", (email,)
+        ).fetchone()
+    if row is None:
         return None
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT password_hash FROM users WHERE email = ?", (email,))
-    result = cursor.fetchone()
-    conn.close()
-    
-    if not result:
+    fields = dict(row)
+    stored_hash = fields.pop("password_hash")
+    return User(**fields), stored_hash
+
+def authenticate_user(email: str, password: str) -> Optional[User]:
+    found = get_user_with_hash(email)
+    if not found:
         return None
-        
-    stored_hash = result[0]
+    user, stored_hash = found
     if not verify_password(password, stored_hash):
         return None
         
     return user
 
-def create_user(user: UserCreate) -> User:
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    hashed_password = get_password_hash(user.password)
+def create_user(user: UserCreate, hashed_password: Optional[str] = None) -> User:
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     
-    cursor.execute(
-        "INSERT INTO users (email, password_hash, is_active, tier) VALUES (?, ?, ?, ?)",
-        (user.email, hashed_password, user.is_active, "basic")
-    )
-    
-    user_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    with write_transaction("users") as conn:
+        cursor = conn.execute(
+            "INSERT INTO users (email, password_hash, is_active, tier) VALUES (?, ?, ?, ?)",
+            (user.email, hashed_password, user.is_active, "basic")
+        )
+        user_id = cursor.lastrowid
+    invalidate_user(user.email)  # may be negatively cached
     
     return User(id=user_id, email=user.email, is_active=user.is_active, tier="basic")
 
 def setup_users_table():
     """Create users table if it doesn't exist"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        email TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        is_active BOOLEAN NOT NULL DEFAULT 1,
-        tier TEXT NOT NULL DEFAULT 'basic'
-    )
-    """)
-    
-    conn.commit()
-    conn.close()
+    with write_transaction("users") as conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            is_active BOOLEAN NOT NULL DEFAULT 1,
+            tier TEXT NOT NULL DEFAULT 'basic'
+        )
+        """)
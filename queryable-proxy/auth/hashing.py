@@ -0,0 +1,86 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from passlib.context import CryptContext
+
+# Use SHA256 instead of bcrypt to avoid the 72-byte limit
+pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
+
+# Hashing is CPU-bound and holds the GIL, so it runs in worker processes;
+# HASH_POOL_SIZE=0 falls back to the default thread pool.
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+# Hash jobs queued or running beyond this are refused with 503
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(max(HASH_POOL_SIZE, 1) * 8)))
+# spawn keeps workers clear of the parent's threads and open SQLite handles
+HASH_POOL_START_METHOD = os.getenv("HASH_POOL_START_METHOD", "spawn")
+
+def get_password_hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_pending = 0
+_stats = {"completed": 0, "rejected": 0}
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if HASH_POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=HASH_POOL_SIZE,
+                                        mp_context=multiprocessing.get_context(HASH_POOL_START_METHOD))
+        return _pool
+
+def _discard_pool(broken: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False)
+
+async def _run(fn, *args):
+    global _pending
+    from core.scheduler import OverloadedError  # not at module level: workers import this module
+
+    if _pending >= HASH_MAX_PENDING:
+        _stats["rejected"] += 1
+        raise OverloadedError("Password hashing queue is full", retry_after=1.0)
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        pool = _get_pool()
+        try:
+            result = await loop.run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM kill, signal); start a fresh pool and retry once
+            _discard_pool(pool)
+            result = await loop.run_in_executor(_get_pool(), fn, *args)
+        _stats["completed"] += 1
+        return result
+    finally:
+        _pending -= 1
+
+async def hash_password_async(password: str) -> str:
+    return await _run(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run(verify_password, plain_password, hashed_password)
+
+def shutdown_hash_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+def hash_pool_stats() -> dict:
+    return dict(_stats, workers=HASH_POOL_SIZE, pending=_pending, max_pending=HASH_MAX_PENDING)
@@ -1,15 +1,21 @@
+import os
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from .models import TokenData, User
+from core.database import run_db
+from core.metrics import span
+from .cache import cached_token_subject, remember_token, cached_user, remember_user
 from .database import get_user_by_email
 
 # These should be stored in environment variables in production
 SECRET_KEY = "YOUR_SECRET_KEY_HERE"  # Generate using: openssl rand -hex 32
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Comma-separated emails allowed to use /admin endpoints
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
@@ -26,22 +32,34 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    with span("auth"):
+        return await _current_user(token)
+
+async def _current_user(token: str) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    # Signature/expiry checks only need to run once per token
+    username = cached_token_subject(token)
+    if username is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+            if "exp" in payload:
+                remember_token(token, username, float(payload["exp"]))
+        except JWTError:
             raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
+    token_data = TokenData(username=username)
         
-    user = get_user_by_email(token_data.username)
+    found, user = cached_user(token_data.username)
+    if not found:
+        user = await run_db(get_user_by_email, token_data.username)
+        remember_user(token_data.username, user)
     if user is None:
         raise credentials_exception
         
@@ -51,3 +69,8 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+async def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
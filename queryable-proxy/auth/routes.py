@@ -1,15 +1,53 @@
+import logging
+import os
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from .models import Token, UserCreate, User
-from .database import authenticate_user, create_user, setup_users_table
+from .database import create_user, get_user_with_hash, setup_users_table
+from .hashing import hash_password_async, verify_password_async
 from .jwt import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from core.database import run_db
+from core.lifecycle import on_startup
+from core.metrics import span
+from core.scheduler import OverloadedError, RateLimitedError, RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Login attempts per second (and burst) per account and per client address
+LOGIN_RATE_PER_ACCOUNT = float(os.getenv("LOGIN_RATE_PER_ACCOUNT", "0.5"))
+LOGIN_BURST_PER_ACCOUNT = float(os.getenv("LOGIN_BURST_PER_ACCOUNT", "5"))
+LOGIN_RATE_PER_CLIENT = float(os.getenv("LOGIN_RATE_PER_CLIENT", "5"))
+LOGIN_BURST_PER_CLIENT = float(os.getenv("LOGIN_BURST_PER_CLIENT", "20"))
+
+LOGIN_LIMITER = RateLimiter()
 
 router = APIRouter(tags=["authentication"], prefix="/auth")
 
+def _limited(e: Exception) -> HTTPException:
+    status_code = 429 if isinstance(e, RateLimitedError) else 503
+    return HTTPException(status_code=status_code, detail=str(e),
+                         headers={"Retry-After": str(max(1, round(e.retry_after)))})
+
+def _check_login_rate(email: str, client: str):
+    LOGIN_LIMITER.take(f"account:{email.lower()}", LOGIN_RATE_PER_ACCOUNT, LOGIN_BURST_PER_ACCOUNT,
+                       "Too many login attempts for this account")
+    LOGIN_LIMITER.take(f"client:{client}", LOGIN_RATE_PER_CLIENT, LOGIN_BURST_PER_CLIENT,
+                       "Too many login attempts from this client")
+
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    user = None
+    try:
+        _check_login_rate(form_data.username, request.client.host if request.client else "unknown")
+        # One query for the user and hash; the hash check runs off the event loop
+        found = await run_db(get_user_with_hash, form_data.username)
+        if found is not None:
+            with span("password_verify"):
+                if await verify_password_async(form_data.password, found[1]):
+                    user = found[0]
+    except (RateLimitedError, OverloadedError) as e:
+        raise _limited(e)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -27,11 +65,13 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 @router.post("/register", response_model=User)
 async def register_user(user: UserCreate):
     try:
-        db_user = create_user(user)
+        hashed_password = await hash_password_async(user.password)
+        db_user = await run_db(create_user, user, hashed_password)
         return db_user
+    except OverloadedError as e:
+        raise _limited(e)
     except Exception as e:
-        print(f"Error creating user: {e}")
+        logger.error("Error creating user: %s", e)
         raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
 
-# Initialize the database table on import
-setup_users_table()
+on_startup("users_table", exclusive=True)(setup_users_table)
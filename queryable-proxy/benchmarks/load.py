@@ -0,0 +1,249 @@
+"""
+Drive the API in-process at a fixed concurrency and report latency
+percentiles, throughput and memory. The LLM is replaced by a local,
+deterministic stub, so runs are reproducible and need no API key.
+
+    PROXY_DB_PATH=/tmp/bench.db python -m benchmarks.load --scenario all
+    PROXY_DB_PATH=/tmp/bench.db python -m benchmarks.load --scenario query \\
+        --concurrency 64 --requests 5000 --llm-latency-ms 300 --distinct-questions 200
+
+Seed the database first with benchmarks.seed. The run registers a
+bench user, so it needs --db or PROXY_DB_PATH and refuses the
+application's own proxy.db.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Must be set before the app is imported
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("NL_SQL_CACHE_PATH", ":memory:")
+for _tier in ("BASIC", "PREMIUM", "ENTERPRISE"):
+    os.environ.setdefault(f"RATE_LIMIT_{_tier}", "1e9")
+for _limit in ("LOGIN_RATE_PER_ACCOUNT", "LOGIN_BURST_PER_ACCOUNT", "LOGIN_RATE_PER_CLIENT", "LOGIN_BURST_PER_CLIENT"):
+    os.environ.setdefault(_limit, "1e9")
+
+from ai.client import StubBackend
+
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+
+# (question template, SQL template); {n} is filled with a file id / viewer number
+QUESTIONS = [
+    ("how many times was file {n} opened", "SELECT COUNT(*) AS opens FROM share_logs WHERE file_id = {n}"),
+    ("who viewed file {n}", "SELECT DISTINCT viewer_email FROM share_logs WHERE file_id = {n}"),
+    ("which files did viewer{n}@example.com open",
+     "SELECT f.name, s.opened_at FROM files f JOIN share_logs s ON f.id = s.file_id "
+     "WHERE s.viewer_email = 'viewer{n}@example.com'"),
+    ("name of file {n}", "SELECT name FROM files WHERE id = {n}"),
+]
+
+class TemplateBackend(StubBackend):
+    """StubBackend whose responses may reference regex groups (\\1, \\g<n>)."""
+
+    def answer(self, user_prompt: str) -> str:
+        for pattern, response in self.rules:
+            m = pattern.search(user_prompt)
+            if m:
+                return m.expand(response)
+        return self.default
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.answer(user_prompt)
+
+def stub_rules():
+    rules = []
+    for question, sql in QUESTIONS:
+        pattern = question.replace("{n}", r"(?P<n>\d+)").replace(".", r"\.")
+        rules.append((pattern, sql.replace("{n}", r"\g<n>")))
+    return rules
+
+def install_llm_stub(latency: float):
+    """Swap both the async client backend and the blocking helper for the stub."""
+    import ai.llm_gemini as llm
+
+    backend = TemplateBackend(stub_rules(), default=llm.UNSUPPORTED_SQL, latency=latency)
+    llm.LLM_CLIENT.backend = backend
+
+    def nl_to_sql_with_llm(user_query: str) -> str:
+        backend.calls += 1
+        time.sleep(latency)
+        return backend.answer(llm.build_user_prompt(user_query))
+
+    llm.nl_to_sql_with_llm = nl_to_sql_with_llm
+    return backend
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10  # bytes on macOS, KiB elsewhere
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+async def _ensure_user(client) -> str:
+    from auth.database import get_user_by_email
+    from core.database import run_db, write_transaction
+
+    if await run_db(get_user_by_email, BENCH_EMAIL) is None:
+        r = await client.post("/auth/register", json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+        r.raise_for_status()
+
+    def promote():
+        # Benchmarks measure the service, not the basic tier's limits
+        with write_transaction("users") as conn:
+            conn.execute("UPDATE users SET tier = 'enterprise' WHERE email = ?", (BENCH_EMAIL,))
+
+    await run_db(promote)
+    r = await client.post("/auth/token", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+def _request_factory(scenario: str, token: str, rng: random.Random, distinct: int):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def query(client):
+        template, _ = QUESTIONS[rng.randrange(len(QUESTIONS))]
+        return client.post("/query", json={"query": template.format(n=rng.randrange(1, distinct + 1))},
+                           headers=headers)
+
+    def top_files(client):
+        return client.get("/top-files", headers=headers)
+
+    def login(client):
+        return client.post("/auth/token", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+
+    return {"query": query, "top-files": top_files, "login": login}[scenario]
+
+async def run_scenario(client, scenario: str, token: str, concurrency: int, requests: int,
+                       warmup: int, distinct: int, seed: int) -> Dict:
+    make_request = _request_factory(scenario, token, random.Random(seed), distinct)
+    first = None
+    for _ in range(warmup):
+        start = time.perf_counter()
+        await make_request(client)
+        if first is None:
+            first = time.perf_counter() - start
+
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            r = await make_request(client)
+            latencies.append(time.perf_counter() - start)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": sum(n for code, n in statuses.items() if code >= 400),
+        "statuses": statuses,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "first_ms": first * 1000 if first is not None else None,
+        "rss_mb": rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def _print_report(startup: Dict, results: List[Dict]):
+    print(f"import {startup['import_s'] * 1000:.0f}ms, startup {startup['startup_s'] * 1000:.0f}ms "
+          f"({', '.join(f'{k} {v * 1000:.0f}ms' for k, v in startup['steps'].items())})")
+    header = f"{'scenario':<10} {'conc':>5} {'reqs':>7} {'err':>5} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'rss MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['scenario']:<10} {r['concurrency']:>5} {r['requests']:>7} {r['errors']:>5} "
+              f"{r['throughput_rps']:>9.1f} {r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms "
+              f"{r['p99_ms']:>7.1f}ms {r['rss_mb']:>8.1f}")
+    for r in results:
+        if r["first_ms"] is not None:
+            print(f"{r['scenario']}: first request {r['first_ms']:.1f}ms")
+
+async def main(args) -> Tuple[Dict, List[Dict]]:
+    import httpx
+
+    started = time.perf_counter()
+    from main import app
+    imported = time.perf_counter()
+    # ASGITransport sends no lifespan events, so run startup directly
+    from core.lifecycle import run_startup, startup_stats
+    await run_startup()
+    startup = {"import_s": imported - started, "startup_s": time.perf_counter() - imported,
+               "steps": startup_stats()["steps"]}
+
+    install_llm_stub(args.llm_latency_ms / 1000)
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        token = await _ensure_user(client)
+        scenarios = ["query", "top-files", "login"] if args.scenario == "all" else [args.scenario]
+        for scenario in scenarios:
+            results.append(await run_scenario(client, scenario, token, args.concurrency, args.requests,
+                                              args.warmup, args.distinct_questions, args.seed))
+    return startup, results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test /query, /top-files and /auth/token in-process")
+    parser.add_argument("--scenario", choices=["query", "top-files", "login", "all"], default="all")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="stub LLM response time")
+    parser.add_argument("--distinct-questions", type=int, default=100,
+                        help="ids drawn per question template; lower means more cache hits")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-intents", action="store_true",
+                        help="send every question to the (stub) LLM instead of the intent templates")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--db", default=os.getenv("PROXY_DB_PATH"), help="database file (default: PROXY_DB_PATH)")
+    args = parser.parse_args()
+    if not args.db:
+        parser.error("name the benchmark database with --db or PROXY_DB_PATH")
+    # Both read when the app (and core.database) is imported
+    os.environ["PROXY_DB_PATH"] = os.path.abspath(args.db)
+    if args.no_intents:
+        os.environ["INTENT_MIN_CONFIDENCE"] = "2"
+
+    from core.database import DB_PATH, DEFAULT_DB_PATH
+    if DB_PATH == DEFAULT_DB_PATH:
+        parser.error(f"refusing to benchmark against the application database {DEFAULT_DB_PATH}")
+
+    startup, results = asyncio.run(main(args))
+    if args.json:
+        print(json.dumps({"startup": startup, "scenarios": results}, indent=2))
+    else:
+        _print_report(startup, results)
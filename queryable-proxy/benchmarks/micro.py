@@ -0,0 +1,79 @@
+"""
+Micro-benchmarks for hot pure-Python paths.
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --only merge_results --rows 100000
+"""
+import argparse
+import json
+import random
+import timeit
+from typing import Callable, Dict, List
+
+from core.guardrails import PLAN_CACHE, compile_safe_query
+from core.router import merge_results
+
+COMPILE_SQL = (
+    "SELECT f.name, COUNT(*) AS opens FROM files f JOIN share_logs s ON f.id = s.file_id "
+    "WHERE s.viewer_email = 'viewer{n}@example.com' AND s.opened_at >= '2025-01-{d:02d}' "
+    "GROUP BY f.name ORDER BY opens DESC LIMIT 20"
+)
+
+def _timeit(fn: Callable[[], object], number: int, repeat: int) -> Dict:
+    runs = timeit.repeat(fn, number=number, repeat=repeat)
+    per_op = [r / number for r in runs]
+    return {"ops": number, "best_us": min(per_op) * 1e6, "median_us": sorted(per_op)[len(per_op) // 2] * 1e6}
+
+def bench_compile_warm(number: int, repeat: int) -> Dict:
+    """Same query shape with new literals: plan cache hits."""
+    rng = random.Random(1)
+    statements = [COMPILE_SQL.format(n=rng.randrange(10000), d=rng.randrange(1, 29)) for _ in range(256)]
+    it = iter(range(10**12))
+    compile_safe_query(statements[0])
+    return _timeit(lambda: compile_safe_query(statements[next(it) % len(statements)]), number, repeat)
+
+def bench_compile_cold(number: int, repeat: int) -> Dict:
+    """Full parse, validation and regeneration on every call."""
+    def run():
+        PLAN_CACHE.clear()
+        compile_safe_query(COMPILE_SQL.format(n=7, d=1))
+    return _timeit(run, number, repeat)
+
+def _engagement_rows(rows: int, users: int, seed: int = 1):
+    rng = random.Random(seed)
+    file_stats = [{"email": f"viewer{rng.randrange(users)}@example.com", "opens": rng.randrange(1, 500)}
+                  for _ in range(rows)]
+    user_metrics = [{"email": f"viewer{i}@example.com", "engagement_score": rng.random(),
+                     "last_active": "2025-01-01"} for i in range(0, users, 2)]
+    return file_stats, user_metrics
+
+def bench_merge_results(number: int, repeat: int, rows: int) -> Dict:
+    file_stats, user_metrics = _engagement_rows(rows, max(rows // 4, 1))
+    result = _timeit(lambda: merge_results(file_stats, user_metrics, how="left"), number, repeat)
+    result["rows"] = rows
+    return result
+
+def run(only: List[str], rows: int, number: int, repeat: int) -> Dict[str, Dict]:
+    benches = {
+        "compile_safe_query_warm": lambda: bench_compile_warm(number * 10, repeat),
+        "compile_safe_query_cold": lambda: bench_compile_cold(number, repeat),
+        "merge_results": lambda: bench_merge_results(max(number // 10, 1), repeat, rows),
+    }
+    return {name: bench() for name, bench in benches.items() if not only or any(o in name for o in only)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for compile_safe_query and merge_results")
+    parser.add_argument("--only", action="append", default=[], help="run benchmarks whose name contains this")
+    parser.add_argument("--rows", type=int, default=10000, help="file_stats rows for merge_results")
+    parser.add_argument("--number", type=int, default=200, help="calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.only, args.rows, args.number, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, r in results.items():
+            extra = f"  ({r['rows']:,} rows)" if "rows" in r else ""
+            print(f"{name:<26} best {r['best_us']:>10.1f}us  median {r['median_us']:>10.1f}us{extra}")
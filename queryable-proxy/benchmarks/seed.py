@@ -0,0 +1,119 @@
+"""
+Seed a database with synthetic files / share_logs for benchmarking.
+
+    python -m benchmarks.seed --db /tmp/bench.db --scale medium     # 100k share_logs
+    python -m benchmarks.seed --db /tmp/bench.db --share-logs 10000000 --files 50000
+    PROXY_DB_PATH=/tmp/bench.db python -m benchmarks.seed --reset --scale large
+
+The target must be named explicitly; the application's own proxy.db is
+refused, since --reset deletes its rows.
+
+Data is generated from a fixed RNG seed, so the same arguments always
+produce the same database.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from core.database import DEFAULT_DB_PATH
+
+# share_logs rows per scale; files are 1% of that
+SCALES = {"small": 10_000, "medium": 100_000, "large": 1_000_000, "xl": 10_000_000}
+BATCH_SIZE = 50_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS share_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_id INTEGER NOT NULL,
+    viewer_email TEXT NOT NULL,
+    opened_at TEXT NOT NULL,
+    FOREIGN KEY(file_id) REFERENCES files(id)
+);
+"""
+
+EXTENSIONS = ("pdf", "xlsx", "docx", "pptx", "csv")
+
+def viewer_email(n: int) -> str:
+    return f"viewer{n}@example.com"
+
+def _files(rng: random.Random, count: int, start: datetime):
+    for i in range(count):
+        created = start + timedelta(seconds=rng.randrange(90 * 86400))
+        yield (f"file_{i + 1}.{rng.choice(EXTENSIONS)}", created.isoformat(timespec="seconds"))
+
+def _share_logs(rng: random.Random, count: int, files: int, viewers: int, days: int, now: datetime):
+    for _ in range(count):
+        # Skewed towards popular files and recent opens, like real traffic
+        file_id = min(int(rng.paretovariate(1.2)), files)
+        opened = now - timedelta(seconds=int(rng.expovariate(1 / (days * 86400 / 4))) % (days * 86400))
+        yield (file_id, viewer_email(rng.randrange(1, viewers + 1)), opened.isoformat(timespec="seconds"))
+
+def _insert(conn: sqlite3.Connection, sql: str, rows, total: int, label: str):
+    done = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            conn.executemany(sql, batch)
+            conn.commit()
+            done += len(batch)
+            batch.clear()
+            print(f"  {label}: {done:,}/{total:,}", end="\r", flush=True)
+    if batch:
+        conn.executemany(sql, batch)
+        conn.commit()
+        done += len(batch)
+    print(f"  {label}: {done:,}/{total:,}")
+
+def seed(path: str, files: int, share_logs: int, viewers: int, days: int = 30,
+         seed_value: int = 42, reset: bool = False):
+    rng = random.Random(seed_value)
+    now = datetime.utcnow().replace(microsecond=0)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = OFF")  # bulk load; durability is irrelevant here
+        conn.executescript(SCHEMA)
+        if reset:
+            conn.execute("DELETE FROM share_logs")
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM sqlite_sequence WHERE name IN ('files', 'share_logs')")
+            conn.commit()
+        started = time.perf_counter()
+        _insert(conn, "INSERT INTO files (name, created_at) VALUES (?, ?)",
+                _files(rng, files, now - timedelta(days=120)), files, "files")
+        _insert(conn, "INSERT INTO share_logs (file_id, viewer_email, opened_at) VALUES (?, ?, ?)",
+                _share_logs(rng, share_logs, files, viewers, days, now), share_logs, "share_logs")
+        conn.execute("ANALYZE")
+        conn.commit()
+        print(f"Seeded {path} in {time.perf_counter() - started:.1f}s")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed files/share_logs with synthetic data")
+    parser.add_argument("--db", default=os.getenv("PROXY_DB_PATH"), help="database file (default: PROXY_DB_PATH)")
+    parser.add_argument("--scale", choices=sorted(SCALES, key=SCALES.get), default="small")
+    parser.add_argument("--share-logs", type=int, help="share_logs rows (overrides --scale)")
+    parser.add_argument("--files", type=int, help="files rows (default: 1%% of share_logs)")
+    parser.add_argument("--viewers", type=int, default=5000, help="distinct viewer emails")
+    parser.add_argument("--days", type=int, default=30, help="spread opens over this many days")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="delete existing files/share_logs rows first")
+    args = parser.parse_args()
+    if not args.db:
+        parser.error("name the database to seed with --db or PROXY_DB_PATH")
+    if os.path.abspath(args.db) == DEFAULT_DB_PATH:
+        parser.error(f"refusing to seed the application database {DEFAULT_DB_PATH}")
+
+    rows = args.share_logs or SCALES[args.scale]
+    seed(os.path.abspath(args.db), args.files or max(rows // 100, 10), rows, args.viewers,
+         args.days, args.seed, args.reset)
@@ -0,0 +1,36 @@
+import io
+import json
+from typing import List
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # optional: only needed for Arrow responses
+    pa = None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+def arrow_available() -> bool:
+    return pa is not None
+
+def columnar_body(sql: str, params, names: List[str], columns: List[list]) -> dict:
+    """JSON body with one array per column, aligned with `columns` names."""
+    return {"sql": sql, "params": params, "columns": names, "data": columns}
+
+def _arrow_array(values: list):
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # SQLite columns may mix types; fall back to text
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+def arrow_ipc_bytes(sql: str, params, names: List[str], columns: List[list]) -> bytes:
+    """Serialize a result set as an Arrow IPC stream; sql/params go in schema metadata."""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    table = pa.Table.from_arrays([_arrow_array(c) for c in columns], names=names)
+    table = table.replace_schema_metadata({"sql": sql, "params": json.dumps(list(params), default=str)})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
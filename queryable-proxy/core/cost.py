@@ -0,0 +1,196 @@
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import expressions as exp
+
+from core.database import prepare_read, read_connection
+
+# Estimates are in "rows visited"; SQLite's own planner defaults are used
+# when no ANALYZE statistics exist: an index equality lookup yields ~10
+# rows and each range bound keeps ~1/4 of the table.
+EQ_LOOKUP_ROWS = 10
+RANGE_SELECTIVITY = 0.25
+UNKNOWN_TABLE_ROWS = 1000
+# Over budget by at most this factor: run downgraded instead of rejecting
+DOWNGRADE_FACTOR = 10.0
+STATS_TTL_SECONDS = 60.0
+ESTIMATE_CACHE_SIZE = 1024
+
+class QueryCostError(Exception):
+    pass
+
+@dataclass(frozen=True)
+class QueryBudget:
+    max_cost: float
+    timeout: float
+
+    def downgraded(self) -> "QueryBudget":
+        return QueryBudget(self.max_cost, self.timeout / 2)
+
+TIER_BUDGETS: Dict[str, QueryBudget] = {
+    "basic": QueryBudget(float(os.getenv("QUERY_MAX_COST_BASIC", "2e6")),
+                         float(os.getenv("QUERY_TIMEOUT_BASIC", "2"))),
+    "premium": QueryBudget(float(os.getenv("QUERY_MAX_COST_PREMIUM", "2e7")),
+                           float(os.getenv("QUERY_TIMEOUT_PREMIUM", "5"))),
+    "enterprise": QueryBudget(float(os.getenv("QUERY_MAX_COST_ENTERPRISE", "2e8")),
+                              float(os.getenv("QUERY_TIMEOUT_ENTERPRISE", "15"))),
+}
+
+def budget_for(tier: Optional[str]) -> QueryBudget:
+    return TIER_BUDGETS.get(tier or "basic", TIER_BUDGETS["basic"])
+
+_SCAN_RE = re.compile(r"^(SCAN|SEARCH) (\S+)(?: AS \S+)?(.*)$")
+
+# ----------------------------
+# Table statistics
+# ----------------------------
+_stats_lock = threading.Lock()
+_table_rows: Dict[str, Tuple[float, int]] = {}
+
+def _count_rows(conn, table: str) -> int:
+    try:
+        row = conn.execute(
+            "SELECT stat FROM sqlite_stat1 WHERE tbl = ? ORDER BY idx IS NOT NULL LIMIT 1", (table,)
+        ).fetchone()
+        if row is not None:
+            return int(row[0].split()[0])
+    except Exception:
+        pass  # no ANALYZE has been run
+    try:
+        # max(rowid) is an O(log n) stand-in for COUNT(*) on rowid tables
+        row = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()
+        return int(row[0] or 0)
+    except Exception:
+        return UNKNOWN_TABLE_ROWS
+
+def table_rows(conn, table: str) -> int:
+    now = time.monotonic()
+    with _stats_lock:
+        hit = _table_rows.get(table)
+    if hit and hit[0] > now:
+        return hit[1]
+    rows = _count_rows(conn, table)
+    with _stats_lock:
+        _table_rows[table] = (now + STATS_TTL_SECONDS, rows)
+    return rows
+
+# ----------------------------
+# Plan costing
+# ----------------------------
+def _loop_rows(conn, detail: str, aliases: Dict[str, str]) -> Tuple[float, float]:
+    """(rows produced per outer row, one-off setup cost) for a SCAN/SEARCH line."""
+    m = _SCAN_RE.match(detail)
+    if detail == "SCAN CONSTANT ROW":
+        return 1.0, 0.0
+    name = m.group(2)
+    table = aliases.get(name.lower(), name)
+    n = max(table_rows(conn, table), 1)
+    rest = m.group(3)
+    if m.group(1) == "SCAN":
+        return n, 0.0
+    if "INTEGER PRIMARY KEY (rowid=?)" in rest:
+        return 1.0, 0.0
+    setup = n if "AUTOMATIC" in rest else 0.0
+    terms = re.search(r"\(([^)]*)\)", rest)
+    conds = terms.group(1) if terms else ""
+    ranges = conds.count(">") + conds.count("<")
+    if "=" in conds.replace(">=", "").replace("<=", ""):
+        rows = min(n, EQ_LOOKUP_ROWS)
+    else:
+        rows = n
+    return max(rows * RANGE_SELECTIVITY ** ranges, 1.0), setup
+
+def _subtree_cost(conn, node: int, children: Dict[int, List[Tuple[int, str]]],
+                  aliases: Dict[str, str], outer: float) -> float:
+    """Cost of one query block: nested loops multiply, sub-blocks add."""
+    cost, rows = 0.0, 1.0
+    for child, detail in children.get(node, ()):
+        if _SCAN_RE.match(detail):
+            produced, setup = _loop_rows(conn, detail, aliases)
+            rows *= produced
+            cost += setup + outer * rows
+        elif detail.startswith("USE TEMP B-TREE"):
+            cost += outer * rows * math.log2(max(rows, 2))
+        elif detail.startswith("CORRELATED"):
+            cost += _subtree_cost(conn, child, children, aliases, outer * rows)
+        else:
+            cost += _subtree_cost(conn, child, children, aliases, outer)
+    return cost
+
+def _early_exit_limit(stmt: exp.Expression, params: tuple = ()) -> Optional[int]:
+    """
+    LIMIT of a plain SELECT that SQLite can stop early on: no filtering,
+    grouping, sorting or aggregation, so only ~LIMIT rows are visited.
+    """
+    if not isinstance(stmt, exp.Select) or not isinstance(stmt.args.get("limit"), exp.Limit):
+        return None
+    if any(stmt.args.get(k) for k in ("where", "group", "having", "order", "distinct")):
+        return None
+    if stmt.find(exp.AggFunc) or stmt.find(exp.Subquery):
+        return None
+    limit = stmt.args["limit"].expression
+    if isinstance(limit, exp.Placeholder) and params:
+        # LIMIT ? [OFFSET ?] closes the statement, so it binds the last params
+        value = params[-2 if stmt.args.get("offset") else -1]
+        return value if isinstance(value, int) else None
+    return int(limit.name) if isinstance(limit, exp.Literal) and limit.is_int else None
+
+def estimate_cost(conn, sql: str, params: tuple = ()) -> float:
+    """Estimated rows visited by `sql`, from EXPLAIN QUERY PLAN and table sizes."""
+    plan = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    children: Dict[int, List[Tuple[int, str]]] = {}
+    for node, parent, _, detail in plan:
+        children.setdefault(parent, []).append((node, detail))
+    try:
+        stmt = sqlglot.parse_one(sql, read="sqlite")
+    except Exception:
+        stmt = None
+    # "SCAN s" names the alias; map it back to the table for row counts
+    aliases = {t.alias.lower(): t.name for t in stmt.find_all(exp.Table) if t.alias} if stmt else {}
+    cost = _subtree_cost(conn, 0, children, aliases, 1.0)
+    limit = _early_exit_limit(stmt, params) if stmt else None
+    if limit is not None:
+        cost = min(cost, float(limit * len(plan)))
+    return cost
+
+_estimates_lock = threading.Lock()
+_estimates: Dict[Tuple[str, tuple], Tuple[float, float]] = {}
+
+def _cached_estimate(sql: str, params: tuple) -> float:
+    key = (sql, params)
+    now = time.monotonic()
+    with _estimates_lock:
+        hit = _estimates.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+    with read_connection() as conn:
+        cost = estimate_cost(conn, *prepare_read(conn, sql, params))  # the plan that will actually run
+    with _estimates_lock:
+        if len(_estimates) >= ESTIMATE_CACHE_SIZE:
+            _estimates.clear()
+        _estimates[key] = (now + STATS_TTL_SECONDS, cost)
+    return cost
+
+def admit(sql: str, params: tuple, tier: Optional[str]) -> Tuple[QueryBudget, float]:
+    """
+    Check `sql` against the tier's cost budget before running it.
+
+    Returns the runtime budget to execute under (halved when the estimate
+    is over budget but within DOWNGRADE_FACTOR) and the estimate; raises
+    QueryCostError when the plan is too expensive to run at all.
+    """
+    budget = budget_for(tier)
+    cost = _cached_estimate(sql, params)
+    if cost <= budget.max_cost:
+        return budget, cost
+    if cost <= budget.max_cost * DOWNGRADE_FACTOR:
+        return budget.downgraded(), cost
+    raise QueryCostError(
+        f"Estimated cost {cost:.3g} rows exceeds the {tier or 'basic'} tier limit of {budget.max_cost:.3g}"
+    )
@@ -1,16 +1,398 @@
+import asyncio
+import contextvars
+import os
+import queue
+import re
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from functools import partial
+from typing import Optional
 
-DB_PATH = "proxy.db"
+from core.metrics import span, sql_span
+
+# Use absolute path for DB_PATH (PROXY_DB_PATH points benchmarks at a scratch copy)
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "proxy.db")
+DB_PATH = os.path.abspath(os.getenv("PROXY_DB_PATH", DEFAULT_DB_PATH))
+
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+WRITE_POOL_SIZE = int(os.getenv("DB_WRITE_POOL_SIZE", "2"))
+POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+STREAM_CHUNK_SIZE = int(os.getenv("DB_STREAM_CHUNK_SIZE", "500"))
+BUSY_TIMEOUT_MS = 5000
+# Per-connection prepared statement cache (sqlite3 keys it by SQL text)
+STATEMENT_CACHE_SIZE = 256
+# SQLite VM instructions between deadline checks
+PROGRESS_HANDLER_OPS = 10000
+
+class PoolTimeoutError(Exception):
+    pass
+
+class QueryTimeoutError(Exception):
+    pass
+
+# Absolute time.monotonic() deadline for reads started in this context
+_query_deadline: contextvars.ContextVar = contextvars.ContextVar("query_deadline", default=None)
+
+@contextmanager
+def query_deadline(seconds: Optional[float]):
+    """Interrupt reads started inside this block once `seconds` have passed."""
+    token = _query_deadline.set(None if seconds is None else time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _query_deadline.reset(token)
+
+def _timed_out(e: sqlite3.Error, deadline: Optional[float]) -> Exception:
+    if deadline is not None and isinstance(e, sqlite3.OperationalError) and time.monotonic() >= deadline:
+        return QueryTimeoutError("Query exceeded its time budget and was cancelled")
+    return e
+
+_WRITE_TARGET_RE = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+[\"`\[]?(\w+)",
+    re.IGNORECASE,
+)
+
+# Callbacks invoked as fn(tables) after a commit that changed rows;
+# tables is None when the written tables are unknown.
+_write_listeners = []
+# base table -> tables derived from it in the database (e.g. by triggers)
+_derived_tables = {}
+
+# Rewrites applied on the connection just before a read runs, as
+# fn(conn, sql, params) -> (sql, params). They must not change the
+# result, since caches key on the SQL as it was before rewriting.
+_read_rewriters = []
+
+def on_write(callback):
+    _write_listeners.append(callback)
+    return callback
+
+def on_read(rewriter):
+    _read_rewriters.append(rewriter)
+    return rewriter
+
+def prepare_read(conn: sqlite3.Connection, sql: str, params: tuple = ()):
+    for rewrite in _read_rewriters:
+        sql, params = rewrite(conn, sql, params)
+    return sql, params
+
+def derived_table(name: str, source: str):
+    """Declare that writes to `source` also change `name`."""
+    _derived_tables.setdefault(source.lower(), set()).add(name.lower())
+
+def notify_write(tables=None):
+    if tables is not None:
+        tables = tuple(tables) + tuple(d for t in tables for d in sorted(_derived_tables.get(t.lower(), ())))
+    for callback in _write_listeners:
+        callback(tables)
+
+def written_table(sql: str):
+    m = _WRITE_TARGET_RE.match(sql)
+    return m.group(1).lower() if m else None
+
+class ConnectionPool:
+    """
+    Bounded pool of long-lived SQLite connections.
+
+    Connections are created lazily up to `size` and handed out LIFO so the
+    hottest ones (with warm statement caches) are reused first.
+    """
+
+    def __init__(self, path: str, size: int, read_only: bool = False):
+        self.path = path
+        self.size = size
+        self.read_only = read_only
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._waiting = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            target, uri = f"file:{self.path}?mode=ro", True
+        else:
+            target, uri = self.path, False
+        conn = sqlite3.connect(
+            target,
+            uri=uri,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,  # connections move between executor threads
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        if not self.read_only:
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def acquire(self, timeout: float = POOL_TIMEOUT_SECONDS) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                self._waiting += 1
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(f"No database connection available after {timeout}s")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def discard(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._created -= 1
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            created, waiting = self._created, self._waiting
+        idle = self._idle.qsize()
+        return {"size": self.size, "open": created, "in_use": created - idle, "waiting": waiting}
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(conn)
+
+_init_lock = threading.Lock()
+_pools = {}
+
+def _enable_wal(path: str):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+    finally:
+        conn.close()
+
+def _pool(name: str) -> ConnectionPool:
+    pool = _pools.get(name)
+    if pool is not None:
+        return pool
+    with _init_lock:
+        if not _pools:
+            # WAL lets readers proceed while a writer commits; it is a
+            # property of the database file, so switch before any reader opens
+            _enable_wal(DB_PATH)
+            _pools["write"] = ConnectionPool(DB_PATH, WRITE_POOL_SIZE)
+            _pools["read"] = ConnectionPool(DB_PATH, READ_POOL_SIZE, read_only=True)
+        return _pools[name]
+
+@contextmanager
+def read_connection():
+    """
+    Read-only (mode=ro) pooled connection. Inside query_deadline() a
+    progress handler interrupts statements that run past the deadline.
+    """
+    deadline = _query_deadline.get()
+    with _pool("read").connection() as conn:
+        if deadline is None:
+            yield conn
+            return
+        conn.set_progress_handler(lambda: time.monotonic() >= deadline, PROGRESS_HANDLER_OPS)
+        try:
+            yield conn
+        except sqlite3.Error as e:
+            error = _timed_out(e, deadline)
+            if error is e:
+                raise
+            raise error from e
+        finally:
+            conn.set_progress_handler(None, 0)
+
+def write_connection():
+    """Read-write pooled connection; commit explicitly."""
+    return _pool("write").connection()
+
+def warm_pools():
+    """Open the first read and write connections (and switch on WAL) now."""
+    with read_connection():
+        pass
+    with write_connection():
+        pass
+
+def pool_stats() -> dict:
+    return {name: pool.stats() for name, pool in _pools.items()}
+
+def close_pools():
+    with _init_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
 
 def run_sql(sql: str, params: tuple = ()):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute(sql, params)
-    rows = cur.fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+    with read_connection() as conn:
+        sql, params = prepare_read(conn, sql, params)
+        with sql_span(sql, params):
+            rows = conn.execute(sql, params).fetchall()
+    with span("row_conversion"):
+        return [dict(r) for r in rows]
+
+def run_sql_many(statements):
+    """
+    Run several read statements on one pooled connection. Each item is a
+    list of row dicts or the sqlite3.Error that statement raised.
+    """
+    results = []
+    deadline = _query_deadline.get()
+    with read_connection() as conn:
+        for sql, params in statements:
+            try:
+                sql, params = prepare_read(conn, sql, params)
+                with sql_span(sql, params):
+                    rows = conn.execute(sql, params).fetchall()
+                with span("row_conversion"):
+                    results.append([dict(r) for r in rows])
+            except sqlite3.Error as e:
+                results.append(_timed_out(e, deadline))
+    return results
+
+def iter_sql(sql: str, params: tuple = (), chunk_size: int = STREAM_CHUNK_SIZE):
+    """Yield lists of row dicts straight off the cursor with fetchmany()."""
+    with read_connection() as conn:
+        cur = conn.execute(*prepare_read(conn, sql, params))
+        try:
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [dict(r) for r in rows]
+        finally:
+            cur.close()
+
+def run_sql_columns(sql: str, params: tuple = (), chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Column-oriented variant of run_sql: returns (column_names, columns).
+
+    Reads plain tuples from the cursor and appends them to per-column lists,
+    so no per-row dicts are built.
+    """
+    with read_connection() as conn:
+        sql, params = prepare_read(conn, sql, params)
+        with sql_span(sql, params):
+            cur = conn.cursor()
+            cur.row_factory = None
+            cur.execute(sql, params)
+            names = [d[0] for d in cur.description or ()]
+            columns = [[] for _ in names]
+            appenders = [c.append for c in columns]
+            try:
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        for append, value in zip(appenders, row):
+                            append(value)
+            finally:
+                cur.close()
+    return names, columns
+
+@contextmanager
+def write_transaction(*tables: str):
+    """
+    Pooled write connection that commits on success and, if total_changes
+    moved, tells write listeners which tables were touched.
+    """
+    with write_connection() as conn:
+        before = conn.total_changes
+        yield conn
+        conn.commit()
+        if conn.total_changes != before:
+            notify_write(tuple(t.lower() for t in tables) or None)
+
+def execute_write(sql: str, params: tuple = ()) -> int:
+    """
+    Run a single write statement in its own transaction; returns lastrowid,
+    which is not the new id for share_logs when it is partitioned (see
+    core.partitions).
+    """
+    table = written_table(sql)
+    with write_transaction(*([table] if table else [])) as conn:
+        cur = conn.execute(sql, params)
+    return cur.lastrowid
+
+# ----------------------------
+# Async API
+# ----------------------------
+# A dedicated executor keeps database work off Starlette's shared
+# threadpool and never runs more jobs than there are connections.
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=READ_POOL_SIZE + WRITE_POOL_SIZE, thread_name_prefix="sqlite")
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking database function on the database executor."""
+    loop = asyncio.get_running_loop()
+    # Carry context (e.g. the query deadline) into the worker thread
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(DB_EXECUTOR, partial(ctx.run, fn, *args, **kwargs))
+
+async def run_sql_async(sql: str, params: tuple = ()):
+    return await run_db(run_sql, sql, params)
+
+async def run_sql_many_async(statements):
+    return await run_db(run_sql_many, statements)
+
+async def run_sql_columns_async(sql: str, params: tuple = ()):
+    return await run_db(run_sql_columns, sql, params)
+
+async def stream_sql(sql: str, params: tuple = (), chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Execute now and return an async iterator of row chunks.
+
+    The statement runs and the first chunk is fetched before this returns,
+    so SQL errors surface before any response bytes are sent.
+    """
+    rows = iter_sql(sql, params, chunk_size)
+    first = await run_db(next, rows, None)
+
+    async def chunks():
+        try:
+            chunk = first
+            while chunk is not None:
+                yield chunk
+                chunk = await run_db(next, rows, None)
+        finally:
+            await run_db(rows.close)
+
+    return chunks()
+
+async def execute_write_async(sql: str, params: tuple = ()) -> int:
+    return await run_db(execute_write, sql, params)
 
 def last_week_timestamp():
     return (datetime.utcnow() - timedelta(days=7)).isoformat()
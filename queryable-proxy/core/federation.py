@@ -0,0 +1,57 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+JoinSource = Callable[[], Awaitable[List[dict]]]
+
+def hash_join(left: List[dict], right: List[dict], key: str, how: str = "inner",
+              right_key: Optional[str] = None) -> List[tuple]:
+    """
+    Equi-join two row lists on left[key] == right[right_key or key].
+
+    The hash table is built on the smaller input and probed with the
+    larger one. Returns (left_row, right_row) pairs in left order; with
+    how="left", unmatched left rows pair with None. Rows whose key is None
+    never match (SQL semantics).
+    """
+    if how not in ("inner", "left"):
+        raise ValueError(f"Unsupported join type: {how}")
+    right_key = right_key or key
+
+    if len(right) <= len(left):
+        table: Dict[object, List[dict]] = {}
+        for r in right:
+            k = r.get(right_key)
+            if k is not None:
+                table.setdefault(k, []).append(r)
+        out = []
+        for l in left:
+            matches = table.get(l.get(key)) if l.get(key) is not None else None
+            if matches:
+                out.extend((l, r) for r in matches)
+            elif how == "left":
+                out.append((l, None))
+        return out
+
+    # Left is smaller: index left positions, probe with right, restore left order
+    index: Dict[object, List[int]] = {}
+    for i, l in enumerate(left):
+        k = l.get(key)
+        if k is not None:
+            index.setdefault(k, []).append(i)
+    matched: Dict[int, List[dict]] = {}
+    for r in right:
+        for i in index.get(r.get(right_key), ()):
+            matched.setdefault(i, []).append(r)
+    out = []
+    for i, l in enumerate(left):
+        if i in matched:
+            out.extend((l, r) for r in matched[i])
+        elif how == "left":
+            out.append((l, None))
+    return out
+
+async def federated_join(left_source: JoinSource, right_source: JoinSource, key: str,
+                         how: str = "inner", right_key: Optional[str] = None) -> List[tuple]:
+    """Fetch both sides concurrently, then hash_join them."""
+    left, right = await asyncio.gather(left_source(), right_source())
+    return hash_join(left, right, key, how, right_key)
@@ -1,14 +1,50 @@
 from __future__ import annotations
-from typing import Tuple, List
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple, List
+import logging
 import re
+import threading
 import sqlglot
 from sqlglot import expressions as exp
+from sqlglot.tokens import TokenType
 from core.schema_policy import ALLOWED_SCHEMA
 
 ALLOWED_TABLES = set(ALLOWED_SCHEMA.keys())
 ALLOWED_COLUMNS = {t: set(cols) for t, cols in ALLOWED_SCHEMA.items()}
 ALLOWED_JOIN_KEYS = {("share_logs","files"): ("file_id","id"), ("files","share_logs"): ("id","file_id")}
 MAX_LIMIT = 200
+# Added when a query has no LIMIT; core.pagination reads this literal as
+# "no LIMIT asked for"
+DEFAULT_LIMIT = 100
+PLAN_CACHE_SIZE = 1024
+
+logger = logging.getLogger(__name__)
+
+SQLITE = sqlglot.Dialect.get_or_raise("sqlite")
+
+# Checked in a single walk of the tree; first match wins
+FORBIDDEN_NODES = (
+    (exp.Insert, "INSERT not allowed"),
+    (exp.Update, "UPDATE not allowed"),
+    (exp.Delete, "DELETE not allowed"),
+    (exp.Create, "CREATE not allowed"),
+    (exp.Drop,   "DROP not allowed"),
+    (exp.With,   "CTE not allowed"),
+)
+_FORBIDDEN_TYPES = tuple(t for t, _ in FORBIDDEN_NODES)
+
+# Literal tokens are swapped for named markers before parsing so that the
+# position of every parameter in the generated SQL can be recovered.
+_LITERAL_TOKENS = (TokenType.STRING, TokenType.NUMBER)
+_MARKER = ":__lit{}"
+_MARKER_RE = re.compile(r":__lit(\d+)")
+# A string right after AS or after a complete operand is a column alias
+# (SELECT COUNT(*) AS 'cnt', SELECT 1 'one'); it names the column, so it
+# stays in the SQL and the parser turns it into a quoted identifier.
+_ALIAS_PRECEDERS = (TokenType.ALIAS, TokenType.R_PAREN, TokenType.NUMBER, TokenType.STRING,
+                    TokenType.VAR, TokenType.IDENTIFIER)
 
 class SqlGuardError(Exception):
     pass
@@ -18,12 +54,18 @@ def _assert(condition: bool, msg: str):
         raise SqlGuardError(msg)
 
 def _only_select(stmt: exp.Expression):
-    _assert(isinstance(stmt, exp.Select) or isinstance(stmt, exp.Subqueryable), "Only SELECT statements are allowed")
+    # exp.Query is what older sqlglot releases called exp.Subqueryable
+    _assert(isinstance(stmt, exp.Query), "Only SELECT statements are allowed")
 
 def _collect_tables(stmt: exp.Expression) -> List[str]:
+    """Single pass over the tree: reject forbidden nodes, collect table names."""
     tables = []
-    for t in stmt.find_all(exp.Table):
-        tables.append(t.this.name.lower())
+    for node in stmt.walk():
+        if isinstance(node, _FORBIDDEN_TYPES):
+            for node_type, msg in FORBIDDEN_NODES:
+                _assert(not isinstance(node, node_type), msg)
+        elif isinstance(node, exp.Table):
+            tables.append(node.this.name.lower())
     return list(dict.fromkeys(tables))  # unique, order preserved
 
 def _check_tables(tables: List[str]):
@@ -38,62 +80,179 @@ def _check_joins(stmt: exp.Expression):
     # Skip join validation for now
     pass
 
-def _extract_literals(stmt: exp.Expression):
-    """Find literal values to parameterize (numbers and quoted strings)."""
-    literals = []
-    for lit in stmt.find_all(exp.Literal):
-        if lit.is_string or lit.is_number:
-            literals.append(lit)
-    return literals
+def _literal_value(token):
+    if token.token_type == TokenType.STRING:
+        return token.text
+    try:
+        return int(token.text)
+    except ValueError:
+        return float(token.text)
+
+def _fingerprint(sql: str):
+    """
+    Tokenize once and strip literals: returns (shape key, literal tokens).
+    Queries that differ only in literal values share a shape key.
+    """
+    try:
+        tokens = SQLITE.tokenize(sql)
+    except Exception as e:
+        raise SqlGuardError(f"SQL parse error: {e}")
+    shape, literals = [], []
+    prev = None
+    for tok in tokens:
+        if tok.token_type == TokenType.STRING and prev is not None and prev.token_type in _ALIAS_PRECEDERS:
+            shape.append(f"'{tok.text}'")
+        elif tok.token_type in _LITERAL_TOKENS:
+            shape.append("?")
+            literals.append(tok)
+        else:
+            shape.append(tok.text)
+        prev = tok
+    return " ".join(shape), literals
 
-def _ensure_limit(stmt: exp.Expression):
-    """Ensure LIMIT exists and <= MAX_LIMIT; add if missing."""
+def _ensure_limit(stmt: exp.Expression) -> Optional[int]:
+    """
+    Keep the query's own LIMIT when it is a single literal, which bind()
+    clamps to [0, MAX_LIMIT], and return its literal index. Any other
+    LIMIT (missing, negative, an expression) becomes LIMIT DEFAULT_LIMIT.
+    """
     limit = stmt.args.get("limit")
-    if limit is None:
-        stmt.set("limit", exp.Limit(this=exp.Literal.number(min(100, MAX_LIMIT))))
-    else:
-        # Always set a safe limit
-        limit.set("this", exp.Literal.number(min(100, MAX_LIMIT)))
+    value = limit.expression if isinstance(limit, exp.Limit) else None
+    marker = _MARKER_RE.fullmatch(":" + value.name) if isinstance(value, exp.Placeholder) else None
+    if marker is not None:
+        return int(marker.group(1))
+    stmt.set("limit", exp.Limit(expression=exp.Literal.number(DEFAULT_LIMIT)))
+    return None
+
+def _clamp_limit(value) -> int:
+    # SQLite reads a negative LIMIT as "no limit"
+    try:
+        return max(0, min(int(value), MAX_LIMIT))
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+
+def requested_limit(limit: Optional[exp.Expression]) -> Optional[exp.Expression]:
+    """The LIMIT expression a query gave before _ensure_limit; None if it gave none."""
+    if not isinstance(limit, exp.Limit):
+        return None
+    value = limit.expression
+    if isinstance(value, exp.Literal) and value.is_int and int(value.name) == DEFAULT_LIMIT:
+        return None
+    return value
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """Validated, parameterized SQL for one query shape."""
+    sql: str = ""
+    # Index into the raw literal list for every ? in `sql`, in order
+    param_order: Tuple[int, ...] = ()
+    tables: Tuple[str, ...] = ()
+    error: Optional[str] = None
+    # Position in the bound params of the query's own LIMIT, if it has one
+    limit_param: Optional[int] = None
+
+    def bind(self, literals) -> tuple:
+        params = [_literal_value(literals[i]) for i in self.param_order]
+        if self.limit_param is not None:
+            params[self.limit_param] = _clamp_limit(params[self.limit_param])
+        return tuple(params)
+
+class PlanCache:
+    """Thread-safe LRU of QueryPlan keyed by literal-stripped token shape."""
+
+    def __init__(self, max_entries: int = PLAN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._plans: "OrderedDict[str, QueryPlan]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[QueryPlan]:
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._plans.move_to_end(key)
+            return plan
+
+    def put(self, key: str, plan: QueryPlan):
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._plans), "hits": self.hits, "misses": self.misses}
+
+PLAN_CACHE = PlanCache()
+
+def _build_plan(sql: str, literals) -> QueryPlan:
+    """Full parse + validation, done once per query shape."""
+    # Swap each literal for a numbered marker so we can tell, after LIMIT
+    # rewriting and regeneration, which literal every ? stands for.
+    parts, pos = [], 0
+    for i, tok in enumerate(literals):
+        parts.append(sql[pos:tok.start])
+        parts.append(_MARKER.format(i))
+        pos = tok.end + 1
+    parts.append(sql[pos:])
+    marked = "".join(parts)
+
+    try:
+        parsed = sqlglot.parse_one(marked, read="sqlite")
+    except Exception as e:
+        logger.debug("SQL parse error: %s, SQL: %s", e, sql)
+        raise SqlGuardError(f"SQL parse error: {e}")
+
+    try:
+        # Top-level must be a query; no DML/DDL/CTE anywhere in the tree
+        _only_select(parsed)
+        tables = _collect_tables(parsed)
+
+        # Tables & columns must be allowed
+        _check_tables(tables)
+        _check_columns(parsed)
+        _check_joins(parsed)
+    except SqlGuardError as e:
+        return QueryPlan(error=str(e))
+
+    # Ensure sane LIMIT
+    limit = _ensure_limit(parsed)
+
+    generated = parsed.sql(dialect="sqlite")
+    order = tuple(int(m) for m in _MARKER_RE.findall(generated))
+    return QueryPlan(sql=_MARKER_RE.sub("?", generated), param_order=order, tables=tuple(tables),
+                     limit_param=None if limit is None else order.index(limit))
 
 def compile_safe_query(sql: str) -> Tuple[str, tuple]:
     """
     Validate SQL, parameterize literals (?) and return (safe_sql, params).
+
+    Validation and SQL generation run once per query shape; later queries
+    that only differ in literal values re-bind parameters from the cache.
     """
     # Clean up the SQL - remove any @ characters that might cause issues
     sql = sql.replace('@', '')
-    
-    try:
-        parsed = sqlglot.parse_one(sql, read="sqlite")
-    except Exception as e:
-        print(f"SQL parse error: {e}, SQL: {sql}")
-        raise SqlGuardError(f"SQL parse error: {e}")
 
-    # Top-level must be SELECT (no UNION/CTE/etc.)
-    _only_select(parsed)
-
-    # Tables & columns must be allowed
-    tables = _collect_tables(parsed)
-    _check_tables(tables)
-    _check_columns(parsed)
-
-    # Only SELECT; block other statements
-    _assert(not list(parsed.find_all(exp.Insert)), "INSERT not allowed")
-    _assert(not list(parsed.find_all(exp.Update)), "UPDATE not allowed")
-    _assert(not list(parsed.find_all(exp.Delete)), "DELETE not allowed")
-    _assert(not list(parsed.find_all(exp.Create)), "CREATE not allowed")
-    _assert(not list(parsed.find_all(exp.Drop)),   "DROP not allowed")
-    _assert(not list(parsed.find_all(exp.With)),   "CTE not allowed")
-    _check_joins(parsed)
-
-    # Parameterize literals
-    params = []
-    for lit in _extract_literals(parsed):
-        # Replace literal with a parameter placeholder
-        params.append(lit.this if lit.is_string else lit.this)
-        lit.replace(exp.Parameter())
+    key, literals = _fingerprint(sql)
+    plan = PLAN_CACHE.get(key)
+    if plan is None:
+        plan = _build_plan(sql, literals)
+        PLAN_CACHE.put(key, plan)
 
-    # Ensure sane LIMIT
-    _ensure_limit(parsed)
+    if plan.error is not None:
+        raise SqlGuardError(plan.error)
+    return plan.sql, plan.bind(literals)
 
-    safe_sql = parsed.sql(dialect="sqlite")
-    return safe_sql, tuple(params)
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def tables_for(sql: str) -> Tuple[str, ...]:
+    """Tables referenced by an (already safe) SQL string; parsed once per text."""
+    return tuple(_collect_tables(sqlglot.parse_one(sql, read="sqlite")))
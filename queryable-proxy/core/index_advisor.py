@@ -0,0 +1,253 @@
+"""
+Index advisor: learns which SQL shapes actually run, explains them and
+recommends (or creates) indexes for the tables they scan.
+
+    python -m core.index_advisor            # print recommendations
+    python -m core.index_advisor --apply    # create them
+"""
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import expressions as exp
+
+from core.database import DB_EXECUTOR, read_connection, write_transaction
+from core.partitions import storage_tables
+
+MAX_INDEX_COLUMNS = 4
+MAX_TRACKED_SHAPES = 500
+FLUSH_EVERY_SECONDS = 30.0
+
+_AUTOMATIC_INDEX_RE = re.compile(r"USING AUTOMATIC (?:COVERING |PARTIAL )*INDEX \(([^)]*)\)")
+_RANGE_NODES = (exp.GT, exp.GTE, exp.LT, exp.LTE, exp.Between)
+
+@dataclass
+class IndexRecommendation:
+    table: str
+    columns: Tuple[str, ...]
+    reason: str
+    executions: int = 0
+    queries: List[str] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return "idx_" + self.table + "_" + "_".join(self.columns)
+
+    @property
+    def sql(self) -> str:
+        return f"CREATE INDEX IF NOT EXISTS {self.name} ON {self.table}({', '.join(self.columns)})"
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d.update(name=self.name, sql=self.sql)
+        return d
+
+# ----------------------------
+# Shape recording
+# ----------------------------
+_lock = threading.Lock()
+_pending: Counter = Counter()
+_last_flush = time.monotonic()
+# Set when a flush is submitted, cleared when it runs: one in flight at most
+_flush_scheduled = False
+
+def setup_advisor_table():
+    """Create query_shapes; runs at startup so reads never race the first flush."""
+    with write_transaction("query_shapes") as conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS query_shapes (
+            sql TEXT PRIMARY KEY,
+            executions INTEGER NOT NULL DEFAULT 0,
+            last_seen TEXT NOT NULL
+        )
+        """)
+
+def flush():
+    """Write buffered shape counts to the query_shapes table."""
+    global _last_flush, _flush_scheduled
+    with _lock:
+        batch = list(_pending.items())
+        _pending.clear()
+        _last_flush = time.monotonic()
+        _flush_scheduled = False
+    if not batch:
+        return
+    with write_transaction("query_shapes") as conn:
+        conn.executemany("""
+            INSERT INTO query_shapes (sql, executions, last_seen) VALUES (?, ?, datetime('now'))
+            ON CONFLICT(sql) DO UPDATE SET executions = executions + excluded.executions,
+                                           last_seen = excluded.last_seen
+        """, batch)
+
+def record(safe_sql: str):
+    """Count one execution of a (parameterized) SQL shape; cheap, flushed in the background."""
+    global _flush_scheduled
+    with _lock:
+        if safe_sql in _pending or len(_pending) < MAX_TRACKED_SHAPES:
+            _pending[safe_sql] += 1
+        due = not _flush_scheduled and time.monotonic() - _last_flush >= FLUSH_EVERY_SECONDS
+        if due:
+            _flush_scheduled = True
+    if due:
+        DB_EXECUTOR.submit(flush)
+
+def recorded_shapes(limit: int = 100) -> List[Tuple[str, int]]:
+    flush()
+    with read_connection() as conn:
+        rows = conn.execute(
+            "SELECT sql, executions FROM query_shapes ORDER BY executions DESC LIMIT ?", (limit,)
+        ).fetchall()
+    return [(r["sql"], r["executions"]) for r in rows]
+
+# ----------------------------
+# Analysis
+# ----------------------------
+def _count_placeholders(sql: str) -> int:
+    return len(re.findall(r"\?", re.sub(r"'(?:[^']|'')*'", "", sql)))
+
+def explain(conn, sql: str) -> List[str]:
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, [None] * _count_placeholders(sql)).fetchall()
+    return [r[3] for r in rows]
+
+def _table_info(conn, table: str):
+    cols = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    names = [c[1] for c in cols]
+    rowid = [c[1] for c in cols if c[5] == 1 and (c[2] or "").upper() == "INTEGER"]
+    indexes = []
+    for idx in conn.execute(f"PRAGMA index_list({table})").fetchall():
+        indexes.append(tuple(r[2] for r in conn.execute(f"PRAGMA index_info({idx[1]})").fetchall()))
+    return names, set(rowid), indexes
+
+def _column_roles(stmt: exp.Expression, aliases: Dict[str, str], columns_of: Dict[str, List[str]]):
+    """table -> {"eq": [...], "range": [...], "join": [...], "other": [...]} in first-seen order."""
+    roles: Dict[str, Dict[str, List[str]]] = {t: {"eq": [], "range": [], "join": [], "other": []}
+                                              for t in set(aliases.values())}
+
+    def owner(col: exp.Column) -> Optional[str]:
+        if col.table:
+            return aliases.get(col.table.lower())
+        matches = [t for t, cols in columns_of.items() if col.name in cols and t in roles]
+        return matches[0] if len(matches) == 1 else None
+
+    def add(col: exp.Column, role: str):
+        table = owner(col)
+        if table is not None and col.name not in roles[table][role]:
+            roles[table][role].append(col.name)
+
+    for cond in stmt.find_all(exp.EQ):
+        cols = [c for c in (cond.this, cond.expression) if isinstance(c, exp.Column)]
+        for c in cols:
+            add(c, "join" if len(cols) == 2 else "eq")
+    for cond in stmt.find_all(*_RANGE_NODES):
+        if isinstance(cond.this, exp.Column):
+            add(cond.this, "range")
+    for col in stmt.find_all(exp.Column):
+        add(col, "other")
+    return roles
+
+def _candidate(roles: Dict[str, List[str]], rowid: set) -> Tuple[str, ...]:
+    # constant equality first, then one range column, then join keys and
+    # other referenced columns so the index can cover the query
+    ordered = roles["eq"] + roles["range"][:1] + roles["join"] + roles["other"]
+    cols = [c for c in dict.fromkeys(ordered) if c not in rowid]
+    return tuple(cols[:MAX_INDEX_COLUMNS])
+
+def _covered(candidate: Tuple[str, ...], indexes) -> bool:
+    return any(idx[:len(candidate)] == candidate for idx in indexes)
+
+def analyze(conn, sql: str) -> List[IndexRecommendation]:
+    """Recommendations for one SQL string based on its current query plan."""
+    try:
+        stmt = sqlglot.parse_one(sql, read="sqlite")
+    except Exception:
+        return []
+    aliases = {}
+    storage = {}
+    for t in stmt.find_all(exp.Table):
+        name = t.name.lower()
+        aliases[(t.alias or name).lower()] = name
+        aliases[name] = name
+        storage[name] = storage_tables(conn, name)
+    # A partitioned table's plan scans its partitions: credit them to the
+    # table; they all share its columns and indexes
+    for name, tables in storage.items():
+        for table in tables:
+            aliases.setdefault(table.lower(), name)
+    info = {t: _table_info(conn, storage[t][0]) for t in set(aliases.values())}
+    columns_of = {t: i[0] for t, i in info.items()}
+    roles = _column_roles(stmt, aliases, columns_of)
+
+    recs = []
+    for detail in explain(conn, sql):
+        table, reason = None, None
+        m = _AUTOMATIC_INDEX_RE.search(detail)
+        if detail.startswith("SEARCH ") and m:
+            table = aliases.get(detail.split()[1].lower())
+            cols = tuple(c.split("=")[0].split(">")[0].split("<")[0].strip() for c in m.group(1).split(" AND "))
+            reason = f"automatic index built on every execution: {detail}"
+            candidate = cols
+        elif detail.startswith("SCAN ") and "INDEX" not in detail:
+            table = aliases.get(detail.split()[1].lower())
+            if table is None:
+                continue
+            r = roles[table]
+            if not set(r["eq"] + r["range"] + r["join"]) - info[table][1]:
+                continue  # nothing to seek on; a scan is the right plan
+            candidate = _candidate(r, info[table][1])
+            reason = f"full table scan: {detail}"
+        else:
+            continue
+        if table is None or not candidate or _covered(candidate, info[table][2]):
+            continue
+        recs.append(IndexRecommendation(table, candidate, reason))
+    return recs
+
+def advise(shapes: Optional[List[Tuple[str, int]]] = None) -> List[IndexRecommendation]:
+    """Merge per-shape recommendations, heaviest traffic first."""
+    shapes = recorded_shapes() if shapes is None else shapes
+    merged: Dict[Tuple[str, Tuple[str, ...]], IndexRecommendation] = {}
+    with read_connection() as conn:
+        for sql, executions in shapes:
+            for rec in analyze(conn, sql):
+                key = (rec.table, rec.columns)
+                if key not in merged:
+                    merged[key] = rec
+                merged[key].executions += executions
+                merged[key].queries.append(sql)
+    return sorted(merged.values(), key=lambda r: r.executions, reverse=True)
+
+def apply(recommendations: List[IndexRecommendation]) -> List[str]:
+    """Create the recommended indexes; returns the statements run."""
+    applied = []
+    for rec in recommendations:
+        with write_transaction(rec.table) as conn:
+            for table in storage_tables(conn, rec.table):
+                stmt = replace(rec, table=table).sql
+                conn.execute(stmt)
+                applied.append(stmt)
+    if applied:
+        with write_transaction() as conn:
+            conn.execute("PRAGMA optimize")
+    return applied
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recommend indexes from recorded query shapes")
+    parser.add_argument("--apply", action="store_true", help="create the recommended indexes")
+    parser.add_argument("--sql", action="append", default=[], help="analyze this SQL instead of recorded shapes")
+    args = parser.parse_args()
+
+    setup_advisor_table()
+    recs = advise([(s, 1) for s in args.sql] if args.sql else None)
+    if not recs:
+        print("No index recommendations.")
+    for rec in recs:
+        print(f"{rec.sql};  -- {rec.executions} executions, {rec.reason}")
+    if args.apply:
+        for stmt in apply(recs):
+            print(f"created: {stmt}")
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Iterable, List, Optional, Tuple
+
+from core.database import run_db, write_transaction
+from core.scheduler import OverloadedError
+
+logger = logging.getLogger(__name__)
+
+# Events accepted but not yet committed; submissions beyond this get 503
+INGEST_QUEUE_MAX_EVENTS = int(os.getenv("INGEST_QUEUE_MAX_EVENTS", "100000"))
+# Rows per transaction: bigger groups amortize the commit, smaller ones
+# keep each write lock (and the cache invalidation after it) short
+INGEST_BATCH_MAX_EVENTS = int(os.getenv("INGEST_BATCH_MAX_EVENTS", "5000"))
+# How long the writer waits for more events before committing a group
+INGEST_LINGER_SECONDS = float(os.getenv("INGEST_LINGER_MS", "20")) / 1000
+
+INSERT_SHARE_LOG = "INSERT INTO share_logs (file_id, viewer_email, opened_at) VALUES (?, ?, ?)"
+
+Row = Tuple[int, str, str]
+
+def share_log_row(file_id: int, viewer_email: str, opened_at: Optional[datetime] = None) -> Row:
+    """Row in the stored format: naive UTC ISO-8601 timestamps, lower-cased emails."""
+    if opened_at is None:
+        opened_at = datetime.utcnow()
+    elif opened_at.tzinfo is not None:
+        opened_at = opened_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return int(file_id), viewer_email.strip().lower(), opened_at.isoformat()
+
+def write_share_logs(rows: List[Row], durable: bool = False) -> int:
+    """
+    Insert rows in one transaction. Triggers keep the rollups in step and
+    the commit invalidates cached results over share_logs and its rollups.
+    `durable` commits with synchronous=FULL, so the rows survive power loss
+    and not just a process crash.
+    """
+    with write_transaction("share_logs") as conn:
+        if durable:
+            conn.execute("PRAGMA synchronous = FULL")
+        try:
+            conn.executemany(INSERT_SHARE_LOG, rows)
+            if durable:
+                conn.commit()
+        except BaseException:
+            # synchronous cannot change inside a transaction, so end it
+            # first or the reset below would replace the real error
+            conn.rollback()
+            raise
+        finally:
+            if durable:
+                conn.execute("PRAGMA synchronous = NORMAL")
+    return len(rows)
+
+class _Submission:
+    __slots__ = ("rows", "durable", "done")
+
+    def __init__(self, rows: List[Row], durable: bool, done: Optional[asyncio.Future]):
+        self.rows = rows
+        self.durable = durable
+        self.done = done
+
+class ShareLogIngester:
+    """
+    Single writer for share_logs. Submissions queue in memory; one task
+    drains them, grouping many submissions into each executemany
+    transaction, so concurrent producers never contend for the write lock.
+    """
+
+    def __init__(self, max_queued: int = INGEST_QUEUE_MAX_EVENTS, batch_max: int = INGEST_BATCH_MAX_EVENTS,
+                 linger: float = INGEST_LINGER_SECONDS):
+        self.max_queued = max_queued
+        self.batch_max = batch_max
+        self.linger = linger
+        self._queue: Deque[_Submission] = deque()
+        self._queued = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._stats = {"accepted": 0, "committed": 0, "transactions": 0, "rejected": 0, "failed": 0,
+                       "last_commit_seconds": 0.0}
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="share-log-ingest")
+
+    async def stop(self):
+        """Commit everything queued, then stop the writer."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def submit(self, rows: List[Row], durable: bool = False) -> int:
+        """
+        Queue rows for the writer. Returns once queued, or with `durable`
+        once they are committed with synchronous=FULL.
+        """
+        if not rows:
+            return 0
+        if self._stopping:
+            raise OverloadedError("Ingest is shutting down")
+        if self._queued + len(rows) > self.max_queued:
+            self._stats["rejected"] += len(rows)
+            raise OverloadedError("Ingest queue is full", retry_after=max(self.linger * 10, 1.0))
+        self.start()
+        done = asyncio.get_running_loop().create_future() if durable else None
+        self._queue.append(_Submission(rows, durable, done))
+        self._queued += len(rows)
+        self._stats["accepted"] += len(rows)
+        self._wakeup.set()
+        if done is not None:
+            await done
+        return len(rows)
+
+    def _take(self) -> List[_Submission]:
+        group, size = [], 0
+        while self._queue and (not group or size + len(self._queue[0].rows) <= self.batch_max):
+            submission = self._queue.popleft()
+            group.append(submission)
+            size += len(submission.rows)
+        return group
+
+    async def _commit(self, group: List[_Submission]):
+        rows = [r for s in group for r in s.rows]
+        durable = any(s.durable for s in group)
+        started = time.perf_counter()
+        try:
+            await run_db(write_share_logs, rows, durable)
+        except Exception as e:
+            self._stats["failed"] += len(rows)
+            logger.exception("share_logs ingest of %d rows failed", len(rows))
+            for s in group:
+                if s.done is not None and not s.done.done():
+                    s.done.set_exception(e)
+        else:
+            self._stats["committed"] += len(rows)
+            self._stats["transactions"] += 1
+            self._stats["last_commit_seconds"] = time.perf_counter() - started
+            for s in group:
+                if s.done is not None and not s.done.done():
+                    s.done.set_result(len(s.rows))
+        finally:
+            self._queued -= len(rows)
+
+    async def _run(self):
+        while not self._stopping:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self.linger and self._queued < self.batch_max and not self._stopping:
+                await asyncio.sleep(self.linger)  # let concurrent producers join the group
+            while self._queue:
+                await self._commit(self._take())
+
+    def stats(self) -> dict:
+        return dict(self._stats, queued=self._queued, max_queued=self.max_queued,
+                    running=self._task is not None and not self._task.done())
+
+INGESTER = ShareLogIngester()
+
+async def ingest_share_logs(events: Iterable[Tuple], durable: bool = False) -> int:
+    """Python API: queue (file_id, viewer_email[, opened_at]) events for the writer."""
+    return await INGESTER.submit([share_log_row(*e) for e in events], durable=durable)
@@ -0,0 +1,267 @@
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Matches must score above this or they go to the LLM; 1 or more disables templates
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.8"))
+MAX_TEMPLATE_LIMIT = 200
+
+# Question framing that never changes what is asked. Negations, comparison
+# words and words that introduce a constraint ("for pdfs", "of 2023") must
+# NOT be listed here.
+_FILLER = frozenset("""
+a an the please show me give list get find tell what which who are is was were
+can could you i we want would like to see display return my our
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9_%+\-]+(?:[.@][a-z0-9_%+\-]+)*")
+
+def normalize(question: str) -> str:
+    """Lower-cased tokens joined by single spaces; keeps emails and ISO dates whole."""
+    text = unicodedata.normalize("NFKC", question).lower()
+    return " ".join(_TOKEN_RE.findall(text))
+
+# ----------------------------
+# Slot extractors
+# ----------------------------
+_ISO_DATE = r"\d{4}-\d{2}-\d{2}"
+_RANGE = (rf"today|yesterday|(?:this|last) (?:week|month)|(?:in )?(?:the )?(?:last|past) \d+ days?"
+          rf"|since {_ISO_DATE}|on {_ISO_DATE}|between {_ISO_DATE} and {_ISO_DATE}")
+
+def _today() -> date:
+    # SQLite's date('now') is UTC
+    return datetime.utcnow().date()
+
+def _number(text: str) -> Dict[str, object]:
+    n = int(text)
+    if n >= 1 << 63:
+        raise ValueError(f"{text} does not fit an SQLite integer")  # the LLM gets the question
+    return {"n": n}
+
+def _email(text: str) -> Dict[str, object]:
+    return {"email": text}
+
+def _date_range(text: str) -> Dict[str, object]:
+    """Half-open [start, end) day range as ISO dates."""
+    today = _today()
+    tomorrow = today + timedelta(days=1)
+    dates = [date.fromisoformat(d) for d in re.findall(_ISO_DATE, text)]
+    if text == "today":
+        start, end = today, tomorrow
+    elif text == "yesterday":
+        start, end = today - timedelta(days=1), today
+    elif text == "this week":
+        start, end = today - timedelta(days=7), tomorrow  # same window as date('now', '-7 days')
+    elif text == "last week":
+        start, end = today - timedelta(days=14), today - timedelta(days=7)
+    elif text == "this month":
+        start, end = today.replace(day=1), tomorrow
+    elif text == "last month":
+        end = today.replace(day=1)
+        start = (end - timedelta(days=1)).replace(day=1)
+    elif text.startswith("since"):
+        start, end = dates[0], date.max
+    elif text.startswith("on"):
+        start, end = dates[0], dates[0] + timedelta(days=1)
+    elif text.startswith("between"):
+        start, end = min(dates), max(dates) + timedelta(days=1)
+    else:  # last/past N days
+        start, end = today - timedelta(days=int(re.search(r"\d+", text).group())), tomorrow
+    return {"start": start.isoformat(), "end": end.isoformat()}
+
+@dataclass(frozen=True)
+class SlotKind:
+    pattern: str
+    extract: Callable[[str], Dict[str, object]]
+
+SLOT_KINDS: Dict[str, SlotKind] = {
+    "n": SlotKind(r"\d+", _number),
+    "email": SlotKind(r"[a-z0-9_%+\-.]+@[a-z0-9\-]+(?:\.[a-z0-9\-]+)+", _email),
+    "range": SlotKind(_RANGE, _date_range),
+}
+
+# ----------------------------
+# Templates
+# ----------------------------
+@dataclass(frozen=True)
+class Intent:
+    """
+    Parameterized SQL answering one recurring question.
+
+    `patterns` are phrasings over normalized text where {n}, {email} and
+    {range} capture slots and a trailing ? ({range?}) makes one optional.
+    `params` names the values bound to the SQL's ? placeholders in order
+    (range gives start and end); `defaults` fills optional slots.
+    """
+    name: str
+    patterns: Tuple[str, ...]
+    sql: str
+    params: Tuple[str, ...] = ()
+    defaults: Dict[str, object] = field(default_factory=dict)
+
+_ALL_TIME = {"start": "0000-01-01", "end": date.max.isoformat()}
+_IN_RANGE = "s.opened_at >= date(?) AND s.opened_at < date(?)"
+
+INTENTS: List[Intent] = [
+    Intent(
+        "top_files_by_opens",
+        ("top {n?} files by opens {range?}", "{n?} most opened files {range?}"),
+        "SELECT f.name, COUNT(*) AS open_count FROM files f JOIN share_logs s ON f.id = s.file_id "
+        f"WHERE {_IN_RANGE} GROUP BY f.name ORDER BY open_count DESC LIMIT ?",
+        ("start", "end", "n"),
+        {"n": 10, **_ALL_TIME},
+    ),
+    Intent(
+        "files_opened_more_than",
+        ("files? (?:(?:that|which) )?(?:(?:were|was|have been|has been) )?opened (?:more than|over) {n} times {range?}",),
+        "SELECT f.name, COUNT(s.id) AS opens FROM files f JOIN share_logs s ON s.file_id = f.id "
+        f"WHERE {_IN_RANGE} GROUP BY f.id HAVING COUNT(s.id) > ? ORDER BY opens DESC LIMIT 200",
+        ("start", "end", "n"),
+        dict(_ALL_TIME),
+    ),
+    Intent(
+        "file_open_count",
+        ("how many times (?:was|has) file {n} (?:been )?opened {range?}", "how many opens (?:did|does) file {n} have {range?}"),
+        f"SELECT COUNT(*) AS opens FROM share_logs s WHERE s.file_id = ? AND {_IN_RANGE}",
+        ("n", "start", "end"),
+        dict(_ALL_TIME),
+    ),
+    Intent(
+        "file_viewers",
+        ("who (?:viewed|opened) file {n} {range?}", "viewers of file {n} {range?}"),
+        f"SELECT DISTINCT s.viewer_email FROM share_logs s WHERE s.file_id = ? AND {_IN_RANGE} "
+        "ORDER BY s.viewer_email LIMIT 200",
+        ("n", "start", "end"),
+        dict(_ALL_TIME),
+    ),
+    Intent(
+        "viewer_files",
+        ("files did {email} open {range?}", "files (?:opened|viewed) by {email} {range?}"),
+        "SELECT f.name, s.opened_at FROM files f JOIN share_logs s ON f.id = s.file_id "
+        f"WHERE s.viewer_email = ? AND {_IN_RANGE} ORDER BY s.opened_at DESC LIMIT 200",
+        ("email", "start", "end"),
+        dict(_ALL_TIME),
+    ),
+    Intent(
+        "file_name",
+        ("name of file {n}", "file {n} name"),
+        "SELECT name FROM files WHERE id = ?",
+        ("n",),
+    ),
+    Intent(
+        "top_viewers",
+        ("top {n?} (?:viewers|users) by opens {range?}", "{n?} most active (?:viewers|users) {range?}"),
+        "SELECT s.viewer_email, COUNT(*) AS open_count FROM share_logs s "
+        f"WHERE {_IN_RANGE} GROUP BY s.viewer_email ORDER BY open_count DESC LIMIT ?",
+        ("start", "end", "n"),
+        {"n": 10, **_ALL_TIME},
+    ),
+]
+
+@dataclass(frozen=True)
+class IntentMatch:
+    intent: Intent
+    sql: str
+    params: tuple
+    confidence: float
+
+# ----------------------------
+# Matcher
+# ----------------------------
+_SLOT_RE = re.compile(r"( ?)\{(\w+)(\?)?\}")
+
+def _compile_pattern(pattern: str, prefix: str, slots: Dict[str, str]) -> str:
+    """Regex for one phrasing; slot groups are named <prefix>_<slot>."""
+    out, pos = [], 0
+    for m in _SLOT_RE.finditer(pattern):
+        out.append(pattern[pos:m.start()])
+        lead, name, optional = m.group(1), m.group(2), m.group(3)
+        group = f"{prefix}_{name}"
+        slots[group] = name
+        capture = f"(?P<{group}>{SLOT_KINDS[name].pattern})"
+        pos = m.end()
+        if not optional:
+            out.append(lead + capture)
+        elif lead or pattern[pos:pos + 1] != " ":
+            out.append(f"(?:{lead}{capture})?")
+        else:
+            # Leading optional slot: it drops out with the space after it
+            out.append(f"(?:{capture} )?")
+            pos += 1
+    out.append(pattern[pos:])
+    return "".join(out)
+
+class IntentMatcher:
+    """
+    All phrasings of all intents compiled into one alternation, so a
+    question is scanned once. Confidence is the share of the question's
+    content words (filler excluded) the matched phrasing accounts for.
+    """
+
+    def __init__(self, intents: List[Intent], min_confidence: float = INTENT_MIN_CONFIDENCE):
+        self.intents = intents
+        self.min_confidence = min_confidence
+        self._alternatives: Dict[str, Tuple[Intent, Dict[str, str]]] = {}
+        branches = []
+        for i, intent in enumerate(intents):
+            for j, pattern in enumerate(intent.patterns):
+                name = f"i{i}p{j}"
+                slots: Dict[str, str] = {}
+                branches.append(f"(?P<{name}>{_compile_pattern(pattern, name, slots)})")
+                self._alternatives[name] = (intent, slots)
+        self._regex = re.compile(r"(?<![\w@.])(?:" + "|".join(branches) + r")(?![\w@])")
+        self._lock = threading.Lock()
+        self._stats = {"matched": 0, "low_confidence": 0, "unmatched": 0}
+        self._by_intent: Dict[str, int] = {}
+
+    def _best(self, text: str):
+        best, best_score = None, 0.0
+        content = [t for t in text.split() if t not in _FILLER]
+        for m in self._regex.finditer(text):
+            inside = len([t for t in m.group(0).split() if t not in _FILLER])
+            score = inside / len(content) if content else 0.0
+            if score > best_score:
+                best, best_score = m, score
+        return best, best_score
+
+    def match(self, question: str) -> Optional[IntentMatch]:
+        """The best confident template match for `question`, or None."""
+        best, confidence = self._best(normalize(question))
+        if best is None or confidence <= self.min_confidence:
+            self._count("low_confidence" if best is not None else "unmatched")
+            return None
+        intent, slots = self._alternatives[best.lastgroup]  # the outermost group closes last
+        values = dict(intent.defaults)
+        try:
+            for group, slot in slots.items():
+                text = best.group(group)
+                if text is not None:
+                    values.update(SLOT_KINDS[slot].extract(text))
+        except (ValueError, OverflowError):
+            # since 2024-02-30, last 99999999 days: let the LLM have it
+            self._count("unmatched")
+            return None
+        if "n" in values and "LIMIT ?" in intent.sql:
+            values["n"] = min(int(values["n"]), MAX_TEMPLATE_LIMIT)
+        self._count("matched", intent.name)
+        return IntentMatch(intent, intent.sql, tuple(values[p] for p in intent.params), confidence)
+
+    def _count(self, outcome: str, intent: Optional[str] = None):
+        with self._lock:
+            self._stats[outcome] += 1
+            if intent is not None:
+                self._by_intent[intent] = self._by_intent.get(intent, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, intents=dict(self._by_intent))
+
+INTENT_MATCHER = IntentMatcher(INTENTS)
+INTENTS_BY_NAME: Dict[str, Intent] = {i.name: i for i in INTENTS}
+
+def match_intent(question: str) -> Optional[IntentMatch]:
+    return INTENT_MATCHER.match(question)
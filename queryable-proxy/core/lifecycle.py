@@ -0,0 +1,89 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.database import DB_PATH, run_db
+from core.metrics import register_collector
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers fall back to racing on idempotent DDL
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Taken as early as the first import of this module, i.e. process start
+PROCESS_STARTED = time.monotonic()
+# Workers of one deployment serialize schema setup on this file
+INIT_LOCK_PATH = os.getenv("INIT_LOCK_PATH", DB_PATH + ".init.lock")
+
+# (name, fn, exclusive) in registration order
+_steps: List[Tuple[str, Callable[[], object], bool]] = []
+_timings: Dict[str, float] = {}
+_ready_at: Optional[float] = None
+_run_lock = threading.Lock()
+
+def on_startup(name: str, exclusive: bool = False):
+    """
+    Register `fn` to run once per process when the app starts rather than
+    at import. `exclusive` steps (schema changes, backfills) hold a
+    file lock so concurrent workers run them one at a time; they must be
+    idempotent, since every worker still runs them.
+    """
+    def register(fn):
+        _steps.append((name, fn, exclusive))
+        return fn
+    return register
+
+@contextmanager
+def _exclusive():
+    if fcntl is None:
+        yield
+        return
+    with open(INIT_LOCK_PATH, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _run_steps():
+    global _ready_at
+    with _run_lock:
+        if _ready_at is not None:
+            return
+        for name, fn, exclusive in _steps:
+            started = time.perf_counter()
+            if exclusive:
+                with _exclusive():
+                    fn()
+            else:
+                fn()
+            _timings[name] = time.perf_counter() - started
+            logger.debug("startup step %s took %.3fs", name, _timings[name])
+        _ready_at = time.monotonic()
+        logger.info("worker %d ready %.3fs after start", os.getpid(), _ready_at - PROCESS_STARTED)
+
+async def run_startup():
+    """Run the registered steps (once per process) off the event loop."""
+    if _ready_at is None:
+        await run_db(_run_steps)
+
+def startup_stats() -> dict:
+    return {
+        "pid": os.getpid(),
+        "ready": _ready_at is not None,
+        "cold_start_seconds": _ready_at - PROCESS_STARTED if _ready_at is not None else None,
+        "steps": dict(_timings),
+    }
+
+@register_collector
+def _startup_gauges():
+    yield "startup_step_seconds", "Time each startup step took in this worker", [
+        ({"step": name}, seconds) for name, seconds in _timings.items()
+    ]
+    if _ready_at is not None:
+        yield "startup_cold_start_seconds", "Process start to ready", [({}, _ready_at - PROCESS_STARTED)]
@@ -0,0 +1,119 @@
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Slow-query log: off unless SLOW_QUERY_SECONDS is set
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "0")) or None
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+
+slow_query_logger = logging.getLogger("queryable_proxy.slow_query")
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], List] = {}  # labels -> [bucket counts, sum, count]
+
+    def observe(self, value: float, *labels: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for labels, (counts, total, count) in sorted(snapshot.items()):
+            names = self.label_names + ("le",)
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (f'{bound:g}',))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+STAGE_SECONDS = Histogram("query_stage_seconds", "Time spent per /query pipeline stage", labels=("stage",))
+_histograms: List[Histogram] = [STAGE_SECONDS]
+
+def register_histogram(histogram: Histogram) -> Histogram:
+    _histograms.append(histogram)
+    return histogram
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block into STAGE_SECONDS{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+def _log_if_slow(sql: str, params: tuple, seconds: float):
+    if SLOW_QUERY_SECONDS is None or seconds < SLOW_QUERY_SECONDS:
+        return
+    if SLOW_QUERY_SAMPLE_RATE < 1.0 and random.random() >= SLOW_QUERY_SAMPLE_RATE:
+        return
+    slow_query_logger.warning("slow query %.3fs sql=%r params=%r", seconds, sql, params)
+
+@contextmanager
+def sql_span(sql: str, params: tuple = ()):
+    """span("sql_execute") that also feeds the sampled slow-query log."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, "sql_execute")
+        _log_if_slow(sql, params, elapsed)
+
+# ----------------------------
+# Gauges from stats collectors
+# ----------------------------
+# A collector returns (metric name, help, [(labels dict, value), ...]) tuples
+Collector = Callable[[], Iterable[Tuple[str, str, List[Tuple[Dict[str, str], float]]]]]
+_collectors: List[Collector] = []
+
+def register_collector(collector: Collector) -> Collector:
+    _collectors.append(collector)
+    return collector
+
+def render_metrics() -> str:
+    lines = [line for histogram in _histograms for line in histogram.render()]
+    for collector in _collectors:
+        for name, help, samples in collector():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                names = tuple(labels)
+                lines.append(f"{name}{_labels(names, tuple(labels[n] for n in names))} {float(value):g}")
+    return "\n".join(lines) + "\n"
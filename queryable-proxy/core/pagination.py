@@ -0,0 +1,335 @@
+"""
+Keyset pagination for query results.
+
+A page query orders by the query's own ORDER BY plus a unique tiebreaker
+(the row ids of its tables, its GROUP BY keys, or its DISTINCT columns),
+projects those keys as hidden __kN columns and resumes after the last
+row's keys with a WHERE (or HAVING) predicate. No page rescans the rows
+before it, which OFFSET would. The query's own LIMIT caps the total
+across pages.
+
+Cursors name the query and carry the resume point, signed with
+HMAC-SHA256, so the next page needs neither the LLM nor server state.
+The query is rebuilt on every page: generated SQL is compiled (and so
+validated) again, templates are looked up by name; a cursor is never
+trusted to hold runnable SQL.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import time
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import sqlglot
+from sqlglot import expressions as exp
+from sqlglot.tokens import TokenType
+
+from core.guardrails import ALLOWED_COLUMNS, MAX_LIMIT, PLAN_CACHE_SIZE, SQLITE, requested_limit
+from core.schema_policy import NOT_NULL_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = int(os.getenv("QUERY_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = MAX_LIMIT
+CURSOR_TTL_SECONDS = float(os.getenv("QUERY_CURSOR_TTL_SECONDS", "3600"))
+# Signs cursors; every worker needs the same one (openssl rand -hex 32).
+# Unset, each process picks a random key and only accepts its own cursors.
+CURSOR_SECRET = os.getenv("QUERY_CURSOR_SECRET", "")
+MIN_CURSOR_SECRET_LENGTH = 32
+
+KEY_COLUMN = "__k{}"
+_PARAM = ":__p{}"
+_AFTER = ":__a{}"
+_SIZE = ":__n"
+_MARKER_RE = re.compile(r":__(p|a)(\d+)|:__n\b")
+
+class CursorError(Exception):
+    pass
+
+# ----------------------------
+# Page shapes
+# ----------------------------
+@dataclass(frozen=True)
+class _Key:
+    sql: str
+    desc: bool
+    nulls_first: bool
+    nullable: bool = True
+
+    def beyond(self, value: str, null: bool) -> Optional[str]:
+        """Rows sorting strictly after `value`; None if none can."""
+        if null:
+            return f"({self.sql}) IS NOT NULL" if self.nulls_first else None
+        cmp = f"({self.sql}) {'<' if self.desc else '>'} {value}"
+        return cmp if self.nulls_first or not self.nullable else f"({cmp} OR ({self.sql}) IS NULL)"
+
+@dataclass(frozen=True)
+class _Shape:
+    sql: str  # keys projected and ordered by, no LIMIT; :__pN for the Nth parameter
+    keys: Tuple[_Key, ...]
+    having: bool  # resume predicate goes in HAVING (grouped queries)
+    params: int
+    cap: Optional[Tuple[str, int]]  # ("param", index) or ("value", n): the query's own LIMIT
+
+def _mark(sql: str) -> Optional[Tuple[str, int]]:
+    """`sql` with its ? placeholders numbered as :__pN, and their count."""
+    try:
+        tokens = SQLITE.tokenize(sql)
+    except Exception:
+        return None
+    parts, pos, count = [], 0, 0
+    for tok in tokens:
+        if tok.token_type == TokenType.PLACEHOLDER:
+            if tok.text != "?":
+                return None
+            parts += [sql[pos:tok.start], _PARAM.format(count)]
+            pos, count = tok.end + 1, count + 1
+    parts.append(sql[pos:])
+    return "".join(parts), count
+
+def _resolve(node: exp.Expression, select: exp.Select) -> exp.Expression:
+    """ORDER BY / GROUP BY term as an expression: output aliases and ordinals resolved."""
+    projections = select.expressions
+    if isinstance(node, exp.Literal) and node.is_int and 0 < int(node.name) <= len(projections):
+        node = projections[int(node.name) - 1]
+    elif isinstance(node, exp.Column) and not node.table:
+        node = next((p for p in projections if isinstance(p, exp.Alias) and p.alias.lower() == node.name.lower()), node)
+    return node.this if isinstance(node, exp.Alias) else node
+
+def _cap(select: exp.Select) -> Optional[Tuple[str, int]]:
+    limit = requested_limit(select.args.get("limit"))
+    if limit is None:
+        return None
+    if isinstance(limit, exp.Placeholder) and limit.name.startswith("__p"):
+        return "param", int(limit.name[3:])
+    if isinstance(limit, exp.Literal) and limit.is_int:
+        return "value", int(limit.name)
+    raise ValueError("LIMIT is not a constant")
+
+def _nullable(expr: exp.Expression, select: exp.Select) -> bool:
+    """False only for a column of a FROM/JOIN table that is declared NOT NULL."""
+    if not isinstance(expr, exp.Column):
+        return True
+    sources = [select.args["from"].this] + [j.this for j in select.args.get("joins") or ()]
+    if not all(isinstance(s, exp.Table) for s in sources):
+        return True
+    if expr.table:
+        tables = [s.name.lower() for s in sources if s.alias_or_name.lower() == expr.table.lower()]
+    else:
+        tables = [s.name.lower() for s in sources if expr.name in ALLOWED_COLUMNS.get(s.name.lower(), ())]
+    return len(tables) != 1 or expr.name not in NOT_NULL_COLUMNS.get(tables[0], ())
+
+def _tiebreakers(select: exp.Select) -> Optional[List[exp.Expression]]:
+    """Expressions that together identify one output row, or None if there are none."""
+    projections = select.expressions
+    group = select.args.get("group")
+    if group:
+        return [_resolve(g, select) for g in group.expressions]
+    if any(p.find(exp.AggFunc) for p in projections):
+        return None  # a single aggregate row
+    if select.args.get("distinct"):
+        if any(p.find(exp.Star) for p in projections):
+            return None
+        return [_resolve(p, select) for p in projections]
+    joins = select.args.get("joins") or []
+    if any(j.side for j in joins):
+        return None  # outer joins: an absent row has no id
+    sources = [select.args["from"].this] + [j.this for j in joins]
+    if not all(isinstance(s, exp.Table) and "id" in ALLOWED_COLUMNS.get(s.name.lower(), ()) for s in sources):
+        return None
+    return [exp.column("id", table=s.alias_or_name) for s in sources]
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _shape(sql: str) -> Optional[_Shape]:
+    marked = _mark(sql)
+    if marked is None:
+        return None
+    try:
+        select = sqlglot.parse_one(marked[0], read="sqlite")
+    except Exception:
+        return None
+    # A resume predicate would change window results; OFFSET is what this replaces
+    if not isinstance(select, exp.Select) or select.args.get("offset") or select.find(exp.Window):
+        return None
+    try:
+        cap = _cap(select)
+    except ValueError:
+        return None
+    ties = _tiebreakers(select)
+    if ties is None:
+        return None
+
+    keys: List[_Key] = []
+    exprs: List[exp.Expression] = []
+    for ordered in (select.args["order"].expressions if select.args.get("order") else []):
+        desc = bool(ordered.args.get("desc"))
+        nulls_first = ordered.args.get("nulls_first")
+        keys.append(_Key("", desc, not desc if nulls_first is None else bool(nulls_first)))
+        exprs.append(_resolve(ordered.this, select))
+    # Tiebreakers follow the last sort direction, so an index on the sort
+    # column (which ends in the rowid) yields the whole order
+    desc = keys[-1].desc if keys else False
+    keys += [_Key("", desc, not desc) for _ in ties]
+    exprs += ties
+    seen, unique = set(), []
+    for key, expr in zip(keys, exprs):
+        text = expr.sql(dialect="sqlite")
+        if text not in seen:
+            seen.add(text)
+            unique.append((_Key(text, key.desc, key.nulls_first, _nullable(expr, select)), expr))
+    if select.args.get("distinct"):
+        # Extra output columns would change what DISTINCT removes
+        projected = {_resolve(p, select).sql(dialect="sqlite") for p in select.expressions}
+        if any(k.sql not in projected for k, _ in unique):
+            return None
+
+    select.set("limit", None)
+    select.set("order", exp.Order(expressions=[
+        exp.Ordered(this=expr.copy(), desc=k.desc, nulls_first=k.nulls_first) for k, expr in unique
+    ]))
+    select.select(*(exp.alias_(expr.copy(), KEY_COLUMN.format(i)) for i, (_, expr) in enumerate(unique)), copy=False)
+    return _Shape(select.sql(dialect="sqlite"), tuple(k for k, _ in unique), bool(select.args.get("group")),
+                  marked[1], cap)
+
+def _resume(keys: Tuple[_Key, ...], nulls: Tuple[bool, ...]) -> str:
+    """Rows after the resume point, in lexicographic key order."""
+    terms = []
+    for i, key in enumerate(keys):
+        beyond = key.beyond(_AFTER.format(i), nulls[i])
+        if beyond is not None:
+            equal = [f"({keys[j].sql}) IS {_AFTER.format(j)}" for j in range(i)]
+            terms.append("(" + " AND ".join(equal + [beyond]) + ")")
+    predicate = " OR ".join(terms) or "0"
+    first = keys[0]
+    if not nulls[0] and (first.nulls_first or not first.nullable):
+        # A plain range on the first key lets an index seek to the resume point
+        predicate = f"({first.sql}) {'<=' if first.desc else '>='} {_AFTER.format(0)} AND ({predicate})"
+    return predicate
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _page_sql(sql: str, nulls: Optional[Tuple[bool, ...]]) -> Tuple[str, Tuple[Tuple[str, int], ...]]:
+    """Page SQL with ? placeholders, and what each one binds: (p, i) param, (a, i) key, (n, 0) row count."""
+    shape = _shape(sql)
+    select = sqlglot.parse_one(shape.sql, read="sqlite")
+    if nulls is not None:
+        predicate = _resume(shape.keys, nulls)
+        (select.having if shape.having else select.where)(predicate, dialect="sqlite", copy=False)
+    select.limit(_SIZE, copy=False)
+    generated = select.sql(dialect="sqlite")
+    order = tuple((m.group(1) or "n", int(m.group(2) or 0)) for m in _MARKER_RE.finditer(generated))
+    return _MARKER_RE.sub("?", generated), order
+
+@dataclass(frozen=True)
+class Page:
+    """One page of a query: run `sql` with `params`, then split() the rows."""
+    sql: str
+    params: tuple
+    keys: int
+    size: int
+    remaining: Optional[int]  # rows the query's own LIMIT still allows, this page included
+
+    def split(self, rows: List[dict]) -> Tuple[List[dict], Optional[Tuple[list, Optional[int]]]]:
+        """Rows without the key columns, and (keys to resume after, rows still allowed) if there are more."""
+        hidden = {KEY_COLUMN.format(i) for i in range(self.keys)}
+        data = [{k: v for k, v in row.items() if k not in hidden} for row in rows[:self.size]]
+        remaining = None if self.remaining is None else self.remaining - len(data)
+        if len(rows) <= self.size or remaining == 0:
+            return data, None
+        last = rows[self.size - 1]
+        return data, ([last[KEY_COLUMN.format(i)] for i in range(self.keys)], remaining)
+
+def paginate(sql: str, params: tuple, size: int = DEFAULT_PAGE_SIZE, after: Optional[list] = None,
+             remaining: Optional[int] = None) -> Optional[Page]:
+    """
+    Page of at most `size` rows of `sql`, the first one or the one after
+    the key values `after` (from Page.split). None when the query cannot
+    be paged by key: compound, windowed or OFFSET queries, single
+    aggregates and outer joins.
+    """
+    shape = _shape(sql)
+    if shape is None or len(params) != shape.params:
+        return None
+    if after is None:
+        if shape.cap is not None:
+            kind, value = shape.cap
+            remaining = params[value] if kind == "param" else value
+            if not isinstance(remaining, int):
+                return None
+            remaining = max(remaining, 0)
+    elif len(after) != len(shape.keys):
+        raise CursorError("does not match its query")
+    size = max(1, min(size, MAX_PAGE_SIZE))
+    take = size if remaining is None else min(size, remaining)
+    page_sql, order = _page_sql(sql, None if after is None else tuple(v is None for v in after))
+    values = {"p": params, "a": after or (), "n": (take + 1,)}  # one more row tells whether there is a next page
+    return Page(page_sql, tuple(values[kind][i] for kind, i in order), len(shape.keys), take, remaining)
+
+# ----------------------------
+# Cursors
+# ----------------------------
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+@dataclass(frozen=True)
+class CursorState:
+    """
+    The query a cursor continues and where. Exactly one of `sql` (generated
+    SQL before compile_safe_query) and `intent` (a template name, bound to
+    `params`) is set.
+    """
+    sql: Optional[str]
+    intent: Optional[str]
+    params: tuple
+    size: int
+    after: Optional[list] = None
+    remaining: Optional[int] = None
+
+class CursorCodec:
+    """
+    Opaque page cursors: compressed JSON plus an HMAC-SHA256 tag. A cursor
+    carries SQL to run, so it is only accepted with a valid tag, from the
+    user it was issued to and before it expires.
+    """
+
+    def __init__(self, secret: str = CURSOR_SECRET, ttl: float = CURSOR_TTL_SECONDS):
+        if not secret:
+            logger.warning("QUERY_CURSOR_SECRET is not set; cursors only resume on the worker that issued them")
+            secret = secrets.token_hex(32)
+        elif len(secret) < MIN_CURSOR_SECRET_LENGTH:
+            # Also rules out placeholders such as auth.jwt's "YOUR_SECRET_KEY_HERE"
+            raise ValueError(f"QUERY_CURSOR_SECRET must be at least {MIN_CURSOR_SECRET_LENGTH} random characters")
+        # Derived, so a cursor tag never doubles as any other signature made with the secret
+        self._key = hmac.new(secret.encode("utf-8"), b"query-cursor", hashlib.sha256).digest()
+        self.ttl = ttl
+
+    def _tag(self, body: str) -> str:
+        return _b64(hmac.new(self._key, body.encode("utf-8"), hashlib.sha256).digest())
+
+    def encode(self, state: CursorState, subject: str) -> str:
+        payload = {"sql": state.sql, "intent": state.intent, "params": list(state.params), "after": state.after,
+                   "remaining": state.remaining, "size": state.size, "sub": subject, "exp": int(time.time() + self.ttl)}
+        body = _b64(zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8")))
+        return f"{body}.{self._tag(body)}"
+
+    def decode(self, cursor: str, subject: str) -> CursorState:
+        body, _, tag = cursor.partition(".")
+        if not tag or not hmac.compare_digest(tag.encode("utf-8"), self._tag(body).encode("utf-8")):
+            raise CursorError("signature does not match")
+        payload = json.loads(zlib.decompress(_unb64(body)))
+        if payload["sub"] != subject:
+            raise CursorError("issued to another user")
+        if payload["exp"] < time.time():
+            raise CursorError("expired")
+        return CursorState(payload["sql"], payload["intent"], tuple(payload["params"]), payload["size"],
+                           payload["after"], payload["remaining"])
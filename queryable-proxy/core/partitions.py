@@ -0,0 +1,615 @@
+"""
+Time partitions for share_logs.
+
+share_logs becomes a view over monthly tables (share_logs_pYYYYMM), merged
+into yearly ones (share_logs_yYYYY) once they are old. INSTEAD OF triggers
+on the view route writes, so every reader and writer keeps using the one
+name. Ranges are contiguous and half-open on opened_at. The last one is
+open-ended, and share_logs_p000000 holds everything before the first.
+
+Reads are pruned just before they run. A share_logs source whose
+opened_at is bounded by the statement's WHERE (or inner JOIN ... ON)
+conjuncts is replaced by the partitions overlapping those bounds, so a
+recent-window query touches one or two months however large the table is.
+
+Partitioning is opt-in and one-way: moving a plain table into partitions
+drops it, and nothing converts the view back. It happens only when asked
+for, with SHARE_LOGS_PARTITIONED=1 at startup or from the command line;
+back up the database first. An already partitioned database is maintained
+either way.
+
+    python -m core.partitions               # list partitions
+    python -m core.partitions --maintain    # partition if needed, then create, compact and archive now
+"""
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import expressions as exp
+from sqlglot.tokens import TokenType
+
+from core.database import (DB_PATH, derived_table, notify_write, on_read, read_connection, run_db, write_connection,
+                           write_transaction)
+from core.guardrails import PLAN_CACHE_SIZE, SQLITE
+from core.rollups import ROLLUPS, rollup_triggers
+
+logger = logging.getLogger(__name__)
+
+# Convert a plain share_logs table into partitions at startup (irreversible, so off by default)
+SHARE_LOGS_PARTITIONED = os.getenv("SHARE_LOGS_PARTITIONED", "0") == "1"
+# Months created ahead of the current one, so writes never wait on DDL
+PREMAKE_MONTHS = int(os.getenv("SHARE_LOGS_PREMAKE_MONTHS", "2"))
+# Months older than this are merged into one partition per year (0: never)
+COMPACT_AFTER_MONTHS = int(os.getenv("SHARE_LOGS_COMPACT_AFTER_MONTHS", "12"))
+# Partitions entirely older than this move to ARCHIVE_PATH and stop being queryable (0: never)
+ARCHIVE_AFTER_MONTHS = int(os.getenv("SHARE_LOGS_ARCHIVE_AFTER_MONTHS", "0"))
+ARCHIVE_PATH = os.getenv("SHARE_LOGS_ARCHIVE_PATH", os.path.splitext(DB_PATH)[0] + ".archive.db")
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("SHARE_LOGS_MAINTENANCE_SECONDS", "3600"))
+# Rows sampled per index by ANALYZE on a partition
+ANALYSIS_LIMIT = 1000
+
+PARENT = "share_logs"
+CATALOG = "share_logs_partitions"
+BOTTOM = "share_logs_p000000"
+IDS = "share_logs_ids"
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    lo: str  # inclusive
+    hi: Optional[str]  # exclusive; None for the open-ended last partition
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "from": self.lo or None, "to": self.hi}
+
+# ----------------------------
+# Ranges
+# ----------------------------
+def _month(d: date) -> date:
+    return d.replace(day=1)
+
+def _add_months(d: date, months: int) -> date:
+    years, month = divmod(d.month - 1 + months, 12)
+    return date(d.year + years, month + 1, 1)
+
+def _today() -> date:
+    return datetime.utcnow().date()  # opened_at is naive UTC
+
+def _layout(first: date, today: date) -> List[Partition]:
+    """Yearly partitions up to the compaction cutoff, monthly ones after, from `first` (a month)."""
+    month = _month(today)
+    last = _add_months(month, PREMAKE_MONTHS)
+    cutoff = _add_months(month, -COMPACT_AFTER_MONTHS) if COMPACT_AFTER_MONTHS > 0 else None
+    parts, m = [], min(first, month)
+    while cutoff is not None and m < cutoff:
+        end = min(date(m.year + 1, 1, 1), cutoff)
+        parts.append(Partition(f"{PARENT}_y{m.year}", m.isoformat(), end.isoformat()))
+        m = end
+    while m <= last:
+        parts.append(Partition(f"{PARENT}_p{m:%Y%m}", m.isoformat(), _add_months(m, 1).isoformat()))
+        m = _add_months(m, 1)
+    parts[-1] = Partition(parts[-1].name, parts[-1].lo, None)
+    return parts
+
+def _in_range(p: Partition, first_lo: str, value: str) -> str:
+    """SQL condition: `value` belongs in partition `p`."""
+    if p.name == BOTTOM:
+        return f"({value} >= '{first_lo}') IS NOT 1"  # also takes NULLs and non-dates
+    cond = f"{value} >= '{p.lo}'"
+    return cond if p.hi is None else f"{cond} AND {value} < '{p.hi}'"
+
+# ----------------------------
+# Catalog and cached layout
+# ----------------------------
+_state_lock = threading.Lock()
+_state: Tuple[Optional[int], Tuple[Partition, ...]] = (None, ())
+
+def _load(conn: sqlite3.Connection) -> Tuple[Partition, ...]:
+    try:
+        rows = conn.execute(f"SELECT name, lo, hi FROM {CATALOG} ORDER BY lo").fetchall()
+    except sqlite3.OperationalError:
+        return ()  # not partitioned
+    return tuple(Partition(r[0], r[1], r[2]) for r in rows)
+
+def partitions(conn: sqlite3.Connection) -> Tuple[Partition, ...]:
+    """Current partitions, oldest first; reloaded whenever the schema changed."""
+    global _state
+    version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    with _state_lock:
+        cached_version, parts = _state
+    if version != cached_version:
+        parts = _load(conn)
+        for p in parts:
+            derived_table(p.name, PARENT)  # SQL naming a partition is invalidated with share_logs
+        with _state_lock:
+            _state = (version, parts)
+    return parts
+
+def storage_tables(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Tables that physically hold `table`'s rows (itself unless partitioned)."""
+    if table.lower() == PARENT:
+        parts = partitions(conn)
+        if parts:
+            return [p.name for p in parts]
+    return [table]
+
+def _save(conn: sqlite3.Connection, parts: List[Partition]):
+    conn.execute(f"DELETE FROM {CATALOG}")
+    conn.executemany(f"INSERT INTO {CATALOG} (name, lo, hi) VALUES (?, ?, ?)",
+                     [(p.name, p.lo, p.hi) for p in parts])
+
+# ----------------------------
+# DDL
+# ----------------------------
+_CREATE_TABLE_RE = re.compile(r'^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?("[^"]+"|`[^`]+`|\[[^\]]+\]|[\w.]+)',
+                              re.IGNORECASE)
+_CREATE_INDEX_RE = re.compile(r'^(\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+)(?:IF\s+NOT\s+EXISTS\s+)?("[^"]+"|\S+)\s+ON\s+'
+                              r'("[^"]+"|[^\s(]+)', re.IGNORECASE)
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+def _clone(conn: sqlite3.Connection, template: str, name: str, schema: str = "main"):
+    """Create `name` with `template`'s columns (ids come from the view's sequence) and indexes."""
+    ddl = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (template,)).fetchone()[0]
+    ddl = _CREATE_TABLE_RE.sub(f"CREATE TABLE IF NOT EXISTS {schema}.{name}", ddl, count=1)
+    conn.execute(re.sub(r"\s+AUTOINCREMENT\b", "", ddl, flags=re.IGNORECASE))
+    if schema != "main":
+        return
+    indexes = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? "
+                           "AND sql IS NOT NULL", (template,)).fetchall()
+    for index, sql in indexes:
+        index = index.replace(template, name) if template in index else f"{name}_{index}"
+        conn.execute(_CREATE_INDEX_RE.sub(lambda m: f"{m.group(1)}IF NOT EXISTS {index} ON {name}", sql, count=1))
+
+def _rebuild(conn: sqlite3.Connection, parts: List[Partition]):
+    """Recreate the view and its routing triggers over `parts`."""
+    cols = _columns(conn, BOTTOM)
+    col_list = ", ".join(cols)
+    first_lo = parts[1].lo if len(parts) > 1 else ""
+
+    def route(row: str, row_id: str) -> str:
+        values = ", ".join(row_id if c == "id" else f"{row}.{c}" for c in cols)
+        return "".join(f"\n    INSERT INTO {p.name} ({col_list}) SELECT {values} "
+                       f"WHERE {_in_range(p, first_lo, f'{row}.opened_at')};" for p in parts)
+
+    remove = "".join(f"\n    DELETE FROM {p.name} WHERE id = OLD.id;" for p in parts)
+    conn.execute(f"DROP VIEW IF EXISTS {PARENT}")  # drops its triggers too
+    conn.execute(f"CREATE VIEW {PARENT} ({col_list}) AS "
+                 + " UNION ALL ".join(f"SELECT {col_list} FROM {p.name}" for p in parts))
+    # NEW.id is NULL unless given; the sequence table hands out ids that
+    # stay unique across partitions. last_insert_rowid() reads the id back
+    # only inside the trigger: SQLite restores the caller's value when it
+    # ends, so cursor.lastrowid is meaningless for share_logs. A writer that
+    # needs the id reads it in the same transaction with
+    # SELECT seq FROM sqlite_sequence WHERE name = 'share_logs_ids'
+    conn.execute(f"""CREATE TRIGGER {PARENT}_insert INSTEAD OF INSERT ON {PARENT} BEGIN
+    INSERT INTO {IDS} (id) VALUES (NEW.id);{route("NEW", "last_insert_rowid()")}
+    DELETE FROM {IDS} WHERE id = last_insert_rowid();
+END""")
+    conn.execute(f"CREATE TRIGGER {PARENT}_delete INSTEAD OF DELETE ON {PARENT} BEGIN{remove}\nEND")
+    conn.execute(f"CREATE TRIGGER {PARENT}_update INSTEAD OF UPDATE ON {PARENT} BEGIN{remove}{route('NEW', 'NEW.id')}\nEND")
+    for p in parts:
+        for trigger in rollup_triggers(p.name):
+            conn.execute(trigger)
+
+@contextmanager
+def _without_rollup_triggers(conn: sqlite3.Connection, *tables: str):
+    """
+    Move rows between partitions without the rollups seeing them: the
+    total per day does not change. Only inside a write transaction, which
+    keeps every other writer out meanwhile.
+    """
+    for table in tables:
+        for kind in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {table}_rollup_{kind}")
+    yield
+    for table in tables:
+        for trigger in rollup_triggers(table):
+            conn.execute(trigger)
+
+def _analyze(conn: sqlite3.Connection, tables):
+    # Sampled, so analyzing a large partition stays cheap; the cost model reads sqlite_stat1
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    for table in tables:
+        conn.execute(f"ANALYZE {table}")
+
+# ----------------------------
+# Setup and maintenance
+# ----------------------------
+def _first_month(conn: sqlite3.Connection) -> Optional[date]:
+    row = conn.execute(f"SELECT min(opened_at) FROM {PARENT} "
+                       "WHERE opened_at GLOB '[0-9][0-9][0-9][0-9]-[01][0-9]-*'").fetchone()
+    try:
+        return date.fromisoformat(row[0][:7] + "-01") if row and row[0] else None
+    except ValueError:
+        return None
+
+def _migrate(conn: sqlite3.Connection, today: date):
+    """Move a plain share_logs table into partitions (one transaction)."""
+    # One index sort up front turns each partition's copy into a range read
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{PARENT}_opened_at ON {PARENT}(opened_at)")
+    parts = [Partition(BOTTOM, "", None)] + _layout(_first_month(conn) or _month(today), today)
+    parts[0] = Partition(BOTTOM, "", parts[1].lo)
+    conn.execute(f"CREATE TABLE {IDS} (id INTEGER PRIMARY KEY AUTOINCREMENT)")
+    conn.execute(f"""
+        INSERT INTO sqlite_sequence (name, seq) SELECT '{IDS}', max(
+            COALESCE((SELECT seq FROM sqlite_sequence WHERE name = '{PARENT}'), 0),
+            COALESCE((SELECT max(id) FROM {PARENT}), 0))
+    """)
+    _clone(conn, PARENT, BOTTOM)
+    for p in parts[1:]:
+        _clone(conn, BOTTOM, p.name)
+    for p in parts:
+        conn.execute(f"INSERT INTO {p.name} SELECT * FROM {PARENT} WHERE {_in_range(p, parts[1].lo, 'opened_at')}")
+    conn.execute(f"CREATE TABLE {CATALOG} (name TEXT PRIMARY KEY, lo TEXT NOT NULL, hi TEXT)")
+    _save(conn, parts)
+    conn.execute(f"DROP TABLE {PARENT}")
+    conn.execute(f"DELETE FROM sqlite_sequence WHERE name = '{PARENT}'")
+    _rebuild(conn, parts)
+    _analyze(conn, [p.name for p in parts])
+    logger.info("share_logs moved into %d partitions", len(parts))
+
+def _extend(conn: sqlite3.Connection, parts: List[Partition], today: date) -> List[str]:
+    """Split months off the open-ended last partition up to PREMAKE_MONTHS ahead."""
+    last = parts[-1]
+    target = _add_months(_month(today), PREMAKE_MONTHS)
+    m = _add_months(_month(date.fromisoformat(last.lo)), 1)
+    months = []
+    while m <= target:
+        months.append(m)
+        m = _add_months(m, 1)
+    if not months:
+        return []
+    new = [Partition(f"{PARENT}_p{m:%Y%m}", m.isoformat(), _add_months(m, 1).isoformat()) for m in months]
+    new[-1] = Partition(new[-1].name, new[-1].lo, None)
+    for p in new:
+        _clone(conn, BOTTOM, p.name)
+    # Rows stamped beyond the old last month move to their new partitions
+    with _without_rollup_triggers(conn, last.name, *(p.name for p in new)):
+        for p in new:
+            conn.execute(f"INSERT INTO {p.name} SELECT * FROM {last.name} WHERE {_in_range(p, '', 'opened_at')}")
+        conn.execute(f"DELETE FROM {last.name} WHERE opened_at >= ?", (new[0].lo,))
+    parts[-1] = Partition(last.name, last.lo, new[0].lo)
+    parts.extend(new)
+    return [p.name for p in new]
+
+def _compact(conn: sqlite3.Connection, parts: List[Partition], today: date) -> List[str]:
+    """Merge monthly partitions older than COMPACT_AFTER_MONTHS into their year's partition."""
+    if COMPACT_AFTER_MONTHS <= 0:
+        return []
+    cutoff = _add_months(_month(today), -COMPACT_AFTER_MONTHS).isoformat()
+    merged, out = [], []
+    for p in parts:
+        monthly = p.name != BOTTOM and p.name.startswith(f"{PARENT}_p")
+        if not (monthly and p.hi is not None and p.hi <= cutoff):
+            out.append(p)
+            continue
+        target = f"{PARENT}_y{p.lo[:4]}"
+        if out and out[-1].name == target:
+            into = out.pop()
+        else:
+            into = Partition(target, p.lo, p.hi)
+            _clone(conn, BOTTOM, target)
+        with _without_rollup_triggers(conn, target):
+            conn.execute(f"INSERT INTO {target} SELECT * FROM {p.name}")
+            conn.execute(f"DROP TABLE {p.name}")
+        out.append(Partition(target, into.lo, p.hi))
+        merged.append(p.name)
+    parts[:] = out
+    return merged
+
+def _archive(today: date) -> List[str]:
+    """
+    Move partitions older than ARCHIVE_AFTER_MONTHS to ARCHIVE_PATH and
+    delete their rollup days. The bulk copy commits on its own first, so
+    the write lock is only held to top up rows that arrived since (ids only
+    grow) and drop the partitions. INSERT OR IGNORE makes a rerun after a
+    crash in between harmless.
+    """
+    if ARCHIVE_AFTER_MONTHS <= 0:
+        return []
+    cutoff = _add_months(_month(today), -ARCHIVE_AFTER_MONTHS).isoformat()
+
+    def copy(conn: sqlite3.Connection, old: List[Partition]):
+        for p in old:
+            _clone(conn, p.name, p.name, schema="archive")
+            conn.execute(f"INSERT OR IGNORE INTO archive.{p.name} SELECT * FROM main.{p.name} "
+                         f"WHERE id > (SELECT COALESCE(max(id), 0) FROM archive.{p.name})")
+            conn.execute(f"""
+                INSERT INTO archive.{CATALOG} (name, lo, hi) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET lo = min(lo, excluded.lo), hi = max(hi, excluded.hi)
+            """, (p.name, p.lo, p.hi))
+
+    with write_connection() as conn:
+        old = [p for p in partitions(conn) if p.hi is not None and p.hi <= cutoff]
+        if not old or old == [p for p in old if p.name == BOTTOM] and not conn.execute(f"SELECT 1 FROM {BOTTOM} LIMIT 1").fetchone():
+            return []  # nothing but an empty bottom partition
+        conn.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_PATH,))  # not allowed inside a transaction
+        try:
+            conn.execute("BEGIN")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS archive.{CATALOG} (name TEXT PRIMARY KEY, lo TEXT NOT NULL, hi TEXT)")
+            copy(conn, old)
+            conn.commit()
+
+            conn.execute("BEGIN IMMEDIATE")
+            parts = list(partitions(conn))
+            done = [p for p in parts if p.hi is not None and p.hi <= cutoff]
+            keep = parts[len(done):]
+            if not keep or done != old:
+                conn.rollback()
+                return []  # another worker got here first
+            copy(conn, done)
+            for p in done:
+                conn.execute(f"DROP TABLE main.{p.name}")
+            # The bottom partition is always the oldest: recreate it, empty, below the survivors
+            _clone(conn, keep[0].name, BOTTOM)
+            for rollup in ROLLUPS:
+                conn.execute(f"DELETE FROM main.{rollup} WHERE day < ?", (keep[0].lo,))
+            parts = [Partition(BOTTOM, "", keep[0].lo)] + keep
+            _save(conn, parts)
+            _rebuild(conn, parts)
+            conn.commit()
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.execute("DETACH DATABASE archive")
+    notify_write((PARENT,))
+    logger.info("Archived %d share_logs partitions to %s", len(done), ARCHIVE_PATH)
+    return [p.name for p in done]
+
+def setup_partitions(migrate: Optional[bool] = None):
+    """
+    Startup step: partition a plain share_logs table if `migrate` (default:
+    SHARE_LOGS_PARTITIONED), then run maintenance.
+    """
+    migrate = SHARE_LOGS_PARTITIONED if migrate is None else migrate
+    with write_transaction(PARENT) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        kinds = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE name IN (?, ?)", (PARENT, CATALOG)))
+        if CATALOG not in kinds:
+            if kinds.get(PARENT) != "table" or not migrate:
+                return
+            _migrate(conn, _today())
+    maintain()
+
+def maintain(today: Optional[date] = None) -> Dict[str, List[str]]:
+    """
+    Create the months up to PREMAKE_MONTHS ahead, merge months older than
+    COMPACT_AFTER_MONTHS into yearly partitions and archive partitions
+    older than ARCHIVE_AFTER_MONTHS. Idempotent; safe in every worker.
+    """
+    today = today or _today()
+    with write_transaction(PARENT) as conn:
+        conn.execute("BEGIN IMMEDIATE")  # serializes maintenance across processes
+        parts = list(partitions(conn))
+        if not parts:
+            return {}
+        created = _extend(conn, parts, today)
+        compacted = _compact(conn, parts, today)
+        if created or compacted:
+            _save(conn, parts)
+            _rebuild(conn, parts)
+            changed = [p.name for p in parts if p.name in created or p.name.startswith(f"{PARENT}_y")]
+            _analyze(conn, changed)
+    archived = _archive(today)
+    if created or compacted:
+        logger.info("share_logs partitions: created %s, compacted %s", created, compacted)
+    return {"created": created, "compacted": compacted, "archived": archived}
+
+async def maintenance_loop(interval: float = MAINTENANCE_INTERVAL_SECONDS):
+    """Run maintain() every `interval` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_db(maintain)
+        except Exception:
+            logger.exception("share_logs partition maintenance failed")
+
+def partition_stats() -> List[dict]:
+    """Partitions with their row counts as of their last ANALYZE."""
+    with read_connection() as conn:
+        parts = partitions(conn)
+        stats = dict(conn.execute("SELECT tbl, stat FROM sqlite_stat1 ORDER BY idx IS NULL").fetchall())
+    return [dict(p.to_dict(), estimated_rows=int(stats[p.name].split()[0]) if p.name in stats else None)
+            for p in parts]
+
+# ----------------------------
+# Partition pruning
+# ----------------------------
+_OPS = {exp.GT: ">", exp.GTE: ">=", exp.LT: "<", exp.LTE: "<=", exp.EQ: "="}
+_FLIP = {">": "<", ">=": "<=", "<": ">", "<=": ">=", "=": "="}
+_DATE_NODES = (exp.Date, exp.DateStrToDate, exp.TsOrDsToDate)
+_NOT_CONSTANT = (exp.Column, exp.Subquery, exp.Select, exp.Star, exp.AggFunc, exp.Window, exp.Rand)
+_NOW_NODES = (exp.CurrentTimestamp, exp.CurrentDate, exp.CurrentTime)
+_SLOT = "__share_logs_slot{}"
+_PARAM = ":__p{}"
+_PARAM_RE = re.compile(r":__p(\d+)")
+
+@dataclass(frozen=True)
+class _Bound:
+    op: str  # opened_at <op> value
+    sql: str  # constant expression; :__pN stands for the Nth bind parameter
+    params: Tuple[int, ...]
+    volatile: bool  # depends on the current time
+
+@dataclass(frozen=True)
+class _Slot:
+    marker: str
+    bounds: Tuple[_Bound, ...]
+
+@dataclass(frozen=True)
+class _PrunePlan:
+    sql: str  # with a marker per prunable share_logs source and ? for parameters
+    order: Tuple[int, ...]  # bind parameter index for every ?, in order
+    slots: Tuple[_Slot, ...]
+
+def _is_opened_at(node: exp.Expression, alias: str, unqualified: bool) -> bool:
+    """s.opened_at, or date(s.opened_at): the same bounds hold for an ISO timestamp's day."""
+    if isinstance(node, _DATE_NODES) and not any(v for k, v in node.args.items() if k != "this"):
+        node = node.this
+    elif isinstance(node, exp.Anonymous) and node.name.lower() == "date" and len(node.expressions) == 1:
+        node = node.expressions[0]
+    if not isinstance(node, exp.Column) or node.name.lower() != "opened_at":
+        return False
+    return node.table.lower() == alias if node.table else unqualified
+
+def _bound(op: str, node: exp.Expression) -> Optional[_Bound]:
+    if node.find(*_NOT_CONSTANT):
+        return None
+    volatile = bool(node.find(*_NOW_NODES)) or any(
+        lit.is_string and lit.name.lower() == "now" for lit in node.find_all(exp.Literal)
+    )
+    params = tuple(int(p.name[3:]) for p in node.find_all(exp.Placeholder) if p.name.startswith("__p"))
+    return _Bound(op, node.sql(dialect="sqlite"), params, volatile)
+
+def _conjuncts(node: Optional[exp.Expression]) -> List[exp.Expression]:
+    if node is None:
+        return []
+    node = node.unnest()
+    return [c.unnest() for c in node.flatten()] if isinstance(node, exp.And) else [node]
+
+def _bounds_for(table: exp.Table) -> List[_Bound]:
+    select, source = table.parent_select, table.parent
+    if not isinstance(select, exp.Select) or not isinstance(source, (exp.From, exp.Join)) or source.parent is not select:
+        return []
+    alias = (table.alias or table.name).lower()
+    sources = [select.args["from"].this] + [j.this for j in select.args.get("joins") or ()]
+    unqualified = (all(isinstance(s, exp.Table) for s in sources)
+                   and sum(s.name.lower() == PARENT for s in sources) == 1)
+    conds = _conjuncts(select.args["where"].this if select.args.get("where") else None)
+    if isinstance(source, exp.Join) and not source.side and source.kind not in ("CROSS", "OUTER", "FULL"):
+        conds += _conjuncts(source.args.get("on"))
+    bounds = []
+    for cond in conds:
+        if isinstance(cond, exp.Between) and _is_opened_at(cond.this, alias, unqualified):
+            bounds += [_bound(">=", cond.args["low"]), _bound("<=", cond.args["high"])]
+            continue
+        op = _OPS.get(type(cond))
+        if op is None:
+            continue
+        if _is_opened_at(cond.this, alias, unqualified):
+            bounds.append(_bound(op, cond.expression))
+        elif _is_opened_at(cond.expression, alias, unqualified):
+            bounds.append(_bound(_FLIP[op], cond.this))
+    return [b for b in bounds if b is not None]
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _prune_plan(sql: str) -> Optional[_PrunePlan]:
+    try:
+        tokens = SQLITE.tokenize(sql)
+    except Exception:
+        return None
+    # Number the ? placeholders so bound expressions can name their parameters
+    parts, pos, count = [], 0, 0
+    for tok in tokens:
+        if tok.token_type == TokenType.PLACEHOLDER:
+            if tok.text != "?":
+                return None
+            parts += [sql[pos:tok.start], _PARAM.format(count)]
+            pos, count = tok.end + 1, count + 1
+    parts.append(sql[pos:])
+    try:
+        stmt = sqlglot.parse_one("".join(parts), read="sqlite")
+    except Exception:
+        return None
+    slots = []
+    for table in list(stmt.find_all(exp.Table)):
+        if table.name.lower() != PARENT or table.args.get("db"):
+            continue
+        bounds = _bounds_for(table)
+        if not bounds:
+            continue
+        marker = _SLOT.format(len(slots))
+        table.replace(exp.to_table(marker).as_(table.alias or PARENT))
+        slots.append(_Slot(marker, tuple(bounds)))
+    if not slots:
+        return None
+    generated = stmt.sql(dialect="sqlite")
+    order = tuple(int(i) for i in _PARAM_RE.findall(generated))
+    if sorted(order) != list(range(count)):
+        return None
+    return _PrunePlan(_PARAM_RE.sub("?", generated), order, tuple(slots))
+
+_local = threading.local()
+
+def _evaluate(expressions: List[str], params: tuple) -> Optional[list]:
+    """Constant expressions evaluated by SQLite itself, so date() & co. mean exactly what they do in the query."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = sqlite3.connect(":memory:")
+    try:
+        return list(conn.execute("SELECT " + ", ".join(expressions),
+                                 {f"__p{i}": v for i, v in enumerate(params)}).fetchone())
+    except sqlite3.Error:
+        return None
+
+def _overlaps(p: Partition, op: str, value: str) -> bool:
+    if op in (">", ">=", "=") and p.hi is not None and p.hi <= value:
+        return False
+    if op == "<" and p.lo >= value:
+        return False
+    if op in ("<=", "=") and p.lo > value:
+        return False
+    return True
+
+def _source(chosen: List[Partition]) -> str:
+    if len(chosen) == 1:
+        return chosen[0].name
+    if not chosen:
+        return f"(SELECT * FROM {BOTTOM} WHERE 0)"
+    return "(" + " UNION ALL ".join(f"SELECT * FROM {p.name}" for p in chosen) + ")"
+
+@on_read
+def prune_partitions(conn: sqlite3.Connection, sql: str, params: tuple = ()):
+    """Read rewriter: swap bounded share_logs sources for the partitions they can touch."""
+    if PARENT not in sql.lower():
+        return sql, params
+    parts = partitions(conn)
+    if not parts:
+        return sql, params
+    plan = _prune_plan(sql)
+    if plan is None or len(plan.order) != len(params):
+        return sql, params
+    bounds = [b for slot in plan.slots for b in slot.bounds]
+    values = _evaluate([b.sql for b in bounds], params)
+    if values is None:
+        return sql, params
+    resolved = dict(zip(bounds, values))
+    sql = plan.sql
+    for slot in plan.slots:
+        chosen = list(parts)
+        for b in slot.bounds:
+            value, op = resolved[b], b.op
+            if not isinstance(value, str):
+                continue
+            if b.volatile or any(isinstance(params[i], str) and "now" in params[i].lower() for i in b.params):
+                # Time moves on before the statement runs: only lower bounds stay safe
+                if op not in (">", ">=", "="):
+                    continue
+                op = ">="
+            chosen = [p for p in chosen if _overlaps(p, op, value)]
+        sql = sql.replace(slot.marker, _source(chosen))
+    return sql, tuple(params[i] for i in plan.order)
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Inspect and maintain share_logs partitions")
+    parser.add_argument("--maintain", action="store_true",
+                        help="partition a plain share_logs table (irreversible), then create, compact and archive now")
+    args = parser.parse_args()
+
+    if args.maintain:
+        setup_partitions(migrate=True)
+    print(json.dumps(partition_stats(), indent=2))
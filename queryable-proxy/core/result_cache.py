@@ -0,0 +1,256 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from core.database import DB_PATH, on_write
+from core.guardrails import tables_for
+from core.shared_cache import SHARED_CACHE, SharedCache, cache_key
+
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "30"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+# Results larger than this are not worth holding in memory
+RESULT_CACHE_MAX_ROWS = int(os.getenv("RESULT_CACHE_MAX_ROWS", "5000"))
+
+_MISS = object()
+
+@dataclass
+class _Entry:
+    value: Any
+    tables: Tuple[str, ...]
+    expires_at: float
+
+class ResultCache:
+    """
+    LRU+TTL cache of executed safe SQL keyed by (kind, sql, params).
+
+    Entries are indexed by the tables they read. In-process writes evict
+    only the entries that depend on the written tables; a PRAGMA
+    data_version change that no in-process write explains (another process
+    wrote) flushes everything.
+
+    With a `shared` tier, local misses are looked up there and results are
+    written through, so workers serve each other's entries. Writes bump the
+    shared table versions; an unexplained data_version change that no
+    worker's write accounts for either invalidates the whole shared tier.
+    """
+
+    def __init__(self, path: str = DB_PATH, ttl: float = RESULT_CACHE_TTL_SECONDS,
+                 max_entries: int = RESULT_CACHE_MAX_ENTRIES, max_rows: int = RESULT_CACHE_MAX_ROWS,
+                 shared: Optional[SharedCache] = SHARED_CACHE):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.shared = shared
+        self._shared_seq: Optional[str] = None
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._by_table: Dict[str, set] = {}
+        self._generation = 0
+        self._watch: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0,
+                       "external_flushes": 0}
+
+    # ----------------------------
+    # Change detection
+    # ----------------------------
+    def _read_data_version(self) -> Optional[int]:
+        # data_version is per connection, so it needs one long-lived connection
+        try:
+            if self._watch is None:
+                self._watch = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            return self._watch.execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+    def _check_external_writes(self):
+        version = self._read_data_version()
+        if version is not None and version != self._data_version:
+            if self._data_version is not None:
+                if self._entries:
+                    self._stats["external_flushes"] += 1
+                    self._clear()
+                if self.shared is not None and self.shared.write_sequence() == self._shared_seq:
+                    self.shared.bump()  # no worker wrote: an outside process did
+            if self.shared is not None:
+                self._shared_seq = self.shared.write_sequence()
+            self._data_version = version
+
+    # ----------------------------
+    # Index maintenance (lock held)
+    # ----------------------------
+    def _store(self, key, value, tables: Tuple[str, ...]):
+        self._remove(key)
+        self._entries[key] = _Entry(value, tables, time.monotonic() + self.ttl)
+        for t in tables:
+            self._by_table.setdefault(t, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self._stats["evictions"] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for t in entry.tables:
+            keys = self._by_table.get(t)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[t]
+
+    def _clear(self):
+        self._entries.clear()
+        self._by_table.clear()
+        self._generation += 1
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def get(self, kind: str, sql: str, params: tuple):
+        key = (kind, sql, params)
+        with self._lock:
+            self._check_external_writes()
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at >= time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry.value
+            if entry is not None:
+                self._remove(key)
+            generation = self._generation
+        if self.shared is not None:
+            found, value, tables = self.shared.get(cache_key(kind, sql, params))
+            if found:
+                with self._lock:
+                    self._stats["shared_hits"] += 1
+                    if generation == self._generation:
+                        self._store(key, value, tables)
+                return value
+        with self._lock:
+            self._stats["misses"] += 1
+        return _MISS
+
+    def generation(self) -> tuple:
+        """Token to pass to put(); results read across an invalidation are dropped."""
+        with self._lock:
+            generation = self._generation
+        return generation, self.shared.write_sequence() if self.shared is not None else None
+
+    def put(self, kind: str, sql: str, params: tuple, value, tables: Tuple[str, ...],
+            rows: int, generation: int):
+        if rows > self.max_rows:
+            return
+        key = (kind, sql, params)
+        local_generation, shared_sequence = generation
+        with self._lock:
+            if local_generation != self._generation:
+                return
+            self._store(key, value, tables)
+        if self.shared is not None:
+            self.shared.put(cache_key(kind, sql, params), value, tables, self.ttl, shared_sequence)
+
+    def invalidate_tables(self, tables=None):
+        """Evict entries reading any of `tables` (all entries when None)."""
+        with self._lock:
+            self._stats["invalidations"] += 1
+            if tables is None:
+                self._clear()
+            else:
+                for t in tables:
+                    for key in list(self._by_table.get(t, ())):
+                        self._remove(key)
+                # Reads that started before this write must not be stored
+                self._generation += 1
+            if self.shared is not None:
+                self.shared.bump(tables)
+                self._shared_seq = self.shared.write_sequence()
+            # This process explains the data_version bump; re-baseline
+            self._data_version = self._read_data_version()
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["size"] = len(self._entries)
+        hits = s["hits"] + s["shared_hits"]
+        lookups = hits + s["misses"]
+        s["hit_ratio"] = hits / lookups if lookups else 0.0
+        if self.shared is not None:
+            s["shared"] = self.shared.stats()
+        return s
+
+RESULT_CACHE = ResultCache()
+on_write(RESULT_CACHE.invalidate_tables)
+
+def _row_count(kind: str, value) -> int:
+    if kind == "columns":
+        _, columns = value
+        return len(columns[0]) if columns else 0
+    return len(value)
+
+async def _cache_call(fn, *args):
+    # In-memory alone the cache is cheap enough to call inline; the shared
+    # tier reads, commits (BEGIN IMMEDIATE, busy timeout) and pickles, so
+    # keep that off the event loop
+    if RESULT_CACHE.shared is None:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+async def cached_result(kind: str, sql: str, params: tuple, loader):
+    """Return a cached result for (kind, sql, params) or load, store and return it."""
+    value = await _cache_call(RESULT_CACHE.get, kind, sql, params)
+    if value is not _MISS:
+        return value
+    generation = await _cache_call(RESULT_CACHE.generation)
+    value = await loader(sql, params)
+    try:
+        tables = tables_for(sql)
+    except Exception:
+        return value  # unparseable: just don't cache
+    await _cache_call(RESULT_CACHE.put, kind, sql, params, value, tables, _row_count(kind, value), generation)
+    return value
+
+def _get_many(statements) -> list:
+    return [RESULT_CACHE.get("rows", sql, params) for sql, params in statements]
+
+def _put_many(items, generation):
+    for sql, params, value, tables in items:
+        RESULT_CACHE.put("rows", sql, params, value, tables, len(value), generation)
+
+async def cached_results(statements, loader) -> list:
+    """
+    Row results for many (sql, params) pairs; only misses go to
+    `loader(statements)`, which returns one result or exception per item.
+    """
+    results = await _cache_call(_get_many, statements)
+    missing = [i for i, r in enumerate(results) if r is _MISS]
+    if not missing:
+        return results
+    generation = await _cache_call(RESULT_CACHE.generation)
+    loaded = await loader([statements[i] for i in missing])
+    store = []
+    for i, value in zip(missing, loaded):
+        results[i] = value
+        if isinstance(value, Exception):
+            continue
+        sql, params = statements[i]
+        try:
+            tables = tables_for(sql)
+        except Exception:
+            continue
+        store.append((sql, params, value, tables))
+    if store:
+        await _cache_call(_put_many, store, generation)
+    return results
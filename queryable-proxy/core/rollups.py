@@ -0,0 +1,196 @@
+from functools import lru_cache
+from typing import List, Optional
+
+import sqlglot
+from sqlglot import expressions as exp
+
+from core.database import derived_table, write_transaction
+from core.guardrails import PLAN_CACHE_SIZE
+from core.schema_policy import NOT_NULL_COLUMNS
+
+# Daily open counts kept in step with share_logs by triggers. A day is
+# the ISO date prefix of opened_at, so for a 'YYYY-MM-DD' bound D,
+# opened_at >= D  <=>  day >= D  and  opened_at < D  <=>  day < D.
+ROLLUPS = {
+    "share_logs_daily_file": "file_id",
+    "share_logs_daily_viewer": "viewer_email",
+}
+_DAY = "substr({row}.opened_at, 1, 10)"
+
+def _rollup_ddl(table: str, key: str) -> str:
+    key_type = "INTEGER" if key == "file_id" else "TEXT"
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        day TEXT NOT NULL,
+        {key} {key_type} NOT NULL,
+        opens INTEGER NOT NULL,
+        PRIMARY KEY (day, {key})
+    ) WITHOUT ROWID
+    """
+
+def _add(table: str, key: str, row: str) -> str:
+    return f"""
+        INSERT INTO {table} (day, {key}, opens) VALUES ({_DAY.format(row=row)}, {row}.{key}, 1)
+        ON CONFLICT(day, {key}) DO UPDATE SET opens = opens + 1;"""
+
+def _remove(table: str, key: str, row: str) -> str:
+    where = f"day = {_DAY.format(row=row)} AND {key} = {row}.{key}"
+    return f"""
+        UPDATE {table} SET opens = opens - 1 WHERE {where};
+        DELETE FROM {table} WHERE {where} AND opens <= 0;"""
+
+def rollup_triggers(table: str = "share_logs") -> List[str]:
+    """Triggers keeping the rollups in step with `table`, share_logs or one of its partitions."""
+    add_new = "".join(_add(t, k, "NEW") for t, k in ROLLUPS.items())
+    remove_old = "".join(_remove(t, k, "OLD") for t, k in ROLLUPS.items())
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_rollup_insert AFTER INSERT ON {table} BEGIN{add_new}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_rollup_delete AFTER DELETE ON {table} BEGIN{remove_old}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_rollup_update "
+        f"AFTER UPDATE OF file_id, viewer_email, opened_at ON {table} BEGIN{remove_old}{add_new}\nEND",
+    ]
+
+def setup_rollups():
+    """
+    Create the rollup tables and triggers; backfill tables that did not
+    exist yet. When share_logs is the partitioned view, core.partitions
+    puts the triggers on each partition instead.
+    """
+    with write_transaction(*ROLLUPS) as conn:
+        existing = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view')"))
+        if "share_logs" not in existing:
+            return
+        for table, key in ROLLUPS.items():
+            conn.execute(_rollup_ddl(table, key))
+            if table not in existing:
+                conn.execute(f"""
+                    INSERT INTO {table} (day, {key}, opens)
+                    SELECT {_DAY.format(row='share_logs')}, {key}, COUNT(*)
+                    FROM share_logs GROUP BY 1, 2
+                """)
+                conn.execute(f"ANALYZE {table}")  # WITHOUT ROWID: cost estimates need sqlite_stat1
+        if existing["share_logs"] == "table":
+            for trigger in rollup_triggers():
+                conn.execute(trigger)
+
+for _rollup in ROLLUPS:
+    derived_table(_rollup, "share_logs")
+
+# ----------------------------
+# Query rewriting
+# ----------------------------
+_SHARE_LOGS_ONLY = {"file_id", "viewer_email", "opened_at"}
+_RANGE_OPS = (exp.GTE, exp.LT)
+_DATE_NODES = (exp.Date, exp.DateStrToDate, exp.TsOrDsToDate)
+
+def _is_share_logs_col(col: exp.Column, alias: str, only_table: bool) -> bool:
+    if col.table:
+        return col.table.lower() == alias
+    return only_table or col.name.lower() in _SHARE_LOGS_ONLY
+
+def _counts_rows(count: exp.Count, alias: str, only_table: bool, files_alias: Optional[str]) -> bool:
+    """COUNT(*) or COUNT(<NOT NULL column>): one per joined row, so SUM(opens) is exact."""
+    arg = count.this
+    if isinstance(arg, exp.Star):
+        return True
+    if not isinstance(arg, exp.Column):
+        return False  # COUNT(CASE ...), COUNT(NULLIF(...)): depends on more than the row
+    if _is_share_logs_col(arg, alias, only_table):
+        return arg.name.lower() in NOT_NULL_COLUMNS["share_logs"]
+    return arg.table.lower() == files_alias and arg.name.lower() in NOT_NULL_COLUMNS["files"]
+
+def _day_bound(node: exp.Expression) -> bool:
+    # date(...) always yields a 'YYYY-MM-DD' string (or NULL)
+    if isinstance(node, exp.Anonymous):
+        return node.name.lower() == "date"
+    return isinstance(node, _DATE_NODES)
+
+def _is_date_of(node: exp.Expression, alias: str, only_table: bool) -> bool:
+    """date(s.opened_at) / DATE(opened_at)."""
+    if isinstance(node, _DATE_NODES):
+        if any(v for k, v in node.args.items() if k != "this"):
+            return False  # date(x, modifier) is not the plain day
+        arg = node.this
+    elif isinstance(node, exp.Anonymous) and node.name.lower() == "date" and len(node.expressions) == 1:
+        arg = node.expressions[0]
+    else:
+        return False
+    return isinstance(arg, exp.Column) and arg.name.lower() == "opened_at" and _is_share_logs_col(arg, alias, only_table)
+
+def _rewrite(stmt: exp.Select) -> Optional[exp.Select]:
+    if not isinstance(stmt, exp.Select) or stmt.find(exp.Subquery, exp.Union, exp.With):
+        return None
+    tables = list(stmt.find_all(exp.Table))
+    logs = [t for t in tables if t.name.lower() == "share_logs"]
+    if len(logs) != 1 or any(t.name.lower() not in ("share_logs", "files") for t in tables):
+        return None
+    table = logs[0]
+    alias = (table.alias or "share_logs").lower()
+    only_table = len(tables) == 1
+    # Every joined row must be one share_logs row: inner joins only
+    for join in stmt.args.get("joins") or ():
+        if join.side or join.kind in ("CROSS", "OUTER", "FULL"):
+            return None
+    files = next((t for t in tables if t.name.lower() == "files"), None)
+    files_alias = (files.alias or "files").lower() if files is not None else None
+    counts = [c for c in stmt.find_all(exp.Count)]
+    if not counts or not all(_counts_rows(c, alias, only_table, files_alias) for c in counts):
+        return None
+    if any(not isinstance(a, exp.Count) for a in stmt.find_all(exp.AggFunc)):
+        return None
+
+    stmt = stmt.copy()
+    keys = set()
+    # ORDER BY n / HAVING n may name an output column rather than a share_logs one
+    outputs = {e.alias.lower() for e in stmt.expressions if e.alias} - _SHARE_LOGS_ONLY - {"id"}
+    # date(opened_at) is exactly the rollup day
+    for node in list(stmt.find_all(exp.Anonymous, *_DATE_NODES)):
+        if _is_date_of(node, alias, only_table):
+            node.replace(exp.column("day", table=alias))
+    for col in list(stmt.find_all(exp.Column)):
+        if not _is_share_logs_col(col, alias, only_table) or (not col.table and col.name.lower() in outputs):
+            continue
+        name = col.name.lower()
+        if isinstance(col.parent, exp.Count):
+            continue  # COUNT(s.id) etc. become SUM(opens) below
+        if name in ROLLUPS.values():
+            keys.add(name)
+        elif name == "opened_at":
+            # Only day-aligned range bounds translate exactly
+            cond = col.parent
+            if not (isinstance(cond, _RANGE_OPS) and cond.this is col and _day_bound(cond.expression)):
+                return None
+            col.replace(exp.column("day", table=alias))
+        elif name != "day":
+            return None
+    if len(keys) > 1:
+        return None
+    key = keys.pop() if keys else "file_id"
+    if key == "viewer_email" and len(tables) > 1:
+        return None  # the viewer rollup cannot join to files
+    rollup = next(t for t, k in ROLLUPS.items() if k == key)
+
+    # Keep the result column names of unaliased outputs such as COUNT(*) * 2
+    for output in list(stmt.expressions):
+        if not isinstance(output, exp.Alias) and output.find(exp.Count):
+            output.replace(exp.alias_(output.copy(), output.sql(dialect="sqlite"), quoted=True))
+    for count in list(stmt.find_all(exp.Count)):
+        # COUNT is 0 over no rows where SUM is NULL
+        count.replace(exp.func("COALESCE", exp.Sum(this=exp.column("opens", table=alias)), exp.Literal.number(0)))
+    for t in list(stmt.find_all(exp.Table)):
+        if t.name.lower() == "share_logs":
+            t.replace(exp.to_table(rollup).as_(alias))
+    return stmt
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def rewrite_for_rollups(sql: str) -> str:
+    """
+    Route COUNT aggregates over share_logs to the daily rollups when the
+    answer is provably the same; otherwise return `sql` unchanged. Bind
+    parameters keep their order, so the caller's params still apply.
+    """
+    try:
+        rewritten = _rewrite(sqlglot.parse_one(sql, read="sqlite"))
+    except Exception:
+        return sql
+    return rewritten.sql(dialect="sqlite") if rewritten is not None else sql
@@ -1,76 +1,72 @@
 import re
-from datetime import datetime, timedelta
-from core.database import run_sql, last_week_timestamp
-from data.mock_api import fetch_user_metrics
+from core.database import run_sql_async, last_week_timestamp
+from core.federation import federated_join, hash_join
+from core.intents import match_intent
+from data.connectors import get_connector
+import data.mock_api  # registers the user_metrics connector
 
-def route_query(user_query: str):
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+
+async def route_query(user_query: str):
     """
     Interprets the user's query and decides which data sources to call.
     Can call: SQLite, Mock API, or both.
     """
     q = user_query.lower().strip()
+    # Email filters in the question are pushed down to every source
+    emails = sorted(set(EMAIL_RE.findall(q)))
 
     # ----------------------------
-    # Example 1: Files-related query → SQLite only
+    # Example 1: Questions with an intent template → SQLite only
     # ----------------------------
-    if "file" in q:
-        if "opened more than" in q:
-            m = re.search(r"(more than|over)\s+(\d+)\s+times", q)
-            threshold = int(m.group(2)) if m else 1
-            sql = """
-                SELECT f.name, COUNT(s.id) AS opens
-                FROM files f
-                JOIN share_logs s ON s.file_id = f.id
-                GROUP BY f.id
-                HAVING COUNT(s.id) > ?
-                ORDER BY opens DESC;
-            """
-            return run_sql(sql, (threshold,))
-
-        if "top files" in q:
-            sql = """
-                SELECT f.name, COUNT(s.id) AS opens
-                FROM files f
-                LEFT JOIN share_logs s ON s.file_id = f.id
-                GROUP BY f.id
-                ORDER BY opens DESC;
-            """
-            return run_sql(sql)
+    match = match_intent(user_query)
+    if match is not None:
+        return await run_sql_async(match.sql, match.params)
 
     # ----------------------------
     # Example 2: User metrics → Mock API only
     # ----------------------------
     if "user" in q and "metrics" in q:
-        return fetch_user_metrics()
+        return await get_connector("user_metrics").fetch(emails or None)
 
     # ----------------------------
     # Example 3: Combined query (merge both)
     # ----------------------------
     if "file" in q and "engagement" in q:
-        sql = """
-            SELECT DISTINCT s.viewer_email AS email, COUNT(s.id) AS opens
+        email_filter = ""
+        params = [last_week_timestamp()]
+        if emails:
+            email_filter = f"AND s.viewer_email IN ({', '.join('?' * len(emails))})"
+            params.extend(emails)
+        sql = f"""
+            SELECT s.viewer_email AS email, COUNT(s.id) AS opens
             FROM share_logs s
-            WHERE s.opened_at >= ?
+            WHERE s.opened_at >= ? {email_filter}
             GROUP BY s.viewer_email;
         """
-        file_stats = run_sql(sql, (last_week_timestamp(),))
-        user_metrics = fetch_user_metrics()
-        return merge_results(file_stats, user_metrics)
+        # Both sources are fetched concurrently, then hash-joined
+        pairs = await federated_join(
+            lambda: run_sql_async(sql, tuple(params)),
+            lambda: get_connector("user_metrics").fetch(emails or None),
+            key="email",
+        )
+        return _project_engagement(pairs)
 
     raise ValueError("Unsupported query pattern")
 
-def merge_results(file_stats, user_metrics):
+def merge_results(file_stats, user_metrics, how: str = "inner"):
     """
-    Merge results from both sources by email (like a join).
+    Merge results from both sources by email (hash join on the smaller side).
     """
+    return _project_engagement(hash_join(file_stats, user_metrics, "email", how))
+
+def _project_engagement(pairs):
     merged = []
-    for f in file_stats:
-        for u in user_metrics:
-            if f["email"] == u["email"]:
-                merged.append({
-                    "email": f["email"],
-                    "opens": f["opens"],
-                    "engagement_score": u["engagement_score"],
-                    "last_active": u["last_active"]
-                })
+    for f, u in pairs:
+        merged.append({
+            "email": f["email"],
+            "opens": f["opens"],
+            "engagement_score": u["engagement_score"] if u else None,
+            "last_active": u["last_active"] if u else None,
+        })
     return merged
@@ -0,0 +1,228 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from core.database import READ_POOL_SIZE
+
+@dataclass(frozen=True)
+class TierPolicy:
+    weight: float          # share of capacity when tiers compete
+    max_share: float       # fraction of capacity the tier may hold at once
+    max_queue: int         # waiters beyond this are shed
+    rate: float            # requests per second per user
+    burst: float           # token bucket size per user
+
+TIER_POLICIES: Dict[str, TierPolicy] = {
+    "basic": TierPolicy(weight=1, max_share=0.5, max_queue=int(os.getenv("SCHED_MAX_QUEUE_BASIC", "50")),
+                        rate=float(os.getenv("RATE_LIMIT_BASIC", "2")), burst=5),
+    "premium": TierPolicy(weight=3, max_share=0.75, max_queue=int(os.getenv("SCHED_MAX_QUEUE_PREMIUM", "100")),
+                          rate=float(os.getenv("RATE_LIMIT_PREMIUM", "10")), burst=20),
+    "enterprise": TierPolicy(weight=6, max_share=1.0, max_queue=int(os.getenv("SCHED_MAX_QUEUE_ENTERPRISE", "200")),
+                             rate=float(os.getenv("RATE_LIMIT_ENTERPRISE", "50")), burst=100),
+}
+SCHED_MAX_WAIT_SECONDS = float(os.getenv("SCHED_MAX_WAIT_SECONDS", "10"))
+
+def policy_for(tier: Optional[str]) -> Tuple[str, TierPolicy]:
+    tier = tier if tier in TIER_POLICIES else "basic"
+    return tier, TIER_POLICIES[tier]
+
+class RateLimitedError(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class OverloadedError(Exception):
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class RateLimiter:
+    """Per-user token buckets; the tier sets refill rate and burst size."""
+
+    def __init__(self, max_users: int = 100000):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        # user -> (tokens, updated_at), least recently used first
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._stats = {"allowed": 0, "limited": 0}
+
+    def check(self, user: str, tier: Optional[str]):
+        """Take one token for `user` or raise RateLimitedError."""
+        tier, policy = policy_for(tier)
+        self.take(user, policy.rate, policy.burst, f"Rate limit exceeded for the {tier} tier")
+
+    def take(self, key: str, rate: float, burst: float, message: str):
+        """Take one token from `key`'s bucket (refilled at `rate`/s up to `burst`)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if key in self._buckets:
+                self._buckets.move_to_end(key)
+            else:
+                # Forget the longest-idle users, whose buckets have most
+                # likely refilled; a flood of new keys cannot reset busy ones
+                while len(self._buckets) >= self.max_users:
+                    self._buckets.popitem(last=False)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self._stats["limited"] += 1
+                raise RateLimitedError(message, retry_after=(1 - tokens) / rate)
+            self._buckets[key] = (tokens - 1, now)
+            self._stats["allowed"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["users"] = len(self._buckets)
+        return s
+
+class _Held:
+    """One granted slot; released once, by slot() or by whoever detached it."""
+
+    def __init__(self, release: Callable[[], None]):
+        self._release = release
+        self._released = False
+        self.detached = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._release()
+
+class _TierState:
+    def __init__(self):
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.active = 0
+        self.vtime = 0.0
+        self.stats = {"admitted": 0, "shed": 0, "timeouts": 0, "wait_seconds": 0.0}
+
+class FairScheduler:
+    """
+    Weighted fair queuing over a fixed number of slots.
+
+    Each tier may hold at most `max_share` of the slots. When a slot frees
+    up it goes to the waiting tier with the lowest virtual time, which
+    advances by 1/weight per grant, so under contention tiers are served in
+    proportion to their weights and one busy tier cannot starve another.
+    Queues longer than the tier's `max_queue` are shed.
+    """
+
+    def __init__(self, name: str, capacity: int, max_wait: float = SCHED_MAX_WAIT_SECONDS):
+        self.name = name
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self._active = 0
+        self._tiers: Dict[str, _TierState] = {t: _TierState() for t in TIER_POLICIES}
+        self._held: ContextVar[Optional[_Held]] = ContextVar(f"{name}_slot", default=None)
+
+    def _limit(self, policy: TierPolicy) -> int:
+        return max(1, int(self.capacity * policy.max_share))
+
+    def _can_run(self, tier: str) -> bool:
+        return self._active < self.capacity and self._tiers[tier].active < self._limit(TIER_POLICIES[tier])
+
+    def _grant(self, tier: str):
+        state = self._tiers[tier]
+        state.active += 1
+        state.vtime += 1 / TIER_POLICIES[tier].weight
+        state.stats["admitted"] += 1
+        self._active += 1
+
+    def _dispatch(self):
+        while self._active < self.capacity:
+            ready = [t for t, s in self._tiers.items() if s.waiters and self._can_run(t)]
+            if not ready:
+                return
+            tier = min(ready, key=lambda t: self._tiers[t].vtime)
+            waiter = self._tiers[tier].waiters.popleft()
+            self._grant(tier)
+            waiter.set_result(None)
+
+    def _release(self, tier: str):
+        self._tiers[tier].active -= 1
+        self._active -= 1
+        self._dispatch()
+
+    def _abandon(self, tier: str, waiter: asyncio.Future):
+        if waiter.done():
+            self._release(tier)  # granted just as the caller gave up
+            return
+        waiter.cancel()
+        try:
+            self._tiers[tier].waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    async def acquire(self, tier: Optional[str]) -> str:
+        tier, policy = policy_for(tier)
+        state = self._tiers[tier]
+        if not state.waiters and not state.active:
+            # A tier returning from idle must not spend credit banked while idle
+            busy = [s.vtime for s in self._tiers.values() if s.waiters or s.active]
+            if busy:
+                state.vtime = max(state.vtime, min(busy))
+        if not state.waiters and self._can_run(tier):
+            self._grant(tier)
+            return tier
+        if len(state.waiters) >= policy.max_queue:
+            state.stats["shed"] += 1
+            raise OverloadedError(f"{self.name} queue for the {tier} tier is full")
+        waiter = asyncio.get_running_loop().create_future()
+        state.waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except asyncio.TimeoutError:
+            state.stats["timeouts"] += 1
+            self._abandon(tier, waiter)
+            raise OverloadedError(f"{self.name} queue wait exceeded {self.max_wait:g}s")
+        except asyncio.CancelledError:
+            self._abandon(tier, waiter)
+            raise
+        finally:
+            state.stats["wait_seconds"] += time.monotonic() - started
+        return tier
+
+    @asynccontextmanager
+    async def slot(self, tier: Optional[str]):
+        tier = await self.acquire(tier)
+        held = _Held(lambda: self._release(tier))
+        token = self._held.set(held)
+        try:
+            yield
+        finally:
+            self._held.reset(token)
+            if not held.detached:
+                held.release()
+
+    def detach(self) -> Optional[Callable[[], None]]:
+        """
+        Keep the enclosing slot() past the end of its block, e.g. for a
+        response that is still reading rows afterwards. Returns the function
+        that releases it (idempotent), or None outside any slot().
+        """
+        held = self._held.get()
+        if held is None:
+            return None
+        held.detached = True
+        return held.release
+
+    def stats(self) -> dict:
+        tiers = {}
+        for t, s in self._tiers.items():
+            tiers[t] = dict(s.stats, queued=len(s.waiters), active=s.active, limit=self._limit(TIER_POLICIES[t]))
+        return {"capacity": self.capacity, "active": self._active, "tiers": tiers}
+
+RATE_LIMITER = RateLimiter()
+LLM_SCHEDULER = FairScheduler("llm", int(os.getenv("SCHED_LLM_SLOTS", "32")))
+DB_SCHEDULER = FairScheduler("database", int(os.getenv("SCHED_DB_SLOTS", str(READ_POOL_SIZE))))
+
+def scheduler_stats() -> dict:
+    return {"rate_limits": RATE_LIMITER.stats(), "llm": LLM_SCHEDULER.stats(), "database": DB_SCHEDULER.stats()}
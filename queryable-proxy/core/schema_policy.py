@@ -1,20 +1,51 @@
+from typing import Iterable, Optional
+
 ALLOWED_SCHEMA = {
     "files": ["id", "name", "created_at"],
     "share_logs": ["id", "file_id", "viewer_email", "opened_at"],
 }
 
+# Columns that can never be NULL; keyset pagination compares them with
+# plain ranges an index can seek on
+NOT_NULL_COLUMNS = {
+    "files": ["id", "name", "created_at"],
+    "share_logs": ["id", "file_id", "viewer_email", "opened_at"],
+}
+
+# (table, column) -> (referenced table, column)
+RELATIONSHIPS = [
+    (("share_logs", "file_id"), ("files", "id")),
+]
+
+# Words users say for a table that its own and its columns' names do not
+# contain; they steer schema retrieval for the LLM prompt
+TABLE_KEYWORDS = {
+    "files": ["document", "doc", "filename", "title", "created", "uploaded", "new"],
+    "share_logs": ["share", "shared", "open", "opened", "opens", "view", "viewed", "views", "viewer",
+                   "visit", "visited", "access", "accessed", "activity", "who", "user", "email", "popular"],
+}
+
+# (table the note is about, or None for every prompt, note)
+NOTES = [
+    (None, "timestamps are ISO8601 strings"),
+    ("share_logs", "use date(opened_at) for day-level filters"),
+    (None, "default to LIMIT 100 if not specified"),
+]
+
 # Optional: expose a human-readable summary for the LLM
-def schema_description() -> str:
+def schema_description(tables: Optional[Iterable[str]] = None) -> str:
+    """Summary of `tables` (all allowed tables when None) and the links between them."""
+    wanted = set(ALLOWED_SCHEMA if tables is None else tables)
     lines = []
     lines.append("tables:")
     for t, cols in ALLOWED_SCHEMA.items():
-        lines.append(f"- {t}({', '.join(cols)})")
-    lines.append("""
-relationships:
-- share_logs.file_id -> files.id
-notes:
-- timestamps are ISO8601 strings
-- use date(opened_at) for day-level filters
-- default to LIMIT 100 if not specified
-""")
-    return "\n".join(lines)
+        if t in wanted:
+            lines.append(f"- {t}({', '.join(cols)})")
+    links = [(src, dst) for src, dst in RELATIONSHIPS if src[0] in wanted and dst[0] in wanted]
+    if links:
+        lines.append("")
+        lines.append("relationships:")
+        lines.extend(f"- {src[0]}.{src[1]} -> {dst[0]}.{dst[1]}" for src, dst in links)
+    lines.append("notes:")
+    lines.extend(f"- {note}" for table, note in NOTES if table is None or table in wanted)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,169 @@
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Local file shared by every worker process on the host; empty disables it
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "10000"))
+# Entries larger than this (pickled) stay process-local
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(1 << 20)))
+_PRUNE_EVERY = 200
+
+# Version every entry depends on; bumped when the written tables are unknown
+_ALL_TABLES = "*"
+
+def cache_key(*parts) -> str:
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+class SharedCache:
+    """
+    Cross-process cache tier in a local SQLite file (WAL), read and
+    written by every worker.
+
+    Each entry stores the version of every table it read. A write from any
+    worker bumps those versions in the same file, which invalidates the
+    entry for all workers without scanning for it. Values are pickled, so
+    the file must only ever be shared between trusted local processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._puts = 0
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "puts": 0, "errors": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        # Opened on first use so importing this module costs nothing
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF")  # a cache: losing it on power loss is fine
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                tables TEXT NOT NULL,
+                versions TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def _versions(self, conn: sqlite3.Connection, tables: Tuple[str, ...]) -> str:
+        names = (_ALL_TABLES,) + tuple(sorted(tables))
+        rows = dict(conn.execute(
+            f"SELECT name, version FROM table_versions WHERE name IN ({','.join('?' * len(names))})", names
+        ).fetchall())
+        return ",".join(str(rows.get(n, 0)) for n in names)
+
+    def write_sequence(self) -> Optional[str]:
+        """Token that changes whenever any table version is bumped."""
+        with self._lock:
+            try:
+                row = self._db().execute("SELECT COALESCE(SUM(version), 0) FROM table_versions").fetchone()
+                return str(row[0])
+            except sqlite3.Error:
+                self._stats["errors"] += 1
+                return None
+
+    def get(self, key: str) -> Tuple[bool, object, Tuple[str, ...]]:
+        """(found, value, tables read) for a live entry."""
+        with self._lock:
+            try:
+                conn = self._db()
+                row = conn.execute("SELECT value, tables, versions FROM entries WHERE key = ? AND expires_at > ?",
+                                   (key, time.time())).fetchone()
+                if row is None:
+                    self._stats["misses"] += 1
+                    return False, None, ()
+                value, tables, versions = row
+                tables = tuple(t for t in tables.split(",") if t)
+                if versions != self._versions(conn, tables):
+                    self._stats["stale"] += 1
+                    return False, None, ()
+            except sqlite3.Error as e:
+                self._stats["errors"] += 1
+                logger.debug("shared cache read failed: %s", e)
+                return False, None, ()
+            self._stats["hits"] += 1
+        return True, pickle.loads(value), tables
+
+    def put(self, key: str, value, tables: Iterable[str], ttl: float, sequence: Optional[str]):
+        """
+        Store `value`; `sequence` is write_sequence() from before the value
+        was read, and the entry is dropped if any write happened since.
+        """
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > SHARED_CACHE_MAX_BYTES or sequence is None:
+            return
+        tables = tuple(sorted(set(tables)))
+        with self._lock:
+            try:
+                conn = self._db()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    now = conn.execute("SELECT COALESCE(SUM(version), 0) FROM table_versions").fetchone()
+                    if str(now[0]) == sequence:
+                        conn.execute("INSERT OR REPLACE INTO entries (key, value, tables, versions, expires_at) "
+                                     "VALUES (?, ?, ?, ?, ?)",
+                                     (key, blob, ",".join(tables), self._versions(conn, tables), time.time() + ttl))
+                        self._stats["puts"] += 1
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                self._puts += 1
+                if self._puts % _PRUNE_EVERY == 0:
+                    self._prune(conn)
+            except sqlite3.Error as e:
+                self._stats["errors"] += 1
+                logger.debug("shared cache write failed: %s", e)
+
+    def _prune(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        conn.execute("""
+            DELETE FROM entries WHERE key IN (
+                SELECT key FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (SHARED_CACHE_MAX_ENTRIES,))
+
+    def bump(self, tables: Optional[Iterable[str]] = None):
+        """Invalidate every entry that read any of `tables` (all entries when None)."""
+        names = [_ALL_TABLES] if tables is None else sorted(set(tables))
+        with self._lock:
+            try:
+                self._db().executemany(
+                    "INSERT INTO table_versions (name, version) VALUES (?, 1) "
+                    "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+                    [(n,) for n in names],
+                )
+            except sqlite3.Error as e:
+                self._stats["errors"] += 1
+                logger.warning("shared cache invalidation failed: %s", e)
+
+    def clear(self):
+        with self._lock:
+            try:
+                self._db().execute("DELETE FROM entries")
+            except sqlite3.Error:
+                self._stats["errors"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+        lookups = s["hits"] + s["misses"] + s["stale"]
+        s["hit_ratio"] = s["hits"] / lookups if lookups else 0.0
+        s["path"] = self.path
+        return s
+
+SHARED_CACHE: Optional[SharedCache] = SharedCache(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None
@@ -0,0 +1,30 @@
+import json
+from typing import AsyncIterator, List
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+JSON_MEDIA_TYPE = "application/json"
+
+def _dumps(obj) -> str:
+    # bytes/BLOB columns are not JSON-native
+    return json.dumps(obj, default=str, separators=(",", ":"))
+
+async def ndjson_stream(sql: str, params, chunks: AsyncIterator[List[dict]]):
+    """First line is {"sql", "params"}; every following line is one row."""
+    yield _dumps({"sql": sql, "params": list(params)}) + "\n"
+    async for rows in chunks:
+        yield "".join(_dumps(r) + "\n" for r in rows)
+
+async def json_array_stream(sql: str, params, chunks: AsyncIterator[List[dict]]):
+    """Same document as the buffered QueryResponse, written row chunk by row chunk."""
+    yield '{"sql":' + _dumps(sql) + ',"params":' + _dumps(list(params)) + ',"data":['
+    first = True
+    async for rows in chunks:
+        body = ",".join(_dumps(r) for r in rows)
+        yield body if first else "," + body
+        first = False
+    yield "]}"
+
+STREAM_FORMATS = {
+    "ndjson": (ndjson_stream, NDJSON_MEDIA_TYPE),
+    "json": (json_array_stream, JSON_MEDIA_TYPE),
+}
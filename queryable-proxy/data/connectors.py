@@ -0,0 +1,197 @@
+import asyncio
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import httpx
+except ImportError:  # optional: only needed for HttpJsonConnector
+    httpx = None
+
+CONNECTOR_TIMEOUT_SECONDS = float(os.getenv("CONNECTOR_TIMEOUT_SECONDS", "5"))
+CONNECTOR_CACHE_MAX_KEYS = int(os.getenv("CONNECTOR_CACHE_MAX_KEYS", "10000"))
+
+class ConnectorError(Exception):
+    pass
+
+class Connector:
+    """
+    Base class for an external (non-SQLite) data source.
+
+    Subclasses implement `_fetch(keys)`; this class adds a per-key
+    LRU+TTL cache, batching of key lookups, bounded concurrency, per-call
+    timeouts and retry with exponential backoff.
+    """
+
+    name = "connector"
+    key = "id"                       # column rows are looked up / joined by
+    schema: Dict[str, str] = {}      # column -> type, for planners and docs
+
+    def __init__(self, ttl: float = 30.0, batch_size: int = 100, max_concurrency: int = 4,
+                 max_retries: int = 2, backoff: float = 0.1, timeout: float = CONNECTOR_TIMEOUT_SECONDS,
+                 max_keys: int = CONNECTOR_CACHE_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._cache: "OrderedDict[object, Tuple[float, List[dict]]]" = OrderedDict()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stats = {"calls": 0, "retries": 0, "failures": 0, "cache_hits": 0, "cache_misses": 0,
+                       "cache_evictions": 0}
+
+    # ----------------------------
+    # To implement
+    # ----------------------------
+    async def _fetch(self, keys: Optional[List]) -> List[dict]:
+        """Return rows for `keys` (every row when keys is None)."""
+        raise NotImplementedError
+
+    def normalize_key(self, value):
+        return value
+
+    # ----------------------------
+    # Resilience
+    # ----------------------------
+    def _limiter(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _fetch_with_retry(self, keys: Optional[List]) -> List[dict]:
+        async with self._limiter():
+            for attempt in range(self.max_retries + 1):
+                self._stats["calls"] += 1
+                try:
+                    return await asyncio.wait_for(self._fetch(keys), self.timeout)
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        self._stats["failures"] += 1
+                        raise ConnectorError(f"{self.name}: {e or type(e).__name__}") from e
+                    self._stats["retries"] += 1
+                    # Exponential backoff with jitter
+                    await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    # ----------------------------
+    # Cache
+    # ----------------------------
+    def _cache_get(self, key, now: float) -> Optional[List[dict]]:
+        hit = self._cache.get(key)
+        if hit is None:
+            return None
+        if hit[0] <= now:
+            del self._cache[key]  # expired: don't let it hold a slot
+            return None
+        self._cache.move_to_end(key)
+        return hit[1]
+
+    def _cache_put(self, key, expires: float, rows: List[dict]):
+        self._cache[key] = (expires, rows)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_keys:
+            self._cache.popitem(last=False)
+            self._stats["cache_evictions"] += 1
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    async def fetch(self, keys: Optional[Iterable] = None) -> List[dict]:
+        """Rows for the given keys (or all rows), served from cache where fresh."""
+        now = time.monotonic()
+        if keys is None:
+            hit = self._cache_get(None, now)
+            if hit is not None:
+                self._stats["cache_hits"] += 1
+                return list(hit)
+            self._stats["cache_misses"] += 1
+            rows = await self._fetch_with_retry(None)
+            self._cache_put(None, now + self.ttl, rows)
+            return list(rows)
+
+        wanted = list(dict.fromkeys(self.normalize_key(k) for k in keys))
+        found: Dict[object, List[dict]] = {}
+        missing = []
+        for k in wanted:
+            hit = self._cache_get(k, now)
+            if hit is not None:
+                found[k] = hit
+            else:
+                missing.append(k)
+        self._stats["cache_hits"] += len(wanted) - len(missing)
+        self._stats["cache_misses"] += len(missing)
+
+        if missing:
+            batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+            results = await asyncio.gather(*(self._fetch_with_retry(b) for b in batches))
+            expires = time.monotonic() + self.ttl
+            for k in missing:
+                found[k] = []
+            for rows in results:
+                for row in rows:
+                    k = self.normalize_key(row.get(self.key))
+                    if k in found:
+                        found[k].append(row)
+            for k in missing:
+                self._cache_put(k, expires, found[k])  # empty lists are cached too
+
+        return [row for k in wanted for row in found[k]]
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        s = dict(self._stats)
+        s["cached_keys"] = len(self._cache)
+        return s
+
+class HttpJsonConnector(Connector):
+    """
+    Connector for a JSON HTTP endpoint that returns a list of rows and
+    accepts repeated `?<key>=` query parameters as a filter.
+    """
+
+    def __init__(self, name: str, url: str, key: str, schema: Optional[Dict[str, str]] = None, **kwargs):
+        super().__init__(**kwargs)
+        if httpx is None:
+            raise RuntimeError("httpx is required for HttpJsonConnector")
+        self.name = name
+        self.url = url
+        self.key = key
+        self.schema = schema or {}
+        self._client: Optional["httpx.AsyncClient"] = None
+
+    async def _fetch(self, keys: Optional[List]) -> List[dict]:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        params = [(self.key, k) for k in keys] if keys is not None else None
+        response = await self._client.get(self.url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+# ----------------------------
+# Registry
+# ----------------------------
+_REGISTRY: Dict[str, Connector] = {}
+
+def register(connector: Connector) -> Connector:
+    _REGISTRY[connector.name] = connector
+    return connector
+
+def get_connector(name: str) -> Connector:
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        raise ConnectorError(f"Unknown data source: {name}")
+
+def connectors() -> Dict[str, Connector]:
+    return dict(_REGISTRY)
+
+async def fetch_many(requests: Dict[str, Optional[Iterable]]) -> Dict[str, List[dict]]:
+    """Fan out to several connectors at once: {name: keys or None} -> {name: rows}."""
+    names = list(requests)
+    results = await asyncio.gather(*(get_connector(n).fetch(requests[n]) for n in names))
+    return dict(zip(names, results))
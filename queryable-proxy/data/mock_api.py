@@ -1,9 +1,22 @@
+import asyncio
+import os
 import random
 from datetime import datetime, timedelta
+from typing import List, Optional
 
-def fetch_user_metrics():
-    """Pretend this calls an external REST API."""
-    users = ["josh@example.com", "tyler@example.com", "ceo@invest.com"]
+from data.connectors import Connector, HttpJsonConnector, register
+
+MOCK_USERS = ["josh@example.com", "tyler@example.com", "ceo@invest.com"]
+
+def fetch_user_metrics(emails=None):
+    """
+    Pretend this calls an external REST API.
+    `emails` is pushed down to the API as a filter (None means all users).
+    """
+    users = MOCK_USERS
+    if emails is not None:
+        wanted = {e.lower() for e in emails}
+        users = [u for u in users if u in wanted]
     metrics = []
     for u in users:
         metrics.append({
@@ -12,3 +25,37 @@ def fetch_user_metrics():
             "last_active": (datetime.utcnow() - timedelta(days=random.randint(1, 10))).isoformat()
         })
     return metrics
+
+class UserMetricsConnector(Connector):
+    """The mock user-metrics API as a connector, with injectable latency/failures."""
+
+    name = "user_metrics"
+    key = "email"
+    schema = {"email": "TEXT", "engagement_score": "INTEGER", "last_active": "TEXT"}
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def normalize_key(self, value):
+        return value.lower() if isinstance(value, str) else value
+
+    async def _fetch(self, keys: Optional[List]) -> List[dict]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ConnectionError("mock user-metrics API unavailable")
+        return fetch_user_metrics(keys)
+
+def _user_metrics_connector() -> Connector:
+    # USER_METRICS_URL points at a real (or data/stub_server.py) endpoint
+    url = os.getenv("USER_METRICS_URL")
+    if url:
+        return HttpJsonConnector("user_metrics", url, key="email", schema=UserMetricsConnector.schema)
+    return UserMetricsConnector(
+        latency=float(os.getenv("MOCK_API_LATENCY_MS", "0")) / 1000,
+        failure_rate=float(os.getenv("MOCK_API_FAILURE_RATE", "0")),
+    )
+
+USER_METRICS = register(_user_metrics_connector())
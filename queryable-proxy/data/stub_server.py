@@ -0,0 +1,23 @@
+"""
+Local stand-in for the external user-metrics API.
+
+    uvicorn data.stub_server:app --port 8100
+    USER_METRICS_URL=http://127.0.0.1:8100/user-metrics uvicorn main:app
+"""
+import asyncio
+import os
+from typing import List, Optional
+
+from fastapi import FastAPI, Query
+
+from data.mock_api import fetch_user_metrics
+
+STUB_LATENCY_SECONDS = float(os.getenv("STUB_LATENCY_MS", "0")) / 1000
+
+app = FastAPI(title="User metrics stub API")
+
+@app.get("/user-metrics")
+async def user_metrics(email: Optional[List[str]] = Query(None)):
+    if STUB_LATENCY_SECONDS:
+        await asyncio.sleep(STUB_LATENCY_SECONDS)
+    return fetch_user_metrics(email)
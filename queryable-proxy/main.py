@@ -1,22 +1,63 @@
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from datetime import datetime
+from core.lifecycle import on_startup, run_startup, startup_stats
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Any
-import sqlite3
+from pydantic import Field, model_validator
+from typing import Any, List, Literal, Optional, Tuple
 
-from ai.llm_gemini import nl_to_sql_with_llm
-from core.guardrails import compile_safe_query, SqlGuardError
-from auth.jwt import get_current_active_user
+from ai.client import LLMTimeoutError
+from ai.llm_gemini import nl_to_sql_async, nl_to_sql_batch_async, prompt_stats, SQL_CACHE, LLM_CLIENT
+from core.columnar import ARROW_STREAM_MEDIA_TYPE, arrow_available, arrow_ipc_bytes, columnar_body
+from core.database import run_sql_async, run_sql_columns_async, run_sql_many_async, stream_sql, pool_stats, run_db
+from core.database import warm_pools
+from core.database import QueryTimeoutError, query_deadline
+from core.cost import QueryCostError, admit, budget_for
+from core.metrics import PROMETHEUS_MEDIA_TYPE, register_collector, render_metrics, span
+from core.scheduler import DB_SCHEDULER, LLM_SCHEDULER, RATE_LIMITER, OverloadedError, RateLimitedError, scheduler_stats
+from core.streaming import STREAM_FORMATS, NDJSON_MEDIA_TYPE
+from core.guardrails import compile_safe_query, SqlGuardError, PLAN_CACHE
+from core.intents import INTENT_MATCHER, INTENTS_BY_NAME, match_intent
+from core.ingest import INGESTER, share_log_row
+from core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CursorCodec, CursorError, CursorState, paginate
+from core.result_cache import RESULT_CACHE, cached_result, cached_results
+from core import index_advisor
+from core.partitions import maintain, maintenance_loop, partition_stats, setup_partitions
+from core.rollups import rewrite_for_rollups, setup_rollups
+from auth.cache import auth_cache_stats
+from auth.hashing import hash_pool_stats, shutdown_hash_pool
+from auth.jwt import get_current_active_user, get_current_admin_user
 from auth.models import User
 from auth.routes import router as auth_router
 
-import os
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
+
+on_startup("rollups", exclusive=True)(setup_rollups)
+on_startup("share_logs_partitions", exclusive=True)(setup_partitions)
+on_startup("query_shapes", exclusive=True)(index_advisor.setup_advisor_table)
+on_startup("db_pools")(warm_pools)
 
-# Use absolute path for DB_PATH
-DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "proxy.db")
-app = FastAPI(title="Queryable Proxy — Phase 3 (Gemini + Guardrails)")
+# Several workers: SHARED_CACHE_PATH=/var/tmp/qp-cache.db uvicorn main:app --workers 4
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Each worker process initializes here, not at import
+    await run_startup()
+    maintenance = asyncio.create_task(maintenance_loop(), name="share-log-partitions")
+    yield
+    maintenance.cancel()
+    await INGESTER.stop()  # commit queued events before exiting
+    shutdown_hash_pool()
+
+app = FastAPI(title="Queryable Proxy — Phase 3 (Gemini + Guardrails)", lifespan=lifespan)
 
 # Add CORS middleware if needed
 app.add_middleware(
@@ -31,7 +72,6 @@ app.add_middleware(
 app.include_router(auth_router)
 
 # Mount static files
-import os
 static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
@@ -40,30 +80,53 @@ app.mount("/static", StaticFiles(directory=static_dir), name="static")
 def root():
     return RedirectResponse(url="/static/login.html")
 
-def run_sql(sql: str, params: tuple = ()):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute(sql, params)
-    rows = cur.fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
-
 class QueryRequest(BaseModel):
-    query: str
+    query: Optional[str] = None
+    # next_cursor of the previous page; resumes that query instead of asking a new one
+    cursor: Optional[str] = None
+    page_size: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+
+    @model_validator(mode="after")
+    def _query_or_cursor(self):
+        if not self.query and not self.cursor:
+            raise ValueError("query or cursor is required")
+        return self
 
 class QueryResponse(BaseModel):
     sql: str
     params: Any
     data: Any
+    next_cursor: Optional[str] = None
 
-@app.get("/health")
-def health():
-    return {"ok": True}
+CURSORS = CursorCodec()
 
-@app.get("/top-files")
-def top_files(current_user: User = Depends(get_current_active_user)):
-    sql = """
+MAX_BATCH_QUERIES = 20
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+
+class BatchQueryResult(BaseModel):
+    query: str
+    status: int = 200
+    sql: Optional[str] = None
+    params: Any = None
+    data: Any = None
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryResult]
+
+MAX_INGEST_EVENTS = int(os.getenv("INGEST_MAX_EVENTS_PER_REQUEST", "10000"))
+
+class ShareLogEvent(BaseModel):
+    file_id: int
+    viewer_email: str
+    opened_at: Optional[datetime] = None  # defaults to the time of ingest
+
+class IngestRequest(BaseModel):
+    events: List[ShareLogEvent] = Field(..., min_length=1, max_length=MAX_INGEST_EVENTS)
+
+TOP_FILES_SQL = """
     SELECT f.name, COUNT(*) as open_count
     FROM files f
     JOIN share_logs s ON f.id = s.file_id
@@ -72,31 +135,248 @@ def top_files(current_user: User = Depends(get_current_active_user)):
     ORDER BY open_count DESC
     LIMIT 10
     """
-    data = run_sql(sql)
-    return {"sql": sql, "params": [], "data": data}
+
+StreamMode = Optional[Literal["ndjson", "json"]]
+ResultFormat = Optional[Literal["rows", "columnar", "arrow"]]
+
+def _stream_mode(request: Request, stream: StreamMode) -> StreamMode:
+    if stream is None and NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return "ndjson"
+    return stream
+
+def _result_format(request: Request, format: ResultFormat) -> str:
+    if format is None and ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", ""):
+        return "arrow"
+    return format or "rows"
+
+async def execute_query(sql: str, params: tuple = (), stream: StreamMode = None, format: str = "rows",
+                        tier: Optional[str] = None, paging=None):
+    """
+    Run SQL and shape the response:
+    - rows (default): buffered JSON, or streamed when `stream` is set
+    - columnar: JSON with one array per column
+    - arrow: Arrow IPC stream (requires pyarrow)
+
+    With a `tier` (untrusted, generated SQL) the plan's estimated cost is
+    checked first and execution is cancelled past the tier's deadline.
+    COUNT aggregates over share_logs are answered from the daily rollups
+    when that gives the same result. `paging` turns buffered rows into
+    (data, next_cursor).
+    """
+    if format == "arrow" and not arrow_available():
+        raise HTTPException(status_code=406, detail="Arrow responses are not available on this server")
+    sql = rewrite_for_rollups(sql)
+    index_advisor.record(sql)
+    if tier is None:
+        return await _execute(sql, params, stream, format, paging)
+    budget, _ = await run_db(admit, sql, params, tier)
+    with query_deadline(budget.timeout):
+        return await _execute(sql, params, stream, format, paging)
+
+def resume_query(state: CursorState) -> Tuple[str, tuple]:
+    """The query a cursor continues, rebuilt and validated as on its first page."""
+    if state.intent is not None:
+        intent = INTENTS_BY_NAME.get(state.intent)
+        if intent is None or len(state.params) != len(intent.params):
+            raise CursorError("does not match a known template")
+        return intent.sql, state.params
+    return compile_safe_query(state.sql or "")
+
+async def execute_page(sql: str, params: tuple, user: User, stream: StreamMode, format: str, checked: bool,
+                       state: CursorState):
+    """
+    Run one keyset page of `sql` and attach a signed cursor for the next;
+    `state` says how to rebuild the query and where the page starts.
+    Streamed and columnar responses, and queries that cannot be paged by
+    key, run whole with their clamped LIMIT. `checked` queries go through
+    cost admission.
+    """
+    sql = rewrite_for_rollups(sql)
+    tier = user.tier if checked else None
+    page = (paginate(sql, params, state.size, state.after, state.remaining)
+            if stream is None and format == "rows" else None)
+    if page is None:
+        if state.after is not None:
+            raise CursorError("only buffered row responses can be resumed")
+        return await execute_query(sql, params, stream, format, tier=tier)
+
+    def paging(rows):
+        data, more = page.split(rows)
+        if more is None:
+            return data, None
+        return data, CURSORS.encode(replace(state, after=more[0], remaining=more[1]), user.email)
+
+    return await execute_query(page.sql, page.params, stream, format, tier=tier, paging=paging)
+
+async def _execute(sql: str, params: tuple, stream: StreamMode, format: str, paging=None):
+    if format in ("columnar", "arrow"):
+        names, columns = await cached_result("columns", sql, params, run_sql_columns_async)
+        with span("serialize"):
+            if format == "columnar":
+                return JSONResponse(columnar_body(sql, params, names, columns))
+            body = await run_in_threadpool(arrow_ipc_bytes, sql, params, names, columns)
+            return Response(body, media_type=ARROW_STREAM_MEDIA_TYPE)
+    if stream is None:
+        data = await cached_result("rows", sql, params, run_sql_async)
+        with span("serialize"):
+            if paging is None:
+                return JSONResponse({"sql": sql, "params": params, "data": data})
+            data, next_cursor = paging(data)
+            return JSONResponse({"sql": sql, "params": params, "data": data, "next_cursor": next_cursor})
+    encode, media_type = STREAM_FORMATS[stream]
+    chunks = await stream_sql(sql, params)
+    # Rows are read after the handler returns; the stream keeps its
+    # database slot (and read connection) until it ends
+    body = _holding(encode(sql, params, chunks), DB_SCHEDULER.detach())
+    # Started here: a generator that never ran has no finally to run if the
+    # response is dropped unsent, while a started one is closed when collected
+    try:
+        first = await body.__anext__()
+    except StopAsyncIteration:
+        return StreamingResponse(iter(()), media_type=media_type)
+    return StreamingResponse(_prepend(first, body), media_type=media_type)
+
+async def _holding(body, release):
+    try:
+        async for part in body:
+            yield part
+    finally:
+        if release is not None:
+            release()
+
+async def _prepend(first, rest):
+    yield first
+    async for part in rest:
+        yield part
+
+@app.get("/health")
+def health():
+    return {"ok": True}
+
+@app.get("/cache/stats")
+def cache_stats(current_user: User = Depends(get_current_active_user)):
+    return {
+        "nl_to_sql": SQL_CACHE.stats(),
+        "llm": LLM_CLIENT.stats(),
+        "prompts": prompt_stats(),
+        "query_plans": PLAN_CACHE.stats(),
+        "results": RESULT_CACHE.stats(),
+        "auth": auth_cache_stats(),
+        "db_pools": pool_stats(),
+        "scheduler": scheduler_stats(),
+        "password_hashing": hash_pool_stats(),
+        "startup": startup_stats(),
+        "intents": INTENT_MATCHER.stats(),
+        "ingest": INGESTER.stats(),
+    }
+
+@register_collector
+def _service_gauges():
+    caches = {
+        "nl_to_sql": SQL_CACHE.stats(),
+        "results": RESULT_CACHE.stats(),
+        "auth_users": auth_cache_stats()["users"],
+        "auth_tokens": auth_cache_stats()["tokens"],
+    }
+    plans = PLAN_CACHE.stats()
+    plan_lookups = plans["hits"] + plans["misses"]
+    yield "cache_hit_ratio", "Hits per lookup since start", (
+        [({"cache": name}, c["hit_ratio"]) for name, c in caches.items()]
+        + [({"cache": "query_plans"}, plans["hits"] / plan_lookups if plan_lookups else 0.0)]
+    )
+    yield "cache_entries", "Entries currently cached", (
+        [({"cache": name}, c["size"]) for name, c in caches.items()] + [({"cache": "query_plans"}, plans["size"])]
+    )
+
+    pools = pool_stats()
+    yield "db_pool_in_use", "Connections checked out", [({"pool": n}, p["in_use"]) for n, p in pools.items()]
+    yield "db_pool_waiting", "Threads waiting for a connection", [({"pool": n}, p["waiting"]) for n, p in pools.items()]
+    yield "db_pool_saturation", "Fraction of the pool in use", [({"pool": n}, p["in_use"] / p["size"]) for n, p in pools.items()]
+
+    llm = LLM_CLIENT.stats()
+    yield "llm_inflight", "Distinct LLM calls in flight", [({}, llm["inflight"])]
+
+    sched = scheduler_stats()
+    for metric, key, help in (("scheduler_queue_depth", "queued", "Requests waiting for a slot"),
+                              ("scheduler_active", "active", "Slots held"),
+                              ("scheduler_shed", "shed", "Requests shed because the queue was full")):
+        yield metric, help, [({"scheduler": name, "tier": tier}, t[key])
+                             for name in ("llm", "database") for tier, t in sched[name]["tiers"].items()]
+
+    hashing = hash_pool_stats()
+    yield "password_hash_pending", "Password hash jobs queued or running", [({}, hashing["pending"])]
+
+    ingest = INGESTER.stats()
+    yield "ingest_queued_events", "share_logs events accepted but not yet committed", [({}, ingest["queued"])]
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of stage latencies and service gauges."""
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+@app.get("/admin/indexes")
+async def index_recommendations(current_user: User = Depends(get_current_admin_user)):
+    """Index recommendations from the query shapes this server has executed."""
+    shapes = await run_db(index_advisor.recorded_shapes)
+    recs = await run_db(index_advisor.advise, shapes)
+    return {
+        "recommendations": [r.to_dict() for r in recs],
+        "shapes": [{"sql": sql, "executions": n} for sql, n in shapes],
+    }
+
+@app.post("/admin/indexes/apply")
+async def apply_index_recommendations(current_user: User = Depends(get_current_admin_user)):
+    recs = await run_db(index_advisor.advise)
+    return {"created": await run_db(index_advisor.apply, recs)}
+
+@app.get("/admin/partitions")
+async def list_partitions(current_user: User = Depends(get_current_admin_user)):
+    """share_logs partitions, oldest first, with their estimated row counts."""
+    return {"partitions": await run_db(partition_stats)}
+
+@app.post("/admin/partitions/maintain")
+async def maintain_partitions(current_user: User = Depends(get_current_admin_user)):
+    """Create upcoming months, compact old ones and archive expired ones now."""
+    return await run_db(maintain)
+
+@app.get("/top-files")
+async def top_files(request: Request, stream: StreamMode = None, format: ResultFormat = None,
+                    current_user: User = Depends(get_current_active_user)):
+    return await execute_query(TOP_FILES_SQL, stream=_stream_mode(request, stream),
+                               format=_result_format(request, format))
 
 @app.post("/query", response_model=QueryResponse)
-def query_proxy(req: QueryRequest, current_user: User = Depends(get_current_active_user)):
+async def query_proxy(req: QueryRequest, request: Request, stream: StreamMode = None,
+                      format: ResultFormat = None,
+                      current_user: User = Depends(get_current_active_user)):
+    stream = _stream_mode(request, stream)
+    format = _result_format(request, format)
+    tier = current_user.tier
     try:
-        # Special case for top files query
-        if "top files by opens" in req.query.lower() and "week" in req.query.lower():
-            print("Redirecting to /top-files endpoint")
-            sql = """
-            SELECT f.name, COUNT(*) as open_count
-            FROM files f
-            JOIN share_logs s ON f.id = s.file_id
-            WHERE s.opened_at >= date('now', '-7 days')
-            GROUP BY f.name
-            ORDER BY open_count DESC
-            LIMIT 10
-            """
-            data = run_sql(sql)
-            return {"sql": sql, "params": [], "data": data}
+        RATE_LIMITER.check(current_user.email, tier)
+
+        # Later pages resume from the cursor without matching or the LLM;
+        # the query is rebuilt and every page goes through cost admission
+        if req.cursor is not None:
+            state = CURSORS.decode(req.cursor, current_user.email)
+            sql, params = resume_query(state)
+            async with DB_SCHEDULER.slot(tier):
+                return await execute_page(sql, params, current_user, stream, format, True, state)
+
+        # Recurring questions are answered from templates without the LLM
+        with span("intent_match"):
+            match = match_intent(req.query)
+        if match is not None:
+            logger.debug("Answering with the %s template (confidence %.2f)", match.intent.name, match.confidence)
+            async with DB_SCHEDULER.slot(tier):
+                return await execute_page(match.sql, match.params, current_user, stream, format, False,
+                                          CursorState(None, match.intent.name, match.params, req.page_size))
             
         # Normal flow for other queries
         # 1️⃣  Gemini proposes SQL
-        raw_sql = nl_to_sql_with_llm(req.query)
-        print(f"Generated SQL: {raw_sql}")  # Debug output
+        with span("llm"):
+            raw_sql = await nl_to_sql_async(req.query, slot=lambda: LLM_SCHEDULER.slot(tier))
+        logger.debug("Generated SQL: %s", raw_sql)
         if "UNSUPPORTED" in raw_sql.upper():
             raise HTTPException(status_code=400, detail="Query not supported by allowed schema")
             
@@ -105,19 +385,133 @@ def query_proxy(req: QueryRequest, current_user: User = Depends(get_current_acti
 
         # 2️⃣  Validate & parameterize
         try:
-            safe_sql, params = compile_safe_query(raw_sql)
+            with span("compile"):
+                safe_sql, params = compile_safe_query(raw_sql)
         except SqlGuardError as ge:
-            print(f"SQL Guard Error: {ge}, SQL: {raw_sql}")  # Debug output
+            logger.info("SQL Guard Error: %s, SQL: %s", ge, raw_sql)
             raise
 
         # 3️⃣  Execute safely
-        data = run_sql(safe_sql, params)
-        return {"sql": safe_sql, "params": params, "data": data}
+        async with DB_SCHEDULER.slot(tier):
+            return await execute_page(safe_sql, params, current_user, stream, format, True,
+                                      CursorState(raw_sql, None, (), req.page_size))
 
     except SqlGuardError as ge:
         raise HTTPException(status_code=400, detail=f"Guardrail violation: {ge}")
+    except CursorError as ce:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {ce}")
+    except QueryCostError as ce:
+        raise HTTPException(status_code=422, detail=f"Query too expensive: {ce}")
+    except QueryTimeoutError as qe:
+        raise HTTPException(status_code=408, detail=str(qe))
+    except LLMTimeoutError as te:
+        raise HTTPException(status_code=504, detail=f"SQL generation timed out: {te}")
+    except (RateLimitedError, OverloadedError) as se:
+        raise _scheduler_error(se)
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Exception: {e}")  # Debug output
+        logger.exception("Query failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal error: {e}")
+
+def _scheduler_error(e: Exception) -> HTTPException:
+    status_code = 429 if isinstance(e, RateLimitedError) else 503
+    return HTTPException(status_code=status_code, detail=str(e),
+                         headers={"Retry-After": str(max(1, round(e.retry_after)))})
+
+def _batch_error(query: str, e: Exception) -> BatchQueryResult:
+    if isinstance(e, (RateLimitedError, OverloadedError)):
+        e = _scheduler_error(e)
+    if isinstance(e, HTTPException):
+        return BatchQueryResult(query=query, status=e.status_code, error=str(e.detail))
+    if isinstance(e, SqlGuardError):
+        return BatchQueryResult(query=query, status=400, error=f"Guardrail violation: {e}")
+    if isinstance(e, LLMTimeoutError):
+        return BatchQueryResult(query=query, status=504, error=f"SQL generation timed out: {e}")
+    if isinstance(e, QueryCostError):
+        return BatchQueryResult(query=query, status=422, error=f"Query too expensive: {e}")
+    if isinstance(e, QueryTimeoutError):
+        return BatchQueryResult(query=query, status=408, error=str(e))
+    return BatchQueryResult(query=query, status=500, error=f"Internal error: {e}")
+
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def query_batch(req: BatchQueryRequest, current_user: User = Depends(get_current_active_user)):
+    """
+    Many questions in one round-trip: one multi-question LLM prompt for
+    the uncached ones, then every query on a single pooled connection.
+    Each result carries its own status/error.
+    """
+    tier = current_user.tier
+    try:
+        RATE_LIMITER.check(current_user.email, tier)
+    except RateLimitedError as e:
+        raise _scheduler_error(e)
+    results: List[Optional[BatchQueryResult]] = [None] * len(req.queries)
+    statements = {}  # index -> (sql, params)
+
+    # 1️⃣  Template matches first; the rest go to the LLM together
+    pending = []
+    for i, q in enumerate(req.queries):
+        match = match_intent(q)
+        if match is not None:
+            statements[i] = (rewrite_for_rollups(match.sql), match.params)
+        else:
+            pending.append(i)
+    try:
+        generated = await nl_to_sql_batch_async([req.queries[i] for i in pending],
+                                                slot=lambda: LLM_SCHEDULER.slot(tier)) if pending else []
+    except OverloadedError as e:
+        raise _scheduler_error(e)
+
+    # 2️⃣  Validate & parameterize each independently
+    for i, raw_sql in zip(pending, generated):
+        try:
+            if isinstance(raw_sql, Exception):
+                raise raw_sql
+            if "UNSUPPORTED" in raw_sql.upper():
+                raise HTTPException(status_code=400, detail="Query not supported by allowed schema")
+            safe_sql, params = compile_safe_query(raw_sql.replace('@', ''))
+            safe_sql = rewrite_for_rollups(safe_sql)
+            await run_db(admit, safe_sql, params, tier)
+            statements[i] = (safe_sql, params)
+        except Exception as e:
+            results[i] = _batch_error(req.queries[i], e)
+
+    # 3️⃣  Execute all on one connection
+    order = sorted(statements)
+    for i in order:
+        index_advisor.record(statements[i][0])
+    try:
+        async with DB_SCHEDULER.slot(tier):
+            with query_deadline(budget_for(tier).timeout):
+                data = await cached_results([statements[i] for i in order], run_sql_many_async)
+    except OverloadedError as e:
+        raise _scheduler_error(e)
+    for i, rows in zip(order, data):
+        sql, params = statements[i]
+        if isinstance(rows, Exception):
+            results[i] = _batch_error(req.queries[i], rows)
+        else:
+            results[i] = BatchQueryResult(query=req.queries[i], sql=sql, params=params, data=rows)
+
+    return {"results": results}
+
+@app.post("/ingest/share-logs", status_code=202)
+async def ingest_share_logs(req: IngestRequest, response: Response, durable: bool = False,
+                            current_user: User = Depends(get_current_admin_user)):
+    """
+    Queue share_logs events for the single background writer: 202 once
+    queued, or with ?durable=true, 200 once committed with a full fsync.
+    A full queue answers 503 with Retry-After.
+    """
+    rows = [share_log_row(e.file_id, e.viewer_email, e.opened_at) for e in req.events]
+    try:
+        accepted = await INGESTER.submit(rows, durable=durable)
+    except OverloadedError as e:
+        raise _scheduler_error(e)
+    except Exception as e:
+        logger.exception("Ingest failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Ingest failed: {e}")
+    if durable:
+        response.status_code = 200
+    return {"accepted": accepted, "durable": durable, "queued": INGESTER.stats()["queued"]}
@@ -30,7 +30,8 @@ document.addEventListener('DOMContentLoaded', function() {
         resultsContainer.innerHTML = '<p>Loading results...</p>';
         
         try {
-            const response = await fetch('/query', {
+            // Rows are streamed as NDJSON so the table fills in as they arrive
+            const response = await fetch('/query?stream=ndjson', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -41,47 +42,68 @@ document.addEventListener('DOMContentLoaded', function() {
                 })
             });
             
-            const data = await response.json();
+            if (!response.ok) {
+                const data = await response.json();
+                resultsContainer.innerHTML = `<p>Error: ${data.detail || 'Failed to execute query.'}</p>`;
+                return;
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let header = null;
+            let headers = null;
+            let table = null;
+            let tbody = null;
             
-            if (response.ok) {
-                // Display results
-                let resultsHtml = '';
-                
-                if (data.data && data.data.length > 0) {
-                    resultsHtml = '<table border="1" cellpadding="10" style="border-collapse: collapse; width: 100%;">';
-                    
-                    // Table header
-                    resultsHtml += '<thead><tr>';
-                    const headers = Object.keys(data.data[0]);
-                    headers.forEach(header => {
-                        resultsHtml += `<th>${header}</th>`;
-                    });
-                    resultsHtml += '</tr></thead>';
-                    
-                    // Table body
-                    resultsHtml += '<tbody>';
-                    data.data.forEach(row => {
-                        resultsHtml += '<tr>';
-                        headers.forEach(header => {
-                            resultsHtml += `<td>${row[header]}</td>`;
-                        });
-                        resultsHtml += '</tr>';
-                    });
-                    resultsHtml += '</tbody></table>';
+            const appendRow = row => {
+                if (!table) {
+                    // Table header from the first row's keys
+                    headers = Object.keys(row);
+                    resultsContainer.innerHTML = '<table border="1" cellpadding="10" style="border-collapse: collapse; width: 100%;">' +
+                        '<thead><tr>' + headers.map(h => `<th>${h}</th>`).join('') + '</tr></thead><tbody></tbody></table>';
+                    table = resultsContainer.querySelector('table');
+                    tbody = table.querySelector('tbody');
+                }
+                const tr = document.createElement('tr');
+                tr.innerHTML = headers.map(h => `<td>${row[h]}</td>`).join('');
+                tbody.appendChild(tr);
+            };
+            
+            const handleLine = line => {
+                if (!line.trim()) {
+                    return;
+                }
+                const obj = JSON.parse(line);
+                if (header === null) {
+                    header = obj;  // first line carries sql/params
                 } else {
-                    resultsHtml = '<p>No results found.</p>';
+                    appendRow(obj);
                 }
-                
-                // Display SQL query
-                resultsHtml += `<div style="margin-top: 20px;">
-                    <h3>SQL Query:</h3>
-                    <pre style="background-color: #f5f5f5; padding: 10px; border-radius: 5px;">${data.sql}</pre>
-                </div>`;
-                
-                resultsContainer.innerHTML = resultsHtml;
-            } else {
-                resultsContainer.innerHTML = `<p>Error: ${data.detail || 'Failed to execute query.'}</p>`;
+            };
+            
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) {
+                    break;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.forEach(handleLine);
             }
+            handleLine(buffer);
+            
+            if (!table) {
+                resultsContainer.innerHTML = '<p>No results found.</p>';
+            }
+            
+            // Display SQL query
+            const sqlBlock = document.createElement('div');
+            sqlBlock.style.marginTop = '20px';
+            sqlBlock.innerHTML = '<h3>SQL Query:</h3><pre style="background-color: #f5f5f5; padding: 10px; border-radius: 5px;"></pre>';
+            sqlBlock.querySelector('pre').textContent = header ? header.sql : '';
+            resultsContainer.appendChild(sqlBlock);
         } catch (error) {
             console.error('Error:', error);
             resultsContainer.innerHTML = '<p>An error occurred. Please try again later.</p>';
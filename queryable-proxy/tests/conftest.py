@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+import pytest
+
+# Read when the app modules are imported: never touch proxy.db or the LLM
+_TMP = tempfile.mkdtemp(prefix="queryable-proxy-tests-")
+os.environ["PROXY_DB_PATH"] = os.path.join(_TMP, "proxy.db")
+os.environ["LLM_BACKEND"] = "stub"
+os.environ["NL_SQL_CACHE_PATH"] = ":memory:"
+os.environ["SHARED_CACHE_PATH"] = ""
+
+@pytest.fixture(scope="session")
+def seeded_db():
+    """files/share_logs with ~4 months of synthetic opens, plus the rollups."""
+    from benchmarks.seed import seed
+    from core.database import DB_PATH
+    from core.rollups import setup_rollups
+
+    seed(DB_PATH, files=50, share_logs=5000, viewers=40, days=120)
+    setup_rollups()
+    return DB_PATH
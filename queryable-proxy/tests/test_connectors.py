@@ -0,0 +1,31 @@
+import asyncio
+
+from data.connectors import Connector
+
+class _Echo(Connector):
+    name = "echo"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.fetched = []
+
+    async def _fetch(self, keys):
+        self.fetched.append(keys)
+        return [{"id": k} for k in keys]
+
+def test_cache_is_bounded_lru():
+    c = _Echo(max_keys=2)
+    asyncio.run(c.fetch([1, 2]))
+    asyncio.run(c.fetch([1]))        # 1 is now the most recently used
+    asyncio.run(c.fetch([3]))        # evicts 2
+    assert list(c._cache) == [1, 3]
+    assert c.stats()["cache_evictions"] == 1
+    asyncio.run(c.fetch([1, 2]))
+    assert c.fetched[-1] == [2]
+
+def test_expired_entries_are_dropped_on_lookup():
+    c = _Echo(ttl=0)
+    asyncio.run(c.fetch([1]))
+    assert asyncio.run(c.fetch([1])) == [{"id": 1}]
+    assert c.fetched == [[1], [1]]
+    assert c.stats()["cache_hits"] == 0
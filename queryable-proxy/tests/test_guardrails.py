@@ -0,0 +1,46 @@
+import pytest
+
+from core.guardrails import DEFAULT_LIMIT, MAX_LIMIT, PLAN_CACHE, compile_safe_query
+
+
+@pytest.mark.parametrize("limit, bound", [("5", 5), ("500", MAX_LIMIT), ("0", 0)])
+def test_own_limit_is_clamped_when_bound(limit, bound):
+    sql, params = compile_safe_query(f"SELECT id FROM files LIMIT {limit}")
+    assert sql == "SELECT id FROM files LIMIT ?"
+    assert params == (bound,)
+
+
+@pytest.mark.parametrize("limit", ["-1", "-5", "1 + 1"])
+def test_negative_or_computed_limit_becomes_default(limit):
+    sql, params = compile_safe_query(f"SELECT id FROM files LIMIT {limit}")
+    assert sql == f"SELECT id FROM files LIMIT {DEFAULT_LIMIT}"
+    assert params == ()
+
+
+def test_missing_limit_gets_default():
+    assert compile_safe_query("SELECT id FROM files") == (f"SELECT id FROM files LIMIT {DEFAULT_LIMIT}", ())
+
+
+def test_same_shape_reuses_plan_and_rebinds_literals():
+    first = compile_safe_query("SELECT id FROM files WHERE name = 'a.txt' AND id > 3 LIMIT 5")
+    hits = PLAN_CACHE.stats()["hits"]
+    second = compile_safe_query("SELECT id FROM files WHERE name = 'b.pdf' AND id > 40 LIMIT 500")
+    assert PLAN_CACHE.stats()["hits"] == hits + 1
+    assert first == ("SELECT id FROM files WHERE name = ? AND id > ? LIMIT ?", ("a.txt", 3, 5))
+    assert second == (first[0], ("b.pdf", 40, MAX_LIMIT))
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT COUNT(*) AS 'n' FROM files", 'SELECT COUNT(*) AS "n" FROM files'),
+    ("SELECT COUNT(*) AS 'm' FROM files", 'SELECT COUNT(*) AS "m" FROM files'),
+    ("SELECT COUNT(*) 'total' FROM files", 'SELECT COUNT(*) AS "total" FROM files'),
+])
+def test_string_aliases_stay_in_the_shape(query, expected):
+    assert compile_safe_query(query) == (f"{expected} LIMIT {DEFAULT_LIMIT}", ())
+
+
+def test_string_literal_before_alias_is_a_parameter():
+    for tag in ("x", "y"):
+        sql, params = compile_safe_query(f"SELECT name, '{tag}' AS tag FROM files WHERE name = 'n'")
+        assert sql == f"SELECT name, ? AS tag FROM files WHERE name = ? LIMIT {DEFAULT_LIMIT}"
+        assert params == (tag, "n")
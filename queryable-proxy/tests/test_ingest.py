@@ -0,0 +1,26 @@
+import sqlite3
+
+import pytest
+
+from core.database import run_sql, write_connection
+from core.ingest import write_share_logs
+
+
+def _count():
+    return run_sql("SELECT COUNT(*) AS n FROM share_logs")[0]["n"]
+
+
+def test_failed_durable_batch_raises_its_own_error_and_rolls_back(seeded_db):
+    before = _count()
+    rows = [(1, "a@example.com", "2024-01-01T00:00:00"), (1, None, "2024-01-01T00:00:00")]
+    with pytest.raises(sqlite3.IntegrityError):
+        write_share_logs(rows, durable=True)
+    assert _count() == before
+    with write_connection() as conn:
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL again
+
+
+def test_durable_batch_commits(seeded_db):
+    before = _count()
+    assert write_share_logs([(1, "b@example.com", "2024-01-02T00:00:00")], durable=True) == 1
+    assert _count() == before + 1
@@ -0,0 +1,19 @@
+import pytest
+
+from core.intents import match_intent
+
+
+@pytest.mark.parametrize("question", [
+    "how many times was file 99999999999999999999999 opened",
+    "files opened by a@example.com since 2024-02-30",
+    "top files by opens last 99999999 days",
+    "top files by opens for pdfs",
+])
+def test_unanswerable_or_partial_matches_fall_through(question):
+    assert match_intent(question) is None
+
+
+def test_template_match_binds_slots():
+    match = match_intent("how many times was file 12 opened")
+    assert match.intent.name == "file_open_count"
+    assert match.params[0] == 12
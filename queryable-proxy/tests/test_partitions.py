@@ -0,0 +1,52 @@
+import re
+from datetime import date, timedelta
+
+import pytest
+
+from core.database import read_connection, run_sql
+from core.guardrails import compile_safe_query
+from core.partitions import partitions, prune_partitions, setup_partitions
+
+MONTH_AGO = (date.today() - timedelta(days=30)).isoformat()
+WEEK_AGO = (date.today() - timedelta(days=7)).isoformat()
+
+PRUNED = [
+    f"SELECT COUNT(*) FROM share_logs WHERE opened_at >= '{MONTH_AGO}'",
+    f"SELECT id, file_id FROM share_logs WHERE opened_at >= '{MONTH_AGO}' AND opened_at < '{WEEK_AGO}' "
+    "ORDER BY id LIMIT 200",
+    "SELECT file_id, COUNT(*) AS n FROM share_logs WHERE opened_at >= date('now', '-14 days') "
+    "GROUP BY file_id ORDER BY n DESC, file_id",
+    f"SELECT f.name, COUNT(*) AS n FROM share_logs s JOIN files f ON f.id = s.file_id "
+    f"WHERE s.opened_at > '{MONTH_AGO}' GROUP BY f.name ORDER BY n DESC, f.name LIMIT 20",
+    f"SELECT COUNT(*) FROM share_logs WHERE opened_at < '{MONTH_AGO}'",
+]
+
+
+def _kind():
+    return run_sql("SELECT type FROM sqlite_master WHERE name = 'share_logs'")[0]["type"]
+
+
+def test_startup_does_not_partition_by_default(seeded_db):
+    setup_partitions()
+    assert _kind() == "table"
+
+
+@pytest.fixture(scope="module")
+def unpartitioned(seeded_db):
+    """Results of PRUNED on the plain table, taken just before partitioning it."""
+    assert _kind() == "table"
+    results = {q: run_sql(*compile_safe_query(q)) for q in PRUNED}
+    setup_partitions(migrate=True)
+    assert _kind() == "view"
+    return results
+
+
+@pytest.mark.parametrize("query", PRUNED)
+def test_pruned_reads_equal_unpartitioned_reads(unpartitioned, query):
+    sql, params = compile_safe_query(query)
+    with read_connection() as conn:
+        pruned, _ = prune_partitions(conn, sql, params)
+        total = len(partitions(conn))
+    touched = set(re.findall(r"share_logs_(?:p\d{6}|y\d{4})", pruned))
+    assert 0 < len(touched) < total
+    assert run_sql(sql, params) == unpartitioned[query]
@@ -0,0 +1,26 @@
+import pytest
+
+from core.database import run_sql
+from core.guardrails import compile_safe_query
+from core.rollups import rewrite_for_rollups
+
+EQUIVALENT = [
+    "SELECT COUNT(*) FROM share_logs LIMIT 50",
+    "SELECT file_id, COUNT(*) AS n FROM share_logs GROUP BY file_id ORDER BY n DESC, file_id LIMIT 10",
+    "SELECT viewer_email, COUNT(*) AS n FROM share_logs GROUP BY viewer_email ORDER BY n DESC, viewer_email LIMIT 5",
+    "SELECT f.name, COUNT(*) AS n FROM share_logs s JOIN files f ON f.id = s.file_id "
+    "GROUP BY f.name ORDER BY n DESC, f.name LIMIT 5",
+    "SELECT COUNT(*) FROM share_logs WHERE opened_at >= date('now', '-30 days')",
+    "SELECT COUNT(*) FROM share_logs WHERE opened_at >= date('now', '+1 days')",
+    "SELECT file_id, COUNT(*) AS n FROM share_logs WHERE file_id = 7 "
+    "AND opened_at >= date('now', '-60 days') AND opened_at < date('now', '-7 days') GROUP BY file_id",
+    "SELECT date(opened_at) AS d, COUNT(*) AS n FROM share_logs GROUP BY d ORDER BY d",
+]
+
+
+@pytest.mark.parametrize("query", EQUIVALENT)
+def test_rollup_answers_equal_raw_answers(seeded_db, query):
+    sql, params = compile_safe_query(query)
+    rewritten = rewrite_for_rollups(sql)
+    assert "share_logs_daily_" in rewritten
+    assert run_sql(rewritten, params) == run_sql(sql, params)
@@ -0,0 +1,31 @@
+import pytest
+
+from ai.sql_cache import NlSqlCache
+
+
+def _cache():
+    return NlSqlCache("test", path=":memory:")
+
+
+def test_negated_question_is_not_a_near_duplicate():
+    cache = _cache()
+    cache.put("files opened this week", "SELECT 1")
+    assert cache.get("files not opened this week") is None
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("files opened this week", "count files opened this week"),
+    ("files opened this week", "oldest files opened this week"),
+    ("files opened this week", "distinct files opened this week"),
+    ("top 5 files by opens", "top 5 files by unique opens"),
+])
+def test_aggregate_or_ordering_word_is_not_a_near_duplicate(cached, asked):
+    cache = _cache()
+    cache.put(cached, "SELECT 1")
+    assert cache.get(asked) is None
+
+
+def test_rephrased_question_is_a_near_duplicate():
+    cache = _cache()
+    cache.put("files opened this week", "SELECT 1")
+    assert cache.get("show me the files opened this week") == "SELECT 1"